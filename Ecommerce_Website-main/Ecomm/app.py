@@ -1,1054 +1,335 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
-from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
-from functools import wraps
-import os
-
-app = Flask(__name__)
-
-# Set secret key for session management
-app.secret_key = os.urandom(24)
-
-# Database Configuration (SQLite)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///ecommerce.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Initialize Database
-db = SQLAlchemy(app)
-
-# ==================== MODELS ====================
-
-class User(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(50), unique=True, nullable=False)
-    email = db.Column(db.String(100), unique=True, nullable=False)
-    password_hash = db.Column(db.String(255), nullable=False)
-    password_plain = db.Column(db.String(255), nullable=True)  # Store plain text password for admin viewing
-    role = db.Column(db.String(10), nullable=False, default='buyer')  # 'buyer', 'seller', 'admin'
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    # Relationships
-    products = db.relationship('Product', backref='seller', lazy=True, cascade='all, delete-orphan')
-    orders = db.relationship('Order', backref='buyer', lazy=True)
-    cart_items = db.relationship('CartItem', backref='user', lazy=True, cascade='all, delete-orphan')
-    wishlist_items = db.relationship('WishlistItem', backref='user', lazy=True, cascade='all, delete-orphan')
-    reviews = db.relationship('Review', backref='user', lazy=True, cascade='all, delete-orphan')
-
-class Category(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(50), unique=True, nullable=False)
-    products = db.relationship('Product', backref='category', lazy=True)
-
-class Product(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    description = db.Column(db.Text, nullable=True)
-    price = db.Column(db.Float, nullable=False)
-    image_url = db.Column(db.String(500), nullable=True)
-    additional_images = db.Column(db.Text, nullable=True)  # JSON string of image URLs
-    video_url = db.Column(db.String(500), nullable=True)  # YouTube/Vimeo embed URL
-    stock = db.Column(db.Integer, default=0, nullable=False)
-    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=True)
-    seller_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-    # Relationships
-    order_items = db.relationship('OrderItem', backref='product', lazy=True)
-    cart_items = db.relationship('CartItem', backref='product', lazy=True, cascade='all, delete-orphan')
-    wishlist_items = db.relationship('WishlistItem', backref='product', lazy=True, cascade='all, delete-orphan')
-    reviews = db.relationship('Review', backref='product', lazy=True, cascade='all, delete-orphan')
-
-class CartItem(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
-    quantity = db.Column(db.Integer, default=1, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-class Order(db.Model):
-    __tablename__ = 'order'
-    id = db.Column(db.Integer, primary_key=True)
-    buyer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    total_amount = db.Column(db.Float, nullable=False)
-    status = db.Column(db.String(20), default='Pending')  # Pending, Processing, Shipped, Delivered, Cancelled
-    shipping_address = db.Column(db.Text, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    
-    # Relationships
-    items = db.relationship('OrderItem', backref='order', lazy=True, cascade='all, delete-orphan')
-
-class OrderItem(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
-    quantity = db.Column(db.Integer, nullable=False)
-    price = db.Column(db.Float, nullable=False)  # Price at time of purchase
-
-class WishlistItem(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-class Review(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
-    rating = db.Column(db.Integer, nullable=False)  # 1-5 stars
-    comment = db.Column(db.Text, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-# ==================== AUTHENTICATION HELPERS ====================
-
-def login_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            flash('Please login to access this page.', 'warning')
-            return redirect(url_for('login'))
-        return f(*args, **kwargs)
-    return decorated_function
-
-def role_required(roles):
-    def decorator(f):
-        @wraps(f)
-        def decorated_function(*args, **kwargs):
-            if 'user_id' not in session:
-                flash('Please login to access this page.', 'warning')
-                return redirect(url_for('login'))
-            user = User.query.get(session['user_id'])
-            if user.role not in roles:
-                flash('You do not have permission to access this page.', 'danger')
-                return redirect(url_for('home'))
-            return f(*args, **kwargs)
-        return decorated_function
-    return decorator
-
-# ==================== ROUTES ====================
-
-@app.route("/")
-def home():
-    """Home page with featured products"""
-    search_query = request.args.get('search', '').strip()
-    category_id = request.args.get('category', type=int)
-    
-    products_query = Product.query.filter(Product.stock > 0)
-    
-    if search_query:
-        products_query = products_query.filter(
-            db.or_(
-                Product.name.ilike(f'%{search_query}%'),
-                Product.description.ilike(f'%{search_query}%')
-            )
-        )
-    
-    if category_id:
-        products_query = products_query.filter_by(category_id=category_id)
-    
-    products = products_query.order_by(Product.created_at.desc()).limit(12).all()
-    categories = Category.query.all()
-    
-    return render_template("index.html", products=products, categories=categories, 
-                         search_query=search_query, selected_category=category_id)
-
-@app.route("/register", methods=['GET', 'POST'])
-def register():
-    """User registration"""
-    if request.method == 'POST':
-        username = request.form.get('username', '').strip()
-        email = request.form.get('email', '').strip()
-        password = request.form.get('password', '').strip()
-        role = request.form.get('role', 'buyer').strip()
-        
-        if not all([username, email, password]):
-            flash('All fields are required!', 'danger')
-            return redirect(url_for('register'))
-        
-        if User.query.filter_by(username=username).first():
-            flash('Username already exists!', 'danger')
-            return redirect(url_for('register'))
-        
-        if User.query.filter_by(email=email).first():
-            flash('Email already registered!', 'danger')
-            return redirect(url_for('register'))
-        
-        try:
-            user = User(
-                username=username,
-                email=email,
-                password_hash=generate_password_hash(password),
-                password_plain=password,  # Store plain text password for admin viewing
-                role=role
-            )
-            db.session.add(user)
-            db.session.commit()
-            flash('Registration successful! Please login.', 'success')
-            return redirect(url_for('login'))
-        except Exception as e:
-            db.session.rollback()
-            flash('Error during registration. Please try again.', 'danger')
-            return redirect(url_for('register'))
-    
-    return render_template("register.html")
-
-@app.route("/login", methods=['GET', 'POST'])
-def login():
-    """User login"""
-    if request.method == 'POST':
-        username = request.form.get('username', '').strip()
-        password = request.form.get('password', '').strip()
-        
-        if not all([username, password]):
-            flash('Please enter both username and password.', 'danger')
-            return redirect(url_for('login'))
-        
-        try:
-            user = User.query.filter_by(username=username).first()
-            
-            if not user:
-                flash('Invalid username or password.', 'danger')
-                return redirect(url_for('login'))
-            
-            # Check if password_hash exists
-            if not user.password_hash:
-                flash('Account error. Please contact administrator.', 'danger')
-                return redirect(url_for('login'))
-            
-            if check_password_hash(user.password_hash, password):
-                session['user_id'] = user.id
-                session['username'] = user.username
-                session['role'] = user.role
-                flash(f'Welcome back, {user.username}!', 'success')
-                
-                # Redirect based on role
-                if user.role == 'admin':
-                    return redirect(url_for('admin_dashboard'))
-                elif user.role == 'seller':
-                    return redirect(url_for('seller_dashboard'))
-                else:
-                    return redirect(url_for('home'))
-            else:
-                flash('Invalid username or password.', 'danger')
-                return redirect(url_for('login'))
-        except Exception as e:
-            flash(f'Login error: {str(e)}. Please try again or contact administrator.', 'danger')
-            return redirect(url_for('login'))
-    
-    return render_template("login.html")
-
-@app.route("/logout")
-def logout():
-    """User logout"""
-    session.clear()
-    flash('You have been logged out successfully.', 'info')
-    return redirect(url_for('home'))
-
-@app.route("/products")
-def products():
-    """Browse all products"""
-    search_query = request.args.get('search', '').strip()
-    category_id = request.args.get('category', type=int)
-    sort_by = request.args.get('sort', 'newest')  # newest, price_low, price_high
-    
-    products_query = Product.query.filter(Product.stock > 0)
-    
-    if search_query:
-        products_query = products_query.filter(
-            db.or_(
-                Product.name.ilike(f'%{search_query}%'),
-                Product.description.ilike(f'%{search_query}%')
-            )
-        )
-    
-    if category_id:
-        products_query = products_query.filter_by(category_id=category_id)
-    
-    # Sorting
-    if sort_by == 'price_low':
-        products_query = products_query.order_by(Product.price.asc())
-    elif sort_by == 'price_high':
-        products_query = products_query.order_by(Product.price.desc())
-    else:
-        products_query = products_query.order_by(Product.created_at.desc())
-    
-    products = products_query.all()
-    categories = Category.query.all()
-    
-    return render_template("products.html", products=products, categories=categories,
-                         search_query=search_query, selected_category=category_id, sort_by=sort_by)
-
-@app.route("/product/<int:product_id>")
-def product_detail(product_id):
-    """Product detail page"""
-    product = Product.query.get_or_404(product_id)
-    related_products = Product.query.filter(
-        Product.category_id == product.category_id,
-        Product.id != product_id,
-        Product.stock > 0
-    ).limit(4).all()
-
-    # Get reviews and calculate average rating
-    reviews = Review.query.filter_by(product_id=product_id).order_by(Review.created_at.desc()).all()
-    avg_rating = 0
-    if reviews:
-        avg_rating = sum(r.rating for r in reviews) / len(reviews)
-
-    return render_template("product_detail.html", product=product, related_products=related_products,
-                         reviews=reviews, avg_rating=round(avg_rating, 1))
-
-# ==================== CART ROUTES ====================
-
-@app.route("/cart")
-@login_required
-def cart():
-    """Shopping cart"""
-    user_id = session['user_id']
-    cart_items = CartItem.query.filter_by(user_id=user_id).all()
-    total = sum(item.product.price * item.quantity for item in cart_items)
-    
-    return render_template("cart.html", cart_items=cart_items, total=total)
-
-@app.route("/add_to_cart/<int:product_id>", methods=['POST'])
-@login_required
-def add_to_cart(product_id):
-    """Add product to cart"""
-    user_id = session['user_id']
-    quantity = int(request.form.get('quantity', 1))
-    
-    product = Product.query.get_or_404(product_id)
-    
-    if product.stock < quantity:
-        flash(f'Only {product.stock} items available in stock.', 'warning')
-        return redirect(url_for('product_detail', product_id=product_id))
-    
-    # Check if item already in cart
-    cart_item = CartItem.query.filter_by(user_id=user_id, product_id=product_id).first()
-    
-    if cart_item:
-        new_quantity = cart_item.quantity + quantity
-        if new_quantity > product.stock:
-            flash(f'Cannot add more. Only {product.stock} items available.', 'warning')
-            return redirect(url_for('cart'))
-        cart_item.quantity = new_quantity
-    else:
-        cart_item = CartItem(user_id=user_id, product_id=product_id, quantity=quantity)
-        db.session.add(cart_item)
-    
-    db.session.commit()
-    flash(f'{product.name} added to cart!', 'success')
-    return redirect(url_for('cart'))
-
-@app.route("/update_cart/<int:cart_item_id>", methods=['POST'])
-@login_required
-def update_cart(cart_item_id):
-    """Update cart item quantity"""
-    cart_item = CartItem.query.get_or_404(cart_item_id)
-    
-    if cart_item.user_id != session['user_id']:
-        flash('Unauthorized access.', 'danger')
-        return redirect(url_for('cart'))
-    
-    quantity = int(request.form.get('quantity', 1))
-    
-    if quantity <= 0:
-        db.session.delete(cart_item)
-    elif quantity > cart_item.product.stock:
-        flash(f'Only {cart_item.product.stock} items available.', 'warning')
-    else:
-        cart_item.quantity = quantity
-    
-    db.session.commit()
-    return redirect(url_for('cart'))
-
-@app.route("/remove_from_cart/<int:cart_item_id>", methods=['POST'])
-@login_required
-def remove_from_cart(cart_item_id):
-    """Remove item from cart"""
-    cart_item = CartItem.query.get_or_404(cart_item_id)
-
-    if cart_item.user_id != session['user_id']:
-        flash('Unauthorized access.', 'danger')
-        return redirect(url_for('cart'))
-
-    db.session.delete(cart_item)
-    db.session.commit()
-    flash('Item removed from cart.', 'info')
-    return redirect(url_for('cart'))
-
-# ==================== WISHLIST ROUTES ====================
-
-@app.route("/wishlist")
-@login_required
-def wishlist():
-    """User's wishlist"""
-    user_id = session['user_id']
-    wishlist_items = WishlistItem.query.filter_by(user_id=user_id).all()
-
-    return render_template("wishlist.html", wishlist_items=wishlist_items)
-
-@app.route("/add_to_wishlist/<int:product_id>", methods=['POST'])
-@login_required
-def add_to_wishlist(product_id):
-    """Add product to wishlist"""
-    user_id = session['user_id']
-    product = Product.query.get_or_404(product_id)
+"""Application factory: configuration, blueprints and `flask` maintenance commands.
 
-    # Check if item already in wishlist
-    wishlist_item = WishlistItem.query.filter_by(user_id=user_id, product_id=product_id).first()
-
-    if wishlist_item:
-        flash(f'{product.name} is already in your wishlist!', 'info')
-    else:
-        wishlist_item = WishlistItem(user_id=user_id, product_id=product_id)
-        db.session.add(wishlist_item)
-        db.session.commit()
-        flash(f'{product.name} added to wishlist!', 'success')
-
-    return redirect(request.referrer or url_for('product_detail', product_id=product_id))
-
-@app.route("/remove_from_wishlist/<int:product_id>", methods=['POST'])
-@login_required
-def remove_from_wishlist(product_id):
-    """Remove product from wishlist"""
-    user_id = session['user_id']
-    wishlist_item = WishlistItem.query.filter_by(user_id=user_id, product_id=product_id).first()
-
-    if wishlist_item:
-        product_name = wishlist_item.product.name
-        db.session.delete(wishlist_item)
-        db.session.commit()
-        flash(f'{product_name} removed from wishlist.', 'info')
-    else:
-        flash('Item not found in wishlist.', 'warning')
-
-    return redirect(request.referrer or url_for('wishlist'))
-
-# ==================== CHECKOUT ROUTES ====================
-
-@app.route("/checkout", methods=['GET', 'POST'])
-@login_required
-def checkout():
-    """Checkout process"""
-    user_id = session['user_id']
-    cart_items = CartItem.query.filter_by(user_id=user_id).all()
-    
-    if not cart_items:
-        flash('Your cart is empty!', 'warning')
-        return redirect(url_for('cart'))
-    
-    # Check stock availability
-    for item in cart_items:
-        if item.quantity > item.product.stock:
-            flash(f'{item.product.name} has insufficient stock.', 'danger')
-            return redirect(url_for('cart'))
-    
-    if request.method == 'POST':
-        shipping_address = request.form.get('shipping_address', '').strip()
-        
-        if not shipping_address:
-            flash('Shipping address is required.', 'danger')
-            return render_template("checkout.html", cart_items=cart_items, 
-                                 total=sum(item.product.price * item.quantity for item in cart_items))
-        
-        try:
-            # Calculate total
-            total = sum(item.product.price * item.quantity for item in cart_items)
-            
-            # Create order
-            order = Order(
-                buyer_id=user_id,
-                total_amount=total,
-                shipping_address=shipping_address,
-                status='Pending'
-            )
-            db.session.add(order)
-            db.session.flush()
-            
-            # Create order items and update stock
-            for cart_item in cart_items:
-                order_item = OrderItem(
-                    order_id=order.id,
-                    product_id=cart_item.product_id,
-                    quantity=cart_item.quantity,
-                    price=cart_item.product.price
-                )
-                db.session.add(order_item)
-                
-                # Update product stock
-                cart_item.product.stock -= cart_item.quantity
-            
-            # Clear cart
-            CartItem.query.filter_by(user_id=user_id).delete()
-            
-            db.session.commit()
-            flash('Order placed successfully!', 'success')
-            return redirect(url_for('order_detail', order_id=order.id))
-        except Exception as e:
-            db.session.rollback()
-            flash('Error processing order. Please try again.', 'danger')
-            return redirect(url_for('checkout'))
-    
-    total = sum(item.product.price * item.quantity for item in cart_items)
-    return render_template("checkout.html", cart_items=cart_items, total=total)
-
-@app.route("/orders")
-@login_required
-def orders():
-    """User's order history"""
-    user_id = session['user_id']
-    user = User.query.get(user_id)
-    
-    if user.role == 'seller':
-        # Seller sees orders for their products
-        orders = Order.query.join(OrderItem).join(Product).filter(
-            Product.seller_id == user_id
-        ).distinct().order_by(Order.created_at.desc()).all()
-    else:
-        # Buyer sees their own orders
-        orders = Order.query.filter_by(buyer_id=user_id).order_by(Order.created_at.desc()).all()
-    
-    return render_template("orders.html", orders=orders)
-
-@app.route("/order/<int:order_id>")
-@login_required
-def order_detail(order_id):
-    """Order detail page"""
-    order = Order.query.get_or_404(order_id)
-    user_id = session['user_id']
-    user = User.query.get(user_id)
-    
-    # Check authorization
-    if user.role != 'admin' and user.role != 'seller' and order.buyer_id != user_id:
-        flash('Unauthorized access.', 'danger')
-        return redirect(url_for('orders'))
-    
-    return render_template("order_detail.html", order=order)
-
-@app.route("/update_order_status/<int:order_id>", methods=['POST'])
-@login_required
-@role_required(['seller', 'admin'])
-def update_order_status(order_id):
-    """Update order status (seller/admin only)"""
-    order = Order.query.get_or_404(order_id)
-    new_status = request.form.get('status', '').strip()
-    
-    if new_status not in ['Pending', 'Processing', 'Shipped', 'Delivered', 'Cancelled']:
-        flash('Invalid status.', 'danger')
-        return redirect(url_for('order_detail', order_id=order_id))
-    
-    order.status = new_status
-    order.updated_at = datetime.utcnow()
-    db.session.commit()
-    
-    flash('Order status updated successfully!', 'success')
-    return redirect(url_for('order_detail', order_id=order_id))
-
-# ==================== SELLER ROUTES ====================
-
-@app.route("/seller/dashboard")
-@login_required
-@role_required(['seller'])
-def seller_dashboard():
-    """Seller dashboard"""
-    user_id = session['user_id']
-    products = Product.query.filter_by(seller_id=user_id).order_by(Product.created_at.desc()).all()
-    
-    # Get sales statistics
-    total_products = len(products)
-    total_sales = Order.query.join(OrderItem).join(Product).filter(
-        Product.seller_id == user_id
-    ).count()
-    
-    return render_template("seller_dashboard.html", products=products, 
-                         total_products=total_products, total_sales=total_sales)
-
-@app.route("/seller/add_product", methods=['GET', 'POST'])
-@login_required
-@role_required(['seller'])
-def add_product():
-    """Add new product"""
-    if request.method == 'POST':
-        name = request.form.get('name', '').strip()
-        description = request.form.get('description', '').strip()
-        price = request.form.get('price', type=float)
-        stock = request.form.get('stock', type=int, default=0)
-        category_id = request.form.get('category_id', type=int)
-        image_url = request.form.get('image_url', '').strip()
-        
-        if not all([name, price is not None]):
-            flash('Name and price are required!', 'danger')
-            return redirect(url_for('add_product'))
-        
-        try:
-            product = Product(
-                name=name,
-                description=description,
-                price=price,
-                stock=stock,
-                category_id=category_id,
-                image_url=image_url,
-                seller_id=session['user_id']
-            )
-            db.session.add(product)
-            db.session.commit()
-            flash('Product added successfully!', 'success')
-            return redirect(url_for('seller_dashboard'))
-        except Exception as e:
-            db.session.rollback()
-            flash('Error adding product. Please try again.', 'danger')
-            return redirect(url_for('add_product'))
-    
-    categories = Category.query.all()
-    return render_template("add_product.html", categories=categories)
-
-@app.route("/seller/edit_product/<int:product_id>", methods=['GET', 'POST'])
-@login_required
-@role_required(['seller'])
-def edit_product(product_id):
-    """Edit product"""
-    product = Product.query.get_or_404(product_id)
-    
-    if product.seller_id != session['user_id']:
-        flash('You can only edit your own products.', 'danger')
-        return redirect(url_for('seller_dashboard'))
-    
-    if request.method == 'POST':
-        product.name = request.form.get('name', '').strip()
-        product.description = request.form.get('description', '').strip()
-        product.price = request.form.get('price', type=float)
-        product.stock = request.form.get('stock', type=int, default=0)
-        product.category_id = request.form.get('category_id', type=int)
-        product.image_url = request.form.get('image_url', '').strip()
-        
+    python app.py                        development server (migrates on start)
+    flask --app app init-database        apply migrations, create the admin user
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import os
+import secrets
+import sys
+
+import click
+from flask import Flask
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy.orm import configure_mappers
+
+from models import db, User, rebuild_search_index, backfill_ratings
+from helpers import rebuild_sales_rollup, rebuild_seller_orders, sweep_reservations, start_reservation_sweeper
+from migrations import MIGRATIONS, migrate_database, schema_version, init_database
+from caching import init_caches, init_page_cache
+from jobs import run_jobs, start_job_workers
+from metrics import init_metrics
+from blueprints import register_blueprints
+
+def load_secret_key(app):
+    """Session signing key shared by every worker process.
+
+    Taken from SECRET_KEY in the environment, else from a key file
+    (SECRET_KEY_FILE, default instance/secret_key) that the first process
+    to start generates and every later one reads.
+    """
+    if os.environ.get('SECRET_KEY'):
+        return os.environ['SECRET_KEY']
+    key_file = os.environ.get('SECRET_KEY_FILE') or os.path.join(app.instance_path, 'secret_key')
+    if not os.path.exists(key_file):
+        os.makedirs(os.path.dirname(key_file), exist_ok=True)
+        # Write a candidate privately, then link it into place; if another
+        # worker won the race, its key is kept and this one is discarded
+        candidate = f'{key_file}.{os.getpid()}'
+        with open(candidate, 'w') as f:
+            f.write(secrets.token_hex(32))
+        os.chmod(candidate, 0o600)
         try:
-            db.session.commit()
-            flash('Product updated successfully!', 'success')
-            return redirect(url_for('seller_dashboard'))
-        except Exception as e:
-            db.session.rollback()
-            flash('Error updating product. Please try again.', 'danger')
-            return redirect(url_for('edit_product', product_id=product_id))
-    
-    categories = Category.query.all()
-    return render_template("edit_product.html", product=product, categories=categories)
-
-@app.route("/seller/delete_product/<int:product_id>", methods=['POST'])
-@login_required
-@role_required(['seller'])
-def delete_product(product_id):
-    """Delete product"""
-    product = Product.query.get_or_404(product_id)
-    
-    if product.seller_id != session['user_id']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
-    
-    try:
-        db.session.delete(product)
-        db.session.commit()
-        return jsonify({'success': True, 'message': 'Product deleted successfully!'}), 200
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'success': False, 'message': str(e)}), 500
-
-# ==================== ADMIN ROUTES ====================
-
-@app.route("/admin/dashboard")
-@login_required
-@role_required(['admin'])
-def admin_dashboard():
-    """Admin dashboard"""
-    users = User.query.all()
-    products = Product.query.all()
-    orders = Order.query.order_by(Order.created_at.desc()).limit(10).all()
-    categories = Category.query.all()
-    
-    stats = {
-        'total_users': len(users),
-        'total_products': len(products),
-        'total_orders': Order.query.count(),
-        'total_revenue': sum(order.total_amount for order in Order.query.filter_by(status='Delivered').all())
+            os.link(candidate, key_file)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(candidate)
+    with open(key_file) as f:
+        return f.read().strip()
+
+def default_config():
+    """Settings read from the environment; create_app(config) can override any of them"""
+    return {
+        # Database Configuration (SQLite)
+        'SQLALCHEMY_DATABASE_URI': os.environ.get('DATABASE_URL', 'sqlite:///ecommerce.db'),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+
+        # Stock reservations: how long a cart holds its items, and how the sweeper runs
+        'RESERVATION_TTL_SECONDS': int(os.environ.get('RESERVATION_TTL_SECONDS', 15 * 60)),
+        'RESERVATION_SWEEP_INTERVAL': int(os.environ.get('RESERVATION_SWEEP_INTERVAL', 30)),
+        'RESERVATION_SWEEP_BATCH': 500,
+
+        # How long a role cached in the session is trusted before it is checked against the user row
+        'AUTH_REVALIDATE_SECONDS': int(os.environ.get('AUTH_REVALIDATE_SECONDS', 60)),
+        # How often each worker polls the user table for role changes made by other workers
+        'AUTH_SYNC_SECONDS': float(os.environ.get('AUTH_SYNC_SECONDS', 1)),
+
+        # Rendered product cards kept per process (LRU), and how long the category list is cached
+        'PRODUCT_CARD_CACHE_SIZE': int(os.environ.get('PRODUCT_CARD_CACHE_SIZE', 5000)),
+        'CATEGORY_CACHE_SECONDS': int(os.environ.get('CATEGORY_CACHE_SECONDS', 60)),
+
+        # Bulk product imports: rows per executemany / transaction, and how many
+        # row errors are listed in the report (all of them are counted)
+        'IMPORT_CHUNK_SIZE': int(os.environ.get('IMPORT_CHUNK_SIZE', 1000)),
+        'IMPORT_MAX_ERRORS': int(os.environ.get('IMPORT_MAX_ERRORS', 100)),
+
+        # Most entries one bulk inventory / price update may carry
+        'BULK_UPDATE_MAX_ITEMS': int(os.environ.get('BULK_UPDATE_MAX_ITEMS', 1000)),
+
+        # Background jobs: worker threads per process, how often an idle worker looks
+        # for due jobs, and retries with backoff (JOB_RETRY_BASE_SECONDS, doubling up to
+        # JOB_RETRY_MAX_SECONDS); a job running longer than JOB_TIMEOUT_SECONDS is
+        # taken to have lost its worker and is queued again, checked every
+        # JOB_REQUEUE_SECONDS by one thread per process
+        'JOB_WORKERS': int(os.environ.get('JOB_WORKERS', 2)),
+        'JOB_POLL_SECONDS': float(os.environ.get('JOB_POLL_SECONDS', 1)),
+        'JOB_MAX_ATTEMPTS': int(os.environ.get('JOB_MAX_ATTEMPTS', 5)),
+        'JOB_RETRY_BASE_SECONDS': float(os.environ.get('JOB_RETRY_BASE_SECONDS', 2)),
+        'JOB_RETRY_MAX_SECONDS': float(os.environ.get('JOB_RETRY_MAX_SECONDS', 300)),
+        'JOB_TIMEOUT_SECONDS': int(os.environ.get('JOB_TIMEOUT_SECONDS', 300)),
+        'JOB_REQUEUE_SECONDS': float(os.environ.get('JOB_REQUEUE_SECONDS', 60)),
+
+        # Compiled templates shared by every worker (None = a directory under the system temp dir)
+        'TEMPLATE_CACHE_DIR': os.environ.get('TEMPLATE_CACHE_DIR') or None,
+
+        # Streamed exports: rows fetched per batch, and bytes per response chunk
+        'EXPORT_BATCH_SIZE': int(os.environ.get('EXPORT_BATCH_SIZE', 1000)),
+        'EXPORT_CHUNK_BYTES': int(os.environ.get('EXPORT_CHUNK_BYTES', 64 * 1024)),
+
+        # Whole-page cache for anonymous storefront visitors: pages are fresh for
+        # PAGE_CACHE_SECONDS, then served stale for up to PAGE_CACHE_STALE_SECONDS
+        # more while one background request re-renders them
+        'PAGE_CACHE_ENABLED': os.environ.get('PAGE_CACHE_ENABLED', '1') != '0',
+        'PAGE_CACHE_SIZE': int(os.environ.get('PAGE_CACHE_SIZE', 2000)),
+        'PAGE_CACHE_SECONDS': int(os.environ.get('PAGE_CACHE_SECONDS', 30)),
+        'PAGE_CACHE_STALE_SECONDS': int(os.environ.get('PAGE_CACHE_STALE_SECONDS', 120)),
+
+        # Request metrics served at /metrics; a request that runs one statement more
+        # than METRICS_N_PLUS_ONE_THRESHOLD times is logged as a likely N+1 (0 = off)
+        'METRICS_ENABLED': os.environ.get('METRICS_ENABLED', '1') != '0',
+        'METRICS_N_PLUS_ONE_THRESHOLD': int(os.environ.get('METRICS_N_PLUS_ONE_THRESHOLD', 10)),
+        # With a token, /metrics wants `Authorization: Bearer <token>`; without one
+        # it only answers direct requests from this machine
+        'METRICS_TOKEN': os.environ.get('METRICS_TOKEN') or None,
+
+        # SQLite connection profile: 'production' turns on WAL and the pragmas and
+        # pool sizing below; 'default' keeps SQLite's and SQLAlchemy's own settings
+        'SQLITE_PROFILE': os.environ.get('SQLITE_PROFILE', 'production'),
+        'SQLITE_PRAGMAS': {
+            'journal_mode': 'WAL',          # readers no longer block on a writer (or it on them)
+            'synchronous': 'NORMAL',        # fsync at checkpoints only; safe with WAL
+            'cache_size': -int(os.environ.get('SQLITE_CACHE_KB', 64 * 1024)),  # negative = KiB
+            'mmap_size': int(os.environ.get('SQLITE_MMAP_BYTES', 256 * 1024 * 1024)),
+            'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+            'temp_store': 'MEMORY',
+        },
+        'SQLITE_POOL_OPTIONS': {
+            'pool_size': int(os.environ.get('SQLITE_POOL_SIZE', 16)),
+            'max_overflow': int(os.environ.get('SQLITE_POOL_OVERFLOW', 16)),
+            'pool_timeout': 30,
+            'connect_args': {'check_same_thread': False},
+        },
     }
-    
-    return render_template("admin_dashboard.html", users=users, products=products, 
-                         orders=orders, categories=categories, stats=stats)
 
-@app.route("/admin/add_category", methods=['POST'])
-@login_required
-@role_required(['admin'])
-def add_category():
-    """Add new category"""
-    name = request.form.get('name', '').strip()
-    
-    if not name:
-        flash('Category name is required!', 'danger')
-        return redirect(url_for('admin_dashboard'))
-    
-    if Category.query.filter_by(name=name).first():
-        flash('Category already exists!', 'danger')
-        return redirect(url_for('admin_dashboard'))
-    
-    try:
-        category = Category(name=name)
-        db.session.add(category)
-        db.session.commit()
-        flash('Category added successfully!', 'success')
-    except Exception as e:
-        db.session.rollback()
-        flash('Error adding category.', 'danger')
-    
-    return redirect(url_for('admin_dashboard'))
-
-@app.route("/admin/delete_category/<int:category_id>", methods=['POST'])
-@login_required
-@role_required(['admin'])
-def delete_category(category_id):
-    """Delete category"""
-    category = Category.query.get_or_404(category_id)
-    
-    try:
-        db.session.delete(category)
-        db.session.commit()
-        flash('Category deleted successfully!', 'success')
-    except Exception as e:
-        db.session.rollback()
-        flash('Error deleting category.', 'danger')
-    
-    return redirect(url_for('admin_dashboard'))
-
-@app.route("/admin/edit_product/<int:product_id>", methods=['GET', 'POST'])
-@login_required
-@role_required(['admin'])
-def admin_edit_product(product_id):
-    """Admin edit product"""
-    product = Product.query.get_or_404(product_id)
-    
-    if request.method == 'POST':
-        product.name = request.form.get('name', '').strip()
-        product.description = request.form.get('description', '').strip()
-        product.price = request.form.get('price', type=float)
-        product.stock = request.form.get('stock', type=int, default=0)
-        product.category_id = request.form.get('category_id', type=int)
-        product.image_url = request.form.get('image_url', '').strip()
-        
-        if not product.name or product.price is None:
-            flash('Name and price are required!', 'danger')
-            return redirect(url_for('admin_edit_product', product_id=product_id))
-        
-        try:
-            db.session.commit()
-            flash('Product updated successfully!', 'success')
-            return redirect(url_for('admin_dashboard'))
-        except Exception as e:
-            db.session.rollback()
-            flash('Error updating product. Please try again.', 'danger')
-            return redirect(url_for('admin_edit_product', product_id=product_id))
-    
-    categories = Category.query.all()
-    return render_template("admin_edit_product.html", product=product, categories=categories)
-
-# ==================== CONTEXT PROCESSORS ====================
-
-@app.context_processor
-def inject_cart_count():
-    """Make cart count available in all templates"""
-    cart_count = 0
-    try:
-        if 'user_id' in session:
-            cart_count = CartItem.query.filter_by(user_id=session['user_id']).count()
-    except Exception:
-        # Database not initialized or outside request context
-        pass
-    return dict(cart_count=cart_count)
-
-# ==================== DIAGNOSTIC ROUTES ====================
-
-@app.route("/check_admin")
-def check_admin():
-    """Check admin accounts in database (for debugging)"""
-    try:
-        admins = User.query.filter_by(role='admin').all()
-        result = []
-        for admin in admins:
-            # Test if password works
-            password_works = check_password_hash(admin.password_hash, 'admin123') if admin.password_hash else False
-            result.append({
-                'id': admin.id,
-                'username': admin.username,
-                'email': admin.email,
-                'role': admin.role,
-                'created_at': str(admin.created_at),
-                'password_works': password_works,
-                'has_password_hash': bool(admin.password_hash),
-                'password_hash_preview': admin.password_hash[:30] + '...' if admin.password_hash else 'None'
-            })
-        return jsonify({'admins': result, 'count': len(result)})
-    except Exception as e:
-        return jsonify({'error': str(e), 'admins': [], 'count': 0}), 500
-
-@app.route("/test_login/<username>/<password>")
-def test_login(username, password):
-    """Test login credentials (for debugging)"""
-    try:
-        user = User.query.filter_by(username=username).first()
-        if not user:
-            return jsonify({
-                'success': False,
-                'message': f'User "{username}" not found',
-                'user_exists': False
-            })
-        
-        if not user.password_hash:
-            return jsonify({
-                'success': False,
-                'message': 'User has no password hash',
-                'user_exists': True,
-                'has_password_hash': False
-            })
-        
-        password_correct = check_password_hash(user.password_hash, password)
-        
-        return jsonify({
-            'success': password_correct,
-            'message': 'Password correct' if password_correct else 'Password incorrect',
-            'user_exists': True,
-            'has_password_hash': True,
-            'username': user.username,
-            'role': user.role,
-            'password_hash_preview': user.password_hash[:30] + '...'
-        })
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
-
-@app.route("/fix_admin_account")
-def fix_admin_account():
-    """Fix or create admin account"""
-    try:
-        admin = User.query.filter_by(username='admin').first()
-        
-        if admin:
-            # Update existing admin
-            admin.password_hash = generate_password_hash('admin123')
-            admin.password_plain = 'admin123'
-            admin.role = 'admin'
-            admin.email = 'admin@example.com'
-            db.session.commit()
-            
-            # Verify it works
-            admin_check = User.query.filter_by(username='admin').first()
-            password_works = check_password_hash(admin_check.password_hash, 'admin123')
-            
-            return f"""Admin account updated!<br>
-            Username: admin<br>
-            Password: admin123<br>
-            Password verified: {'Yes' if password_works else 'No'}<br>
-            <a href='/login'>Go to Login</a>"""
-        else:
-            # Create new admin
-            admin = User(
-                username='admin',
-                email='admin@example.com',
-                password_hash=generate_password_hash('admin123'),
-                password_plain='admin123',
-                role='admin'
-            )
-            db.session.add(admin)
-            db.session.commit()
-            
-            # Verify it works
-            admin_check = User.query.filter_by(username='admin').first()
-            password_works = check_password_hash(admin_check.password_hash, 'admin123')
-            
-            return f"""Admin account created!<br>
-            Username: admin<br>
-            Password: admin123<br>
-            Password verified: {'Yes' if password_works else 'No'}<br>
-            <a href='/login'>Go to Login</a>"""
-    except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        return f"Error fixing admin account: {str(e)}<br><pre>{error_details}</pre><br><a href='/admin_fix'>Go to Admin Fix Page</a>"
-
-@app.route("/admin_fix")
-def admin_fix():
-    """Admin account diagnostic and fix page"""
-    return render_template("admin_fix.html")
-
-@app.route("/migrate_password_plain")
-def migrate_password_plain():
-    """Migrate database to add password_plain column"""
-    try:
+def apply_sqlite_profile(engine, pragmas):
+    """Run the profile's PRAGMAs on every new connection the engine opens"""
+    @db.event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
+def warm_up(app):
+    """Do the one-off work the first request would otherwise pay for: set up
+    the ORM mappers and load every template.
+
+    Compiled templates are kept in a bytecode cache on disk, so only the
+    first worker to start after a template changes compiles it.
+    """
+    configure_mappers()
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['TEMPLATE_CACHE_DIR'])
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
+
+def create_app(config=None):
+    """Build and configure an app instance.
+
+    Nothing here touches the database: connections are opened by the first
+    request, and schema changes are applied by `flask init-database` (or
+    `flask migrate`), not on every worker start. Mappers and templates are
+    set up here, so the first request costs no more than the ones after it.
+    """
+    app = Flask(__name__)
+    app.config.from_mapping(default_config())
+    if config:
+        app.config.from_mapping(config)
+
+    # Set secret key for session management (must be the same in every worker)
+    app.secret_key = app.config.get('SECRET_KEY') or load_secret_key(app)
+
+    production = app.config['SQLITE_PROFILE'] == 'production'
+    if production:
+        app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', app.config['SQLITE_POOL_OPTIONS'])
+    db.init_app(app)
+    if production:
         with app.app_context():
-            # Check if column exists
-            from sqlalchemy import inspect, text
-            inspector = inspect(db.engine)
-            columns = [col['name'] for col in inspector.get_columns('user')]
-            
-            if 'password_plain' not in columns:
-                # Add the column using raw SQL (SQLite compatible)
-                with db.engine.connect() as conn:
-                    conn.execute(text('ALTER TABLE user ADD COLUMN password_plain VARCHAR(255)'))
-                    conn.commit()
-                return "Migration successful! password_plain column added.<br><a href='/admin/dashboard'>Go to Admin Dashboard</a>"
-            else:
-                return "Column already exists. No migration needed.<br><a href='/admin/dashboard'>Go to Admin Dashboard</a>"
-    except Exception as e:
-        return f"Migration error: {str(e)}<br><a href='/admin/dashboard'>Go to Admin Dashboard</a>"
-
-@app.route("/reset_admin_password", methods=['POST'])
-def reset_admin_password():
-    """Reset admin password (for debugging - remove in production)"""
-    username = request.form.get('username', 'admin').strip()
-    new_password = request.form.get('password', '').strip()
-    
-    if not new_password:
-        return jsonify({'success': False, 'message': 'Password required'}), 400
-    
-    admin = User.query.filter_by(username=username, role='admin').first()
-    if not admin:
-        return jsonify({'success': False, 'message': 'Admin user not found'}), 404
-    
-    try:
-        admin.password_hash = generate_password_hash(new_password)
-        admin.password_plain = new_password  # Update plain text password
-        db.session.commit()
-        return jsonify({'success': True, 'message': f'Password reset for {username}. You can now login with the new password.'})
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
-
-# ==================== INITIALIZATION ====================
-
-@app.route("/init_db")
-def init_db():
-    """Initialize database with sample data"""
-    with app.app_context():
-        db.drop_all()
-        db.create_all()
-        
-        # Create admin user
-        admin = User(
-            username='admin',
-            email='admin@example.com',
-            password_hash=generate_password_hash('admin123'),
-            password_plain='admin123',  # Store plain text password for admin viewing
-            role='admin'
-        )
-        db.session.add(admin)
-        
-        # Create sample users
-        buyer = User(
-            username='buyer1',
-            email='buyer1@example.com',
-            password_hash=generate_password_hash('buyer123'),
-            password_plain='buyer123',  # Store plain text password for admin viewing
-            role='buyer'
-        )
-        seller = User(
-            username='seller1',
-            email='seller1@example.com',
-            password_hash=generate_password_hash('seller123'),
-            password_plain='seller123',  # Store plain text password for admin viewing
-            role='seller'
-        )
-        db.session.add(buyer)
-        db.session.add(seller)
-        db.session.commit()
-        
-        # Create categories
-        categories = [
-            Category(name='Electronics'),
-            Category(name='Clothing'),
-            Category(name='Books'),
-            Category(name='Home & Garden'),
-            Category(name='Sports')
-        ]
-        for cat in categories:
-            db.session.add(cat)
-        db.session.commit()
-        
-        # Create sample products
-        products = [
-            Product(name='Laptop', description='High-performance laptop', price=800, stock=10, 
-                   category_id=1, seller_id=seller.id, 
-                   image_url='https://via.placeholder.com/300x200?text=Laptop'),
-            Product(name='T-Shirt', description='Comfortable cotton t-shirt', price=25, stock=50,
-                   category_id=2, seller_id=seller.id,
-                   image_url='https://via.placeholder.com/300x200?text=T-Shirt'),
-            Product(name='Python Book', description='Learn Python programming', price=35, stock=20,
-                   category_id=3, seller_id=seller.id,
-                   image_url='https://via.placeholder.com/300x200?text=Book')
-        ]
-        for product in products:
-            db.session.add(product)
-        db.session.commit()
-        
-    return "Database initialized with sample data!<br><a href='/'>Go to Home</a>"
+            if db.engine.dialect.name == 'sqlite':
+                apply_sqlite_profile(db.engine, app.config['SQLITE_PRAGMAS'])
 
-# Initialize database tables if they don't exist
-def init_database():
-    """Initialize database tables and create default admin user"""
-    with app.app_context():
-        try:
-            # Check if tables exist by inspecting the database
-            from sqlalchemy import inspect
-            inspector = inspect(db.engine)
-            existing_tables = inspector.get_table_names()
+    init_caches(app)
+    if app.config['METRICS_ENABLED']:
+        init_metrics(app)
+    # After the metrics hooks, so cache hits are still timed and counted
+    if app.config['PAGE_CACHE_ENABLED']:
+        init_page_cache(app)
 
-            # Required tables
-            required_tables = ['user', 'category', 'product', 'cart_item', 'order', 'order_item']
+    register_blueprints(app)
+    register_commands(app)
+    warm_up(app)
+    return app
 
-            # Check if all required tables exist with correct structure
-            if not all(table in existing_tables for table in required_tables):
-                print("Creating database tables...")
-                db.create_all()
-                print("Database tables created successfully!")
-            else:
-                # Verify table structure by trying a simple query
-                try:
-                    User.query.limit(1).all()
-                    print("Database already initialized and verified.")
-                except Exception as verify_error:
-                    # Schema mismatch - recreate tables
-                    print(f"Schema mismatch detected: {verify_error}")
-                    print("Recreating database tables...")
-                    db.drop_all()
-                    db.create_all()
-                    print("Database tables recreated successfully!")
+# ==================== CLI COMMANDS ====================
 
-            # Ensure admin user exists
-            admin_user = User.query.filter_by(username='admin').first()
-            if not admin_user:
-                print("Creating default admin user...")
-                admin = User(
-                    username='admin',
-                    email='admin@example.com',
-                    password_hash=generate_password_hash('admin123'),
-                    password_plain='admin123',  # Store plain text password for admin viewing
-                    role='admin'
-                )
-                db.session.add(admin)
-                db.session.commit()
-                print("Default admin user created successfully!")
-                print("Username: admin")
-                print("Password: admin123")
-            else:
-                print("Admin user already exists.")
+def register_commands(app):
+    """Attach the maintenance commands to `flask --app app ...`"""
 
-        except Exception as e:
-            # If inspection fails, try to create tables anyway
-            print(f"Checking database... Error: {e}")
-            try:
-                db.create_all()
-                print("Database tables created successfully!")
-            except Exception as create_error:
-                print(f"Error creating tables: {create_error}")
-                print("Please visit /init_db to initialize the database manually.")
+    @app.cli.command('init-database')
+    def init_database_command():
+        """Apply pending migrations and make sure the default admin user exists; status 1 on failure"""
+        try:
+            init_database()
+        except Exception:
+            # init_database has already printed the error; gunicorn's on_starting stops on this
+            sys.exit(1)
+
+    @app.cli.command('migrate')
+    def migrate_command():
+        """Apply pending schema migrations"""
+        applied = migrate_database()
+        for version, description in applied:
+            print(f"Applied migration {version}: {description}")
+        print(f"Database schema is at version {schema_version()}.")
+
+    @app.cli.command('check-schema')
+    def check_schema_command():
+        """Exit with status 1 if the database is behind the latest migration"""
+        current, latest = schema_version(), MIGRATIONS[-1][0]
+        print(f"Database schema is at version {current} (latest {latest}).")
+        if current < latest:
+            sys.exit(1)
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Rebuild the product full-text search index from the product table"""
+        with db.engine.begin() as conn:
+            rebuild_search_index(conn)
+        print("Product search index rebuilt.")
+
+    @app.cli.command('backfill-ratings')
+    def backfill_ratings_command():
+        """Recompute product rating totals from the review table"""
+        with db.engine.begin() as conn:
+            backfill_ratings(conn)
+        print("Product ratings backfilled.")
+
+    @app.cli.command('rebuild-sales-rollup')
+    def rebuild_sales_rollup_command():
+        """Recompute the per-seller daily sales rollup from the order history"""
+        with db.engine.begin() as conn:
+            rebuild_sales_rollup(conn)
+        print("Seller sales rollup rebuilt.")
+
+    @app.cli.command('rebuild-seller-orders')
+    def rebuild_seller_orders_command():
+        """Recompute the seller_order index from the order history"""
+        with db.engine.begin() as conn:
+            rebuild_seller_orders(conn)
+        print("Seller order index rebuilt.")
+
+    @app.cli.command('generate-data')
+    @click.option('--users', default=10000, show_default=True, help='Accounts to add, sellers included')
+    @click.option('--sellers', type=int, help='How many of the users sell  [default: users / 20]')
+    @click.option('--products', default=20000, show_default=True)
+    @click.option('--orders', default=20000, show_default=True)
+    @click.option('--reviews', type=int, help='[default: products / 2]')
+    @click.option('--wishlist', type=int, help='Wishlist entries  [default: users]')
+    @click.option('--carts', type=int, help='Buyers with a cart  [default: users / 10]')
+    @click.option('--days', default=365, show_default=True, help='How far back order history goes')
+    @click.option('--seed', default=0, show_default=True, help='Random seed; the same seed gives the same data')
+    @click.option('--chunk-size', default=5000, show_default=True, help='Rows per executemany')
+    def generate_data_command(users, sellers, **options):
+        """Bulk-load synthetic users, products, orders, reviews, wishlists and carts"""
+        from datagen import generate_dataset
+
+        sellers = sellers if sellers is not None else max(1, users // 20)
+        if not 0 < sellers < users:
+            raise click.BadParameter('need at least one seller and one buyer', param_hint='--sellers')
+        migrate_database()
+        with db.engine.begin() as conn:
+            generate_dataset(conn, users=users, sellers=sellers, **options)
+        print("Synthetic data loaded.")
+
+    @app.cli.command('import-products')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+    @click.option('--seller', required=True, help='Username of the seller the products belong to')
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help='[default: from the file extension]')
+    @click.option('--chunk-size', type=int, help='Rows per transaction  [default: IMPORT_CHUNK_SIZE]')
+    def import_products_command(path, seller, fmt, chunk_size):
+        """Create or update a seller's products from a CSV or NDJSON file, upserting by SKU"""
+        from imports import import_format, import_products
+
+        fmt = fmt or import_format(filename=path)
+        if fmt is None:
+            raise click.BadParameter('cannot tell the format from the file name', param_hint='--format')
+        user = User.query.filter_by(username=seller).first()
+        if user is None or user.role != 'seller':
+            raise click.BadParameter(f'no seller called {seller!r}', param_hint='--seller')
+
+        def progress(report):
+            print(f'  {report.rows:>10,} rows  {report.inserted:,} added  {report.updated:,} updated  '
+                  f'{report.failed:,} failed', end='\r')
+
+        with click.open_file(path, 'rb') as stream:
+            report = import_products(stream, user.id, fmt, chunk_size, progress)
+        summary = report.to_dict()
+        print(f"\nImported {summary['rows']:,} rows in {summary['seconds']:.1f}s ({summary['rows_per_second']:,} rows/s): "
+              f"{summary['inserted']:,} added, {summary['updated']:,} updated, {summary['failed']:,} failed.")
+        for error in summary['errors']:
+            print(f"  line {error['line']}: {error['error']}")
+        if report.failed:
+            sys.exit(1)
+
+    @app.cli.command('run-jobs')
+    @click.option('--burst', is_flag=True, help='Run the jobs that are due now, then exit')
+    @click.option('--workers', type=int, help='Worker threads  [default: JOB_WORKERS]')
+    def run_jobs_command(burst, workers):
+        """Work through the background job queue"""
+        if burst:
+            print(f"Ran {run_jobs()} job(s).")
+            return
+        threads = start_job_workers(app, workers)
+        print(f"Running {len(threads)} job worker(s); Ctrl+C to stop.")
+        for thread in threads:
+            thread.join()
+
+    @app.cli.command('sweep-reservations')
+    def sweep_reservations_command():
+        """Release every expired stock reservation"""
+        print(f"Expired {sweep_reservations()} reservation(s).")
 
 if __name__ == "__main__":
-    init_database()
+    app = create_app()
+    # The development server sets up the database itself; production runs `flask init-database`
+    with app.app_context():
+        try:
+            init_database()
+        except Exception:
+            # The error is already printed; keep serving so it can be fixed with the server up
+            pass
+    # With the debug reloader, only the child process that serves requests sweeps and runs jobs
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_reservation_sweeper(app)
+        start_job_workers(app)
     app.run(debug=True)
@@ -0,0 +1,168 @@
+"""Per-route benchmark suite over a synthetic (or existing) dataset.
+
+Drives the main pages through the Flask test client as real accounts and
+reports throughput and p50/p95/p99 latency per route. Without --database
+a throwaway database is filled by the synthetic data generator first;
+point --database at a copy of a database filled with
+`flask generate-data` to benchmark at scale. Product pages are picked
+with the same Zipfian skew the generator uses, so caches see a realistic
+mix of hot and cold products.
+
+    python bench_routes.py
+    python bench_routes.py --requests 500 --routes products,product_detail
+    python bench_routes.py --database /tmp/big.db --json results.json
+
+Exits with status 1 if any request got an unexpected response.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROUTES = ['home', 'products', 'product_detail', 'cart', 'checkout', 'orders', 'seller_dashboard', 'admin_dashboard']
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def prepare(app, args):
+    """Fill an empty database with synthetic data; pick the accounts and products to use"""
+    from datagen import ZipfSampler, generate_dataset
+    from migrations import init_database
+    from models import db, User, Product
+
+    with app.app_context():
+        init_database()
+        if Product.query.count() == 0:
+            with db.engine.begin() as conn:
+                generate_dataset(conn, users=args.users, products=args.products, orders=args.orders,
+                                 seed=args.seed, progress=lambda line: print(f'  {line}'))
+        accounts = {}
+        for role in ('buyer', 'seller', 'admin'):
+            # The busiest seller makes the seller dashboard worth measuring
+            query = User.query.filter_by(role=role)
+            if role == 'seller':
+                query = query.outerjoin(Product, Product.seller_id == User.id).group_by(User.id).order_by(
+                    db.func.count(Product.id).desc())
+            user = query.first()
+            accounts[role] = {'user_id': user.id, 'username': user.username, 'role': user.role,
+                              'user_version': user.version, 'auth_checked_at': int(time.time())}
+        # Checkout needs products it can actually sell
+        in_stock = [row[0] for row in db.session.query(Product.id).filter(Product.stock > 1000)]
+        if not in_stock:
+            in_stock = [row[0] for row in db.session.query(Product.id).limit(100)]
+            db.session.query(Product).filter(Product.id.in_(in_stock)).update(
+                {Product.stock: 10 ** 9}, synchronize_session=False)
+            db.session.commit()
+        product_ids = [row[0] for row in db.session.query(Product.id)]
+    rng = random.Random(args.seed)
+    return accounts, ZipfSampler(product_ids, rng), in_stock, rng
+
+
+def make_client(app, account):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess.update(account)
+    return client
+
+
+def route_requests(name, clients, popular, in_stock, rng):
+    """(client, method, path, data, expected status, setup) for one request to `name`"""
+    if name == 'home':
+        return clients['buyer'], 'GET', '/', None, 200, None
+    if name == 'products':
+        query = rng.choice(['', '?sort=price_low', '?search=lamp', f'?category={rng.randint(1, 5)}'])
+        return clients['buyer'], 'GET', '/products' + query, None, 200, None
+    if name == 'product_detail':
+        return clients['buyer'], 'GET', f'/product/{popular.sample()[0]}', None, 200, None
+    if name == 'cart':
+        return clients['buyer'], 'GET', '/cart', None, 200, None
+    if name == 'checkout':
+        product_id = rng.choice(in_stock)
+
+        def fill_cart():
+            clients['buyer'].post(f'/add_to_cart/{product_id}', data={'quantity': 1})
+        return clients['buyer'], 'POST', '/checkout', {'shipping_address': '1 Bench Street'}, 302, fill_cart
+    if name == 'orders':
+        return clients['buyer'], 'GET', '/orders', None, 200, None
+    if name == 'seller_dashboard':
+        return clients['seller'], 'GET', '/seller/dashboard', None, 200, None
+    if name == 'admin_dashboard':
+        return clients['admin'], 'GET', '/admin/dashboard', None, 200, None
+    raise ValueError(f'unknown route {name}')
+
+
+def run(app, args):
+    accounts, popular, in_stock, rng = prepare(app, args)
+    clients = {role: make_client(app, account) for role, account in accounts.items()}
+    results, failures = {}, []
+    for name in args.routes:
+        timings = []
+        for n in range(args.warmup + args.requests):
+            client, method, path, data, expected, setup = route_requests(name, clients, popular, in_stock, rng)
+            if setup:
+                setup()
+            started = time.perf_counter()
+            response = client.open(path, method=method, data=data)
+            elapsed = time.perf_counter() - started
+            if response.status_code != expected:
+                failures.append(f'{name}: {method} {path} -> {response.status_code}')
+                continue
+            if n >= args.warmup:
+                timings.append(elapsed)
+        total = sum(timings)
+        results[name] = {
+            'requests': len(timings),
+            'throughput': len(timings) / total if total else 0.0,
+            'p50_ms': percentile(timings, 0.50) * 1000,
+            'p95_ms': percentile(timings, 0.95) * 1000,
+            'p99_ms': percentile(timings, 0.99) * 1000,
+        }
+    return results, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per route')
+    parser.add_argument('--warmup', type=int, default=10, help='untimed requests per route first')
+    parser.add_argument('--routes', default=','.join(ROUTES), help='comma-separated subset of: ' + ', '.join(ROUTES))
+    parser.add_argument('--database', help='SQLite file to use (default: a temporary file)')
+    parser.add_argument('--users', type=int, default=5000, help='generated users for a new database')
+    parser.add_argument('--products', type=int, default=20000, help='generated products for a new database')
+    parser.add_argument('--orders', type=int, default=20000, help='generated orders for a new database')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+    args.routes = [name.strip() for name in args.routes.split(',') if name.strip()]
+    unknown = set(args.routes) - set(ROUTES)
+    if unknown:
+        parser.error(f'unknown route(s): {", ".join(sorted(unknown))}')
+
+    database = args.database or os.path.join(tempfile.mkdtemp(prefix='ecomm-bench-'), 'bench.db')
+    # Set before the app is built
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(database)
+    from app import create_app
+
+    print(f'Database: {database}')
+    results, failures = run(create_app({'METRICS_N_PLUS_ONE_THRESHOLD': 0}), args)
+
+    print(f"{'route':18} {'req':>6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, row in results.items():
+        print(f"{name:18} {row['requests']:6d} {row['throughput']:9.1f} "
+              f"{row['p50_ms']:9.1f} {row['p95_ms']:9.1f} {row['p99_ms']:9.1f}")
+    print(f"errors {len(failures)}" + (f" (first: {failures[0]})" if failures else ''))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'routes': results, 'errors': failures}, f, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""Mixed read/write benchmark for the SQLite connection profiles.
+
+Seeds a throwaway database with a catalogue and a set of buyers, then runs
+reader threads (home, product list and product pages) next to writer
+threads (add to cart) for a fixed time and reports requests per second and
+latency for each side. With --profile both, each profile runs in its own
+process against its own copy of the data.
+
+    python bench_sqlite_profile.py
+    python bench_sqlite_profile.py --readers 8 --writers 4 --seconds 20
+    python bench_sqlite_profile.py --profile production
+
+Exits with status 1 if any request failed (e.g. 'database is locked').
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+PROFILES = ['default', 'production']
+_app = None
+
+
+def get_app():
+    """The app for this process, built on first use once the environment is set"""
+    global _app
+    if _app is None:
+        from app import create_app
+        _app = create_app()
+    return _app
+
+
+def seed(products, buyers):
+    """Create a seller's catalogue and the buyers the writers log in as"""
+    from models import db, User, Product
+    from migrations import migrate_database
+
+    app = get_app()
+
+    with app.app_context():
+        db.drop_all()
+        migrate_database()
+        seller = User(username='bench-seller', email='bench-seller@example.com', password_hash='x', role='seller')
+        db.session.add(seller)
+        db.session.flush()
+        db.session.execute(db.insert(Product), [
+            {'name': f'Bench Product {n}', 'description': 'benchmark item', 'price': 1 + n % 50,
+             'stock': 10 ** 9, 'seller_id': seller.id}
+            for n in range(products)
+        ])
+        db.session.execute(db.insert(User), [
+            {'username': f'bench-buyer-{n}', 'email': f'bench-buyer-{n}@example.com',
+             'password_hash': 'x', 'role': 'buyer'}
+            for n in range(buyers)
+        ])
+        db.session.commit()
+        product_ids = [row[0] for row in db.session.query(Product.id)]
+        buyer_ids = [row[0] for row in db.session.query(User.id).filter_by(role='buyer')]
+    return product_ids, buyer_ids
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_profile(args):
+    """Run the workload in this process with the profile already set in the environment"""
+    app = get_app()
+
+    product_ids, buyer_ids = seed(args.products, args.readers + args.writers)
+    deadline = time.perf_counter() + args.seconds
+    results = {'read': [], 'write': []}
+    errors = []
+    lock = threading.Lock()
+
+    def worker(kind, buyer_id):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = buyer_id
+            sess['username'] = f'bench-buyer-{buyer_id}'
+            sess['role'] = 'buyer'
+        rng = random.Random(buyer_id)
+        timings = []
+        while time.perf_counter() < deadline:
+            product_id = rng.choice(product_ids)
+            started = time.perf_counter()
+            try:
+                if kind == 'write':
+                    response = client.post(f'/add_to_cart/{product_id}', data={'quantity': 1})
+                    ok = response.status_code == 302
+                else:
+                    path = rng.choice(['/', '/products', f'/product/{product_id}'])
+                    response = client.get(path)
+                    ok = response.status_code == 200
+            except Exception as e:
+                ok, response = False, e
+            if not ok:
+                with lock:
+                    errors.append(f'{kind}: {response}')
+                continue
+            timings.append(time.perf_counter() - started)
+        with lock:
+            results[kind].extend(timings)
+
+    threads = [threading.Thread(target=worker, args=('read', buyer_ids[n])) for n in range(args.readers)]
+    threads += [threading.Thread(target=worker, args=('write', buyer_ids[args.readers + n])) for n in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(f"[{os.environ['SQLITE_PROFILE']}] {args.readers} readers, {args.writers} writers, {args.seconds}s")
+    for kind in ('read', 'write'):
+        timings = results[kind]
+        print(f"  {kind:5}  {len(timings) / args.seconds:8.1f} req/s  "
+              f"p50 {percentile(timings, 0.50) * 1000:7.1f} ms  "
+              f"p95 {percentile(timings, 0.95) * 1000:7.1f} ms  "
+              f"p99 {percentile(timings, 0.99) * 1000:7.1f} ms")
+    print(f"  errors {len(errors)}" + (f" (first: {errors[0]})" if errors else ''))
+    return 1 if errors else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--profile', choices=PROFILES + ['both'], default='both')
+    parser.add_argument('--readers', type=int, default=8, help='reader threads')
+    parser.add_argument('--writers', type=int, default=4, help='writer threads')
+    parser.add_argument('--seconds', type=float, default=10, help='how long each profile runs')
+    parser.add_argument('--products', type=int, default=2000, help='catalogue size')
+    parser.add_argument('--database', help='SQLite file to use (default: a temporary file)')
+    args = parser.parse_args()
+
+    if args.profile == 'both':
+        # The profile is read when the app is imported, so each one gets a fresh process
+        status = 0
+        for profile in PROFILES:
+            command = [sys.executable, __file__, '--profile', profile,
+                       '--readers', str(args.readers), '--writers', str(args.writers),
+                       '--seconds', str(args.seconds), '--products', str(args.products)]
+            status |= subprocess.call(command)
+        return status
+
+    database = args.database or os.path.join(tempfile.mkdtemp(prefix='ecomm-bench-'), 'bench.db')
+    # Set before the app is imported
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(database)
+    os.environ['SQLITE_PROFILE'] = args.profile
+    return run_profile(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
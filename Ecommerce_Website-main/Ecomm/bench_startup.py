@@ -0,0 +1,85 @@
+"""Cold-start benchmark: how long a fresh worker takes to serve its first page.
+
+Each run starts a new Python process on an already-migrated database and
+times three steps: importing the app module, create_app(), and the first
+GET / through the test client. The median over all runs is reported.
+
+    python bench_startup.py
+    python bench_startup.py --runs 20 --budget-ms 1500
+
+Exits with status 1 if the median total exceeds --budget-ms (default
+BUDGET_MS); test_startup runs it with the default budget.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Runs inside the child process; prints one JSON line of timings in milliseconds
+CHILD = '''
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app()
+created = time.perf_counter()
+status = application.test_client().get('/').status_code
+served = time.perf_counter()
+print(json.dumps({
+    'import': (imported - started) * 1000,
+    'create_app': (created - imported) * 1000,
+    'first_request': (served - created) * 1000,
+    'total': (served - started) * 1000,
+    'status': status,
+}))
+'''
+
+STEPS = ['import', 'create_app', 'first_request', 'total']
+
+# Median milliseconds from `import app` to the first response
+BUDGET_MS = 1200
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=10, help='fresh processes to time')
+    parser.add_argument('--budget-ms', type=float, default=BUDGET_MS,
+                        help='fail if the median total is above this  [default: %(default)s]')
+    args = parser.parse_args(argv)
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    workdir = tempfile.mkdtemp(prefix='ecomm-startup-')
+    env = dict(os.environ,
+               DATABASE_URL='sqlite:///' + os.path.join(workdir, 'startup.db'),
+               SECRET_KEY_FILE=os.path.join(workdir, 'secret_key'))
+    # Migrating is a deploy step, not part of a worker's start
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'init-database'],
+                   cwd=here, env=env, check=True, capture_output=True)
+
+    samples = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, '-c', CHILD], cwd=here, env=env,
+                                check=True, capture_output=True, text=True).stdout
+        sample = json.loads(output.strip().splitlines()[-1])
+        if sample['status'] != 200:
+            print(f"First request answered {sample['status']}")
+            return 1
+        samples.append(sample)
+
+    print(f"{args.runs} cold starts (median / max)")
+    for step in STEPS:
+        values = [sample[step] for sample in samples]
+        print(f"  {step:14} {statistics.median(values):8.1f} ms  {max(values):8.1f} ms")
+
+    median_total = statistics.median(sample['total'] for sample in samples)
+    if median_total > args.budget_ms:
+        print(f"FAIL: median start {median_total:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
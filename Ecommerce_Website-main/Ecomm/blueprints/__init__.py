@@ -0,0 +1,6 @@
+"""The app's routes, one blueprint per area of the shop"""
+from blueprints import admin, cart, diagnostics, seller, storefront
+
+def register_blueprints(app):
+    for module in (storefront, cart, seller, admin, diagnostics):
+        app.register_blueprint(module.bp)
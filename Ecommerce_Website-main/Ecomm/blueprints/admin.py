@@ -0,0 +1,237 @@
+"""Admin dashboard, user and catalogue management"""
+
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+
+from models import db, User, Category, Product, Order
+from caching import (
+    cached_categories, bump_product_version, forget_product, forget_categories, invalidate_pages, product_tags
+)
+from helpers import bump_user_version, login_required, role_required, paginate_keyset
+from exports import export_response
+
+bp = Blueprint('admin', __name__)
+
+# ==================== ADMIN ROUTES ====================
+
+@bp.route("/admin/dashboard")
+@login_required
+@role_required(['admin'])
+def admin_dashboard():
+    """Admin dashboard (user and product tables load from the JSON endpoints below)"""
+    orders = Order.query.options(db.joinedload(Order.buyer)).order_by(Order.created_at.desc()).limit(10).all()
+    categories = cached_categories()
+    
+    # All four totals in one round trip, counted and summed by SQLite
+    total_users, total_products, total_orders, total_revenue = db.session.query(
+        db.select(db.func.count(User.id)).scalar_subquery(),
+        db.select(db.func.count(Product.id)).scalar_subquery(),
+        db.select(db.func.count(Order.id)).scalar_subquery(),
+        db.select(db.func.coalesce(db.func.sum(Order.total_amount), 0)).where(
+            Order.status == 'Delivered'
+        ).scalar_subquery()
+    ).one()
+    stats = {
+        'total_users': total_users,
+        'total_products': total_products,
+        'total_orders': total_orders,
+        'total_revenue': total_revenue
+    }
+    
+    return render_template("admin_dashboard.html", orders=orders, categories=categories, stats=stats)
+
+ADMIN_PAGE_SIZE = 50
+
+ADMIN_USER_SORTS = {
+    'id': User.id,
+    'username': User.username,
+    'email': User.email,
+    'role': User.role,
+    'created_at': User.created_at,
+}
+
+ADMIN_PRODUCT_SORTS = {
+    'id': Product.id,
+    'name': Product.name,
+    'price': Product.price,
+    'stock': Product.stock,
+    'created_at': Product.created_at,
+}
+
+def admin_page_args(sorts):
+    """Read sort, dir, cursor and limit for an admin table endpoint"""
+    sort = request.args.get('sort', 'id')
+    if sort not in sorts:
+        sort = 'id'
+    ascending = request.args.get('dir', 'asc') != 'desc'
+    limit = min(max(request.args.get('limit', ADMIN_PAGE_SIZE, type=int), 1), 200)
+    return sort, ascending, request.args.get('cursor'), limit
+
+@bp.route("/admin/api/users")
+@login_required
+@role_required(['admin'])
+def admin_users_api():
+    """One page of the admin user table as JSON"""
+    sort, ascending, cursor, limit = admin_page_args(ADMIN_USER_SORTS)
+    users_query = db.session.query(
+        User.id, User.username, User.email, User.role, User.created_at, User.password_plain
+    )
+    rows, next_cursor = paginate_keyset(
+        users_query, f'users:{sort}:{ascending}', ADMIN_USER_SORTS[sort], User.id, ascending, cursor, limit
+    )
+    return jsonify({
+        'items': [{
+            'id': row.id,
+            'username': row.username,
+            'email': row.email,
+            'role': row.role,
+            'created_at': row.created_at.strftime('%Y-%m-%d') if row.created_at else None,
+            'password_plain': row.password_plain
+        } for row in rows],
+        'next_cursor': next_cursor
+    })
+
+@bp.route("/admin/api/products")
+@login_required
+@role_required(['admin'])
+def admin_products_api():
+    """One page of the admin product table as JSON"""
+    sort, ascending, cursor, limit = admin_page_args(ADMIN_PRODUCT_SORTS)
+    products_query = db.session.query(
+        Product.id, Product.name, Product.price, Product.stock,
+        User.username.label('seller'), Category.name.label('category')
+    ).join(User, Product.seller_id == User.id).outerjoin(Category, Product.category_id == Category.id)
+    rows, next_cursor = paginate_keyset(
+        products_query, f'products:{sort}:{ascending}', ADMIN_PRODUCT_SORTS[sort], Product.id, ascending, cursor, limit
+    )
+    return jsonify({
+        'items': [{
+            'id': row.id,
+            'name': row.name,
+            'price': row.price,
+            'stock': row.stock,
+            'seller': row.seller,
+            'category': row.category
+        } for row in rows],
+        'next_cursor': next_cursor
+    })
+
+@bp.route("/admin/export/<kind>")
+@login_required
+@role_required(['admin'])
+def admin_export(kind):
+    """Stream every product, order line or review as CSV / NDJSON (`seller` narrows it to one seller)"""
+    seller_id = request.args.get('seller', type=int)
+    if seller_id is None and request.args.get('seller'):
+        return jsonify({'success': False, 'message': 'seller must be a user id'}), 400
+    return export_response(kind, request.args, seller_id=seller_id)
+
+@bp.route("/admin/add_category", methods=['POST'])
+@login_required
+@role_required(['admin'])
+def add_category():
+    """Add new category"""
+    name = request.form.get('name', '').strip()
+    
+    if not name:
+        flash('Category name is required!', 'danger')
+        return redirect(url_for('admin.admin_dashboard'))
+    
+    if Category.query.filter_by(name=name).first():
+        flash('Category already exists!', 'danger')
+        return redirect(url_for('admin.admin_dashboard'))
+    
+    try:
+        category = Category(name=name)
+        db.session.add(category)
+        db.session.commit()
+        forget_categories()
+        invalidate_pages('categories')
+        flash('Category added successfully!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash('Error adding category.', 'danger')
+    
+    return redirect(url_for('admin.admin_dashboard'))
+
+@bp.route("/admin/delete_category/<int:category_id>", methods=['POST'])
+@login_required
+@role_required(['admin'])
+def delete_category(category_id):
+    """Delete category"""
+    category = Category.query.get_or_404(category_id)
+    
+    try:
+        db.session.delete(category)
+        db.session.commit()
+        forget_categories()
+        invalidate_pages('categories', f'category:{category_id}')
+        flash('Category deleted successfully!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash('Error deleting category.', 'danger')
+    
+    return redirect(url_for('admin.admin_dashboard'))
+
+@bp.route("/admin/change_role/<int:user_id>", methods=['POST'])
+@login_required
+@role_required(['admin'])
+def change_user_role(user_id):
+    """Change a user's role.
+
+    Sessions on this worker see the change at once; other workers poll for
+    it every AUTH_SYNC_SECONDS (see sync_user_versions).
+    """
+    user = User.query.get_or_404(user_id)
+    new_role = request.form.get('role', '').strip()
+    
+    if new_role not in ['buyer', 'seller', 'admin']:
+        flash('Invalid role.', 'danger')
+        return redirect(url_for('admin.admin_dashboard'))
+    
+    if user.role != new_role:
+        try:
+            user.role = new_role
+            # Sessions that cached the old role must look it up again
+            bump_user_version(user)
+            db.session.commit()
+            flash(f'{user.username} is now a {new_role}.', 'success')
+        except Exception as e:
+            db.session.rollback()
+            flash('Error changing role.', 'danger')
+    
+    return redirect(url_for('admin.admin_dashboard'))
+
+@bp.route("/admin/edit_product/<int:product_id>", methods=['GET', 'POST'])
+@login_required
+@role_required(['admin'])
+def admin_edit_product(product_id):
+    """Admin edit product"""
+    product = Product.query.get_or_404(product_id)
+    
+    if request.method == 'POST':
+        old_category_id = product.category_id
+        product.name = request.form.get('name', '').strip()
+        product.description = request.form.get('description', '').strip()
+        product.price = request.form.get('price', type=float)
+        product.stock = request.form.get('stock', type=int, default=0)
+        product.category_id = request.form.get('category_id', type=int)
+        product.image_url = request.form.get('image_url', '').strip()
+        bump_product_version(product)
+        
+        if not product.name or product.price is None:
+            flash('Name and price are required!', 'danger')
+            return redirect(url_for('admin.admin_edit_product', product_id=product_id))
+        
+        try:
+            db.session.commit()
+            forget_product(product_id)
+            invalidate_pages(*product_tags(product), f'category:{old_category_id}')
+            flash('Product updated successfully!', 'success')
+            return redirect(url_for('admin.admin_dashboard'))
+        except Exception as e:
+            db.session.rollback()
+            flash('Error updating product. Please try again.', 'danger')
+            return redirect(url_for('admin.admin_edit_product', product_id=product_id))
+    
+    categories = cached_categories()
+    return render_template("admin_edit_product.html", product=product, categories=categories)
@@ -0,0 +1,312 @@
+"""Cart, checkout and order pages"""
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash, jsonify, session
+
+from models import db, Product, CartItem, Order, OrderItem, SellerOrder
+from caching import invalidate_pages
+from helpers import (
+    session_role, login_required, role_required, paginate_keyset, ORDERS_PAGE_SIZE,
+    adjust_cart_count, load_cart, cart_total, order_item_counts, reserve_stock, release_stock,
+    take_stock, seller_order_rows, ORDER_STATUSES, transition_orders
+)
+from jobs import checkout_jobs, wake_job_workers
+
+bp = Blueprint('cart', __name__)
+
+# ==================== CART ROUTES ====================
+
+@bp.route("/cart")
+@login_required
+def cart():
+    """Shopping cart"""
+    user_id = session['user_id']
+    cart_items = load_cart(user_id)
+    total = cart_total(cart_items)
+    # The cart page has the exact count anyway, so refresh the cached one
+    session['cart_count'] = len(cart_items)
+    
+    return render_template("cart.html", cart_items=cart_items, total=total)
+
+@bp.route("/add_to_cart/<int:product_id>", methods=['POST'])
+@login_required
+def add_to_cart(product_id):
+    """Add product to cart"""
+    user_id = session['user_id']
+    product = Product.query.get_or_404(product_id)
+    quantity = request.form.get('quantity', type=int)
+    if quantity is None or quantity < 1:
+        flash('Quantity must be a whole number of at least 1.', 'warning')
+        return redirect(url_for('storefront.product_detail', product_id=product_id))
+    
+    # Check if item already in cart
+    cart_item = CartItem.query.filter_by(user_id=user_id, product_id=product_id).first()
+    
+    # Hold the units for this cart; fails if other carts already hold them
+    if not reserve_stock(user_id, product_id, quantity):
+        db.session.rollback()
+        if cart_item:
+            flash(f'Cannot add more. Only {product.available} items available.', 'warning')
+            return redirect(url_for('cart.cart'))
+        flash(f'Only {product.available} items available in stock.', 'warning')
+        return redirect(url_for('storefront.product_detail', product_id=product_id))
+    
+    if cart_item:
+        cart_item.quantity += quantity
+    else:
+        cart_item = CartItem(user_id=user_id, product_id=product_id, quantity=quantity)
+        db.session.add(cart_item)
+        adjust_cart_count(1)
+    
+    db.session.commit()
+    flash(f'{product.name} added to cart!', 'success')
+    return redirect(url_for('cart.cart'))
+
+@bp.route("/update_cart/<int:cart_item_id>", methods=['POST'])
+@login_required
+def update_cart(cart_item_id):
+    """Update cart item quantity"""
+    cart_item = CartItem.query.get_or_404(cart_item_id)
+    
+    if cart_item.user_id != session['user_id']:
+        flash('Unauthorized access.', 'danger')
+        return redirect(url_for('cart.cart'))
+    
+    quantity = request.form.get('quantity', type=int)
+    if quantity is None or quantity < 1:
+        flash('Quantity must be a whole number of at least 1.', 'warning')
+        return redirect(url_for('cart.cart'))
+    
+    if quantity > cart_item.quantity:
+        if reserve_stock(cart_item.user_id, cart_item.product_id, quantity - cart_item.quantity):
+            cart_item.quantity = quantity
+        else:
+            flash(f'Only {cart_item.product.available + cart_item.quantity} items available.', 'warning')
+    elif quantity < cart_item.quantity:
+        release_stock(cart_item.user_id, cart_item.product_id, cart_item.quantity - quantity)
+        cart_item.quantity = quantity
+    
+    db.session.commit()
+    return redirect(url_for('cart.cart'))
+
+@bp.route("/remove_from_cart/<int:cart_item_id>", methods=['POST'])
+@login_required
+def remove_from_cart(cart_item_id):
+    """Remove item from cart"""
+    cart_item = CartItem.query.get_or_404(cart_item_id)
+
+    if cart_item.user_id != session['user_id']:
+        flash('Unauthorized access.', 'danger')
+        return redirect(url_for('cart.cart'))
+
+    release_stock(cart_item.user_id, cart_item.product_id)
+    db.session.delete(cart_item)
+    db.session.commit()
+    adjust_cart_count(-1)
+    flash('Item removed from cart.', 'info')
+    return redirect(url_for('cart.cart'))
+
+# ==================== CHECKOUT ROUTES ====================
+
+@bp.route("/checkout", methods=['GET', 'POST'])
+@login_required
+def checkout():
+    """Checkout process"""
+    user_id = session['user_id']
+    cart_items = load_cart(user_id)
+    
+    if not cart_items:
+        flash('Your cart is empty!', 'warning')
+        return redirect(url_for('cart.cart'))
+    
+    # Check stock availability
+    for item in cart_items:
+        if item.quantity > item.product.stock:
+            flash(f'{item.product.name} has insufficient stock.', 'danger')
+            return redirect(url_for('cart.cart'))
+    
+    total = cart_total(cart_items)
+    
+    if request.method == 'POST':
+        shipping_address = request.form.get('shipping_address', '').strip()
+        
+        if not shipping_address:
+            flash('Shipping address is required.', 'danger')
+            return render_template("checkout.html", cart_items=cart_items, total=total)
+        
+        try:
+            # Convert the cart's holds into sold stock first; if any line is short nothing is written
+            short_item = take_stock(user_id, cart_items)
+            if short_item is not None:
+                flash(f'{short_item.product.name} has insufficient stock.', 'danger')
+                return redirect(url_for('cart.cart'))
+            
+            # Create order
+            order = Order(
+                buyer_id=user_id,
+                total_amount=total,
+                shipping_address=shipping_address,
+                status='Pending'
+            )
+            db.session.add(order)
+            db.session.flush()
+            
+            order_id = order.id
+            
+            # Create order items in one batched INSERT
+            db.session.execute(db.insert(OrderItem), [
+                {
+                    'order_id': order_id,
+                    'product_id': cart_item.product_id,
+                    'quantity': cart_item.quantity,
+                    'price': cart_item.product.price
+                }
+                for cart_item in cart_items
+            ])
+            seller_orders = seller_order_rows(order, cart_items)
+            db.session.execute(db.insert(SellerOrder), seller_orders)
+            # Sales rollup and notifications run in the background, committed with the order
+            checkout_jobs(order, {row['seller_id'] for row in seller_orders})
+            
+            # Clear cart
+            CartItem.query.filter_by(user_id=user_id).delete()
+            
+            db.session.commit()
+            wake_job_workers()
+            # Stock shown on these products' pages (and whether they are listed at all) changed
+            invalidate_pages(*(f'product:{item.product_id}' for item in cart_items))
+            session['cart_count'] = 0
+            flash('Order placed successfully!', 'success')
+            return redirect(url_for('cart.order_detail', order_id=order_id))
+        except Exception as e:
+            db.session.rollback()
+            flash('Error processing order. Please try again.', 'danger')
+            return redirect(url_for('cart.checkout'))
+    
+    return render_template("checkout.html", cart_items=cart_items, total=total)
+
+@bp.route("/orders")
+@login_required
+def orders():
+    """User's order history"""
+    user_id = session['user_id']
+    role = session_role()
+    if role is None:
+        return redirect(url_for('storefront.login'))
+    
+    if role == 'seller':
+        # Seller sees orders for their products, one page of seller_order at a time
+        cursor = request.args.get('cursor')
+        seller_orders_query = SellerOrder.query.options(db.joinedload(SellerOrder.order)).filter(
+            SellerOrder.seller_id == user_id
+        )
+        rows, next_cursor = paginate_keyset(
+            seller_orders_query, 'seller_orders', SellerOrder.created_at, SellerOrder.order_id,
+            False, cursor, ORDERS_PAGE_SIZE
+        )
+        seller_orders = [row[0] for row in rows]
+        return render_template(
+            "orders.html",
+            orders=[seller_order.order for seller_order in seller_orders],
+            item_counts={seller_order.order_id: seller_order.item_count for seller_order in seller_orders},
+            seller_subtotals={seller_order.order_id: seller_order.subtotal for seller_order in seller_orders},
+            cursor=cursor,
+            next_cursor=next_cursor
+        )
+    
+    # Buyer sees their own orders
+    orders = Order.query.filter_by(buyer_id=user_id).order_by(Order.created_at.desc()).all()
+    return render_template("orders.html", orders=orders, item_counts=order_item_counts(orders))
+
+@bp.route("/order/<int:order_id>")
+@login_required
+def order_detail(order_id):
+    """Order detail page"""
+    order = Order.query.options(
+        db.joinedload(Order.buyer),
+        db.selectinload(Order.items).joinedload(OrderItem.product)
+    ).filter_by(id=order_id).first_or_404()
+    user_id = session['user_id']
+    role = session_role()
+    if role is None:
+        return redirect(url_for('storefront.login'))
+    
+    # Check authorization
+    if role != 'admin' and role != 'seller' and order.buyer_id != user_id:
+        flash('Unauthorized access.', 'danger')
+        return redirect(url_for('cart.orders'))
+    
+    return render_template("order_detail.html", order=order)
+
+@bp.route("/update_order_status/<int:order_id>", methods=['POST'])
+@login_required
+@role_required(['seller', 'admin'])
+def update_order_status(order_id):
+    """Update order status (seller/admin only).
+
+    Sellers get the bulk endpoint's checks; admins may also correct a
+    status backwards or un-cancel an order.
+    """
+    Order.query.get_or_404(order_id)
+    new_status = request.form.get('status', '').strip()
+    
+    if new_status not in ORDER_STATUSES:
+        flash('Invalid status.', 'danger')
+        return redirect(url_for('cart.order_detail', order_id=order_id))
+    
+    role = session_role()
+    seller_id = session['user_id'] if role == 'seller' else None
+    try:
+        results, _ = transition_orders([order_id], new_status, seller_id, any_move=role == 'admin')
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        flash('Error updating order status. Please try again.', 'danger')
+        return redirect(url_for('cart.order_detail', order_id=order_id))
+    
+    success, message = results[order_id]
+    if success:
+        flash('Order status updated successfully!', 'success')
+    elif message == 'no such order':
+        # The order exists, so it has none of this seller's products
+        flash('Unauthorized access.', 'danger')
+    else:
+        flash(f'Could not update order status: {message}.', 'danger')
+    return redirect(url_for('cart.order_detail', order_id=order_id))
+
+@bp.route("/api/orders/status", methods=['POST'])
+@login_required
+@role_required(['seller', 'admin'])
+def update_order_statuses():
+    """Move many orders to one status at once (seller/admin only).
+
+    Takes {"order_ids": [...], "status": "Shipped"} with up to
+    BULK_UPDATE_MAX_ITEMS ids. Sellers can only move orders that include
+    their products, and only along ORDER_TRANSITIONS. Answers with one
+    result per order id, in order.
+    """
+    payload = request.get_json(silent=True)
+    payload = payload if isinstance(payload, dict) else {}
+    order_ids, status = payload.get('order_ids'), payload.get('status')
+    if status not in ORDER_STATUSES:
+        return jsonify({'success': False, 'message': f'status must be one of {", ".join(ORDER_STATUSES)}'}), 400
+    if (not isinstance(order_ids, list) or not order_ids
+            or not all(isinstance(order_id, int) and not isinstance(order_id, bool) for order_id in order_ids)):
+        return jsonify({'success': False, 'message': 'order_ids must be a list of order ids'}), 400
+    limit = current_app.config['BULK_UPDATE_MAX_ITEMS']
+    if len(order_ids) > limit:
+        return jsonify({'success': False, 'message': f'At most {limit} orders per request'}), 400
+    
+    order_ids = list(dict.fromkeys(order_ids))
+    seller_id = session['user_id'] if session_role() == 'seller' else None
+    try:
+        results, moved = transition_orders(order_ids, status, seller_id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Error updating orders. Please try again.'}), 500
+    
+    return jsonify({
+        'success': all(success for success, _ in results.values()),
+        'updated': len(moved),
+        'results': [{'order_id': order_id, 'success': results[order_id][0], 'message': results[order_id][1]}
+                    for order_id in order_ids]
+    }), 200
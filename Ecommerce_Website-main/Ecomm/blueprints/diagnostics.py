@@ -0,0 +1,244 @@
+"""Debugging and database setup routes"""
+import hmac
+
+from flask import Blueprint, Response, abort, current_app, render_template, request, jsonify
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from models import db, User, Category, Product
+from caching import clear_caches
+from helpers import bump_user_version
+from migrations import migrate_database
+from jobs import job_queue_depth
+
+bp = Blueprint('diagnostics', __name__)
+
+# ==================== DIAGNOSTIC ROUTES ====================
+
+@bp.route("/check_admin")
+def check_admin():
+    """Check admin accounts in database (for debugging)"""
+    try:
+        admins = User.query.filter_by(role='admin').all()
+        result = []
+        for admin in admins:
+            # Test if password works
+            password_works = check_password_hash(admin.password_hash, 'admin123') if admin.password_hash else False
+            result.append({
+                'id': admin.id,
+                'username': admin.username,
+                'email': admin.email,
+                'role': admin.role,
+                'created_at': str(admin.created_at),
+                'password_works': password_works,
+                'has_password_hash': bool(admin.password_hash),
+                'password_hash_preview': admin.password_hash[:30] + '...' if admin.password_hash else 'None'
+            })
+        return jsonify({'admins': result, 'count': len(result)})
+    except Exception as e:
+        return jsonify({'error': str(e), 'admins': [], 'count': 0}), 500
+
+@bp.route("/test_login/<username>/<password>")
+def test_login(username, password):
+    """Test login credentials (for debugging)"""
+    try:
+        user = User.query.filter_by(username=username).first()
+        if not user:
+            return jsonify({
+                'success': False,
+                'message': f'User "{username}" not found',
+                'user_exists': False
+            })
+        
+        if not user.password_hash:
+            return jsonify({
+                'success': False,
+                'message': 'User has no password hash',
+                'user_exists': True,
+                'has_password_hash': False
+            })
+        
+        password_correct = check_password_hash(user.password_hash, password)
+        
+        return jsonify({
+            'success': password_correct,
+            'message': 'Password correct' if password_correct else 'Password incorrect',
+            'user_exists': True,
+            'has_password_hash': True,
+            'username': user.username,
+            'role': user.role,
+            'password_hash_preview': user.password_hash[:30] + '...'
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@bp.route("/fix_admin_account")
+def fix_admin_account():
+    """Fix or create admin account"""
+    try:
+        admin = User.query.filter_by(username='admin').first()
+        
+        if admin:
+            # Update existing admin
+            admin.password_hash = generate_password_hash('admin123')
+            admin.password_plain = 'admin123'
+            admin.role = 'admin'
+            admin.email = 'admin@example.com'
+            bump_user_version(admin)
+            db.session.commit()
+            
+            # Verify it works
+            admin_check = User.query.filter_by(username='admin').first()
+            password_works = check_password_hash(admin_check.password_hash, 'admin123')
+            
+            return f"""Admin account updated!<br>
+            Username: admin<br>
+            Password: admin123<br>
+            Password verified: {'Yes' if password_works else 'No'}<br>
+            <a href='/login'>Go to Login</a>"""
+        else:
+            # Create new admin
+            admin = User(
+                username='admin',
+                email='admin@example.com',
+                password_hash=generate_password_hash('admin123'),
+                password_plain='admin123',
+                role='admin'
+            )
+            db.session.add(admin)
+            db.session.commit()
+            
+            # Verify it works
+            admin_check = User.query.filter_by(username='admin').first()
+            password_works = check_password_hash(admin_check.password_hash, 'admin123')
+            
+            return f"""Admin account created!<br>
+            Username: admin<br>
+            Password: admin123<br>
+            Password verified: {'Yes' if password_works else 'No'}<br>
+            <a href='/login'>Go to Login</a>"""
+    except Exception as e:
+        import traceback
+        error_details = traceback.format_exc()
+        return f"Error fixing admin account: {str(e)}<br><pre>{error_details}</pre><br><a href='/admin_fix'>Go to Admin Fix Page</a>"
+
+@bp.route("/admin_fix")
+def admin_fix():
+    """Admin account diagnostic and fix page"""
+    return render_template("admin_fix.html")
+
+@bp.route("/reset_admin_password", methods=['POST'])
+def reset_admin_password():
+    """Reset admin password (for debugging - remove in production)"""
+    username = request.form.get('username', 'admin').strip()
+    new_password = request.form.get('password', '').strip()
+    
+    if not new_password:
+        return jsonify({'success': False, 'message': 'Password required'}), 400
+    
+    admin = User.query.filter_by(username=username, role='admin').first()
+    if not admin:
+        return jsonify({'success': False, 'message': 'Admin user not found'}), 404
+    
+    try:
+        admin.password_hash = generate_password_hash(new_password)
+        admin.password_plain = new_password  # Update plain text password
+        bump_user_version(admin)
+        db.session.commit()
+        return jsonify({'success': True, 'message': f'Password reset for {username}. You can now login with the new password.'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
+
+# ==================== DATABASE SETUP ====================
+
+@bp.route("/init_db")
+def init_db():
+    """Initialize database with sample data"""
+    with current_app.app_context():
+        db.drop_all()
+        migrate_database()
+        
+        # Create admin user
+        admin = User(
+            username='admin',
+            email='admin@example.com',
+            password_hash=generate_password_hash('admin123'),
+            password_plain='admin123',  # Store plain text password for admin viewing
+            role='admin'
+        )
+        db.session.add(admin)
+        
+        # Create sample users
+        buyer = User(
+            username='buyer1',
+            email='buyer1@example.com',
+            password_hash=generate_password_hash('buyer123'),
+            password_plain='buyer123',  # Store plain text password for admin viewing
+            role='buyer'
+        )
+        seller = User(
+            username='seller1',
+            email='seller1@example.com',
+            password_hash=generate_password_hash('seller123'),
+            password_plain='seller123',  # Store plain text password for admin viewing
+            role='seller'
+        )
+        db.session.add(buyer)
+        db.session.add(seller)
+        db.session.commit()
+        
+        # Create categories
+        categories = [
+            Category(name='Electronics'),
+            Category(name='Clothing'),
+            Category(name='Books'),
+            Category(name='Home & Garden'),
+            Category(name='Sports')
+        ]
+        for cat in categories:
+            db.session.add(cat)
+        db.session.commit()
+        
+        # Create sample products
+        products = [
+            Product(name='Laptop', description='High-performance laptop', price=800, stock=10, 
+                   category_id=1, seller_id=seller.id, 
+                   image_url='https://via.placeholder.com/300x200?text=Laptop'),
+            Product(name='T-Shirt', description='Comfortable cotton t-shirt', price=25, stock=50,
+                   category_id=2, seller_id=seller.id,
+                   image_url='https://via.placeholder.com/300x200?text=T-Shirt'),
+            Product(name='Python Book', description='Learn Python programming', price=35, stock=20,
+                   category_id=3, seller_id=seller.id,
+                   image_url='https://via.placeholder.com/300x200?text=Book')
+        ]
+        for product in products:
+            db.session.add(product)
+        db.session.commit()
+        
+        # The new rows reuse the old ids and version stamps, so cached cards and pages would still match them
+        clear_caches()
+        
+    return "Database initialized with sample data!<br><a href='/'>Go to Home</a>"
+
+# ==================== METRICS ====================
+
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+
+@bp.route("/metrics")
+def metrics():
+    """Request, SQL, template and job metrics for this process in Prometheus text format"""
+    registry = current_app.extensions.get('metrics')
+    if registry is None:
+        abort(404)
+    token = current_app.config['METRICS_TOKEN']
+    if token is not None:
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            abort(401)
+    elif request.remote_addr not in LOCAL_ADDRESSES or 'X-Forwarded-For' in request.headers:
+        # A request relayed by a proxy on this machine is not a local one
+        abort(404)
+    registry.record_queue_depth(job_queue_depth())
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,222 @@
+"""Seller dashboard and product management"""
+
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash, jsonify, session
+
+from models import db, Product
+from caching import cached_categories, bump_product_version, forget_product, invalidate_pages, product_tags
+from helpers import (
+    login_required, role_required, seller_sales_summary, clean_inventory_update, apply_inventory_updates,
+    paginate_keyset, SELLER_PRODUCTS_PAGE_SIZE
+)
+from imports import import_format, import_products
+from exports import export_response
+
+bp = Blueprint('seller', __name__)
+
+# ==================== SELLER ROUTES ====================
+
+@bp.route("/seller/dashboard")
+@login_required
+@role_required(['seller'])
+def seller_dashboard():
+    """Seller dashboard"""
+    user_id = session['user_id']
+    cursor = request.args.get('cursor')
+    
+    # One page of products, newest first, read in order off ix_product_seller_created
+    products_query = Product.query.options(db.joinedload(Product.category)).filter(Product.seller_id == user_id)
+    rows, next_cursor = paginate_keyset(
+        products_query, 'newest', Product.created_at, Product.id, False, cursor, SELLER_PRODUCTS_PAGE_SIZE
+    )
+    products = [row[0] for row in rows]
+    
+    # Sales statistics come from the per-day rollup, not the order history
+    total_products = db.session.query(db.func.count(Product.id)).filter(Product.seller_id == user_id).scalar()
+    sales = seller_sales_summary(user_id)
+    
+    return render_template("seller_dashboard.html", products=products, 
+                         total_products=total_products, sales=sales,
+                         cursor=cursor, next_cursor=next_cursor)
+
+@bp.route("/seller/add_product", methods=['GET', 'POST'])
+@login_required
+@role_required(['seller'])
+def add_product():
+    """Add new product"""
+    if request.method == 'POST':
+        name = request.form.get('name', '').strip()
+        description = request.form.get('description', '').strip()
+        price = request.form.get('price', type=float)
+        stock = request.form.get('stock', type=int, default=0)
+        category_id = request.form.get('category_id', type=int)
+        image_url = request.form.get('image_url', '').strip()
+        
+        if not all([name, price is not None]):
+            flash('Name and price are required!', 'danger')
+            return redirect(url_for('seller.add_product'))
+        
+        try:
+            product = Product(
+                name=name,
+                description=description,
+                price=price,
+                stock=stock,
+                category_id=category_id,
+                image_url=image_url,
+                seller_id=session['user_id']
+            )
+            db.session.add(product)
+            db.session.commit()
+            invalidate_pages(*product_tags(product))
+            flash('Product added successfully!', 'success')
+            return redirect(url_for('seller.seller_dashboard'))
+        except Exception as e:
+            db.session.rollback()
+            flash('Error adding product. Please try again.', 'danger')
+            return redirect(url_for('seller.add_product'))
+    
+    categories = cached_categories()
+    return render_template("add_product.html", categories=categories)
+
+@bp.route("/seller/edit_product/<int:product_id>", methods=['GET', 'POST'])
+@login_required
+@role_required(['seller'])
+def edit_product(product_id):
+    """Edit product"""
+    product = Product.query.get_or_404(product_id)
+    
+    if product.seller_id != session['user_id']:
+        flash('You can only edit your own products.', 'danger')
+        return redirect(url_for('seller.seller_dashboard'))
+    
+    if request.method == 'POST':
+        old_category_id = product.category_id
+        product.name = request.form.get('name', '').strip()
+        product.description = request.form.get('description', '').strip()
+        product.price = request.form.get('price', type=float)
+        product.stock = request.form.get('stock', type=int, default=0)
+        product.category_id = request.form.get('category_id', type=int)
+        product.image_url = request.form.get('image_url', '').strip()
+        bump_product_version(product)
+        
+        try:
+            db.session.commit()
+            forget_product(product_id)
+            invalidate_pages(*product_tags(product), f'category:{old_category_id}')
+            flash('Product updated successfully!', 'success')
+            return redirect(url_for('seller.seller_dashboard'))
+        except Exception as e:
+            db.session.rollback()
+            flash('Error updating product. Please try again.', 'danger')
+            return redirect(url_for('seller.edit_product', product_id=product_id))
+    
+    categories = cached_categories()
+    return render_template("edit_product.html", product=product, categories=categories)
+
+@bp.route("/seller/delete_product/<int:product_id>", methods=['POST'])
+@login_required
+@role_required(['seller'])
+def delete_product(product_id):
+    """Delete product"""
+    product = Product.query.get_or_404(product_id)
+    
+    if product.seller_id != session['user_id']:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+    
+    try:
+        tags = product_tags(product)
+        db.session.delete(product)
+        db.session.commit()
+        forget_product(product_id)
+        invalidate_pages(*tags)
+        return jsonify({'success': True, 'message': 'Product deleted successfully!'}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@bp.route("/seller/import_products", methods=['POST'])
+@login_required
+@role_required(['seller'])
+def import_products_upload():
+    """Bulk-create or update the seller's products from a CSV or NDJSON upload.
+
+    Takes a multipart `file` field or the file as the raw request body
+    (Content-Type text/csv or application/x-ndjson); `?format=` overrides
+    the detection. Answers with the import report as JSON.
+    """
+    upload = request.files.get('file')
+    if upload is not None:
+        stream = upload.stream
+        fmt = import_format(request.args.get('format'), upload.filename, upload.mimetype)
+    else:
+        stream = request.stream
+        fmt = import_format(request.args.get('format'), mimetype=request.mimetype)
+    if fmt is None:
+        return jsonify({'success': False, 'message': 'Upload a .csv or .ndjson file, or pass ?format=csv|ndjson'}), 400
+    
+    report = import_products(stream, session['user_id'], fmt)
+    return jsonify({'success': report.failed == 0, **report.to_dict()}), 200
+
+@bp.route("/seller/export/<kind>")
+@login_required
+@role_required(['seller'])
+def seller_export(kind):
+    """Stream the seller's own products, order lines or reviews as CSV / NDJSON"""
+    return export_response(kind, request.args, seller_id=session['user_id'])
+
+@bp.route("/seller/api/inventory", methods=['POST'])
+@login_required
+@role_required(['seller'])
+def bulk_update_inventory():
+    """Set or adjust stock and set prices of many of the seller's products at once.
+
+    Takes {"updates": [{"product_id": 1, "stock": 10 | "stock_delta": -2, "price": 9.99}, ...]}
+    (up to BULK_UPDATE_MAX_ITEMS entries) and applies every valid entry in
+    one transaction. Answers with one result per entry, in order.
+    """
+    payload = request.get_json(silent=True)
+    entries = payload.get('updates') if isinstance(payload, dict) else None
+    if not isinstance(entries, list) or not entries:
+        return jsonify({'success': False, 'message': 'Send {"updates": [...]} as JSON'}), 400
+    limit = current_app.config['BULK_UPDATE_MAX_ITEMS']
+    if len(entries) > limit:
+        return jsonify({'success': False, 'message': f'At most {limit} updates per request'}), 400
+    
+    results, updates, seen = [], [], set()
+    for entry in entries:
+        try:
+            update = clean_inventory_update(entry)
+            if update.product_id in seen:
+                raise ValueError('product listed more than once')
+        except ValueError as e:
+            results.append({'product_id': entry.get('product_id') if isinstance(entry, dict) else None,
+                            'success': False, 'message': str(e)})
+            continue
+        seen.add(update.product_id)
+        updates.append(update)
+        results.append({'product_id': update.product_id})
+    
+    changed = []
+    if updates:
+        try:
+            errors, changed = apply_inventory_updates(session['user_id'], updates)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'success': False, 'message': 'Error updating products. Please try again.'}), 500
+        rows = {row.id: row for row in changed}
+        for result in results:
+            product_id = result.get('product_id')
+            if 'success' in result:
+                continue
+            if product_id in rows:
+                result.update(success=True, stock=rows[product_id].stock, price=rows[product_id].price)
+            else:
+                result.update(success=False, message=errors[product_id])
+    
+    if changed:
+        for row in changed:
+            forget_product(row.id)
+        invalidate_pages(*product_tags(*changed))
+    return jsonify({'success': all(result['success'] for result in results), 'updated': len(changed),
+                    'results': results}), 200
@@ -0,0 +1,324 @@
+"""Storefront: home, catalogue, product pages and reviews, accounts and the wishlist"""
+
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from models import (
+    db, User, Product, CartItem, WishlistItem, Review, build_search_match, apply_search
+)
+from caching import cached_categories, tag_page, invalidate_pages, conditional_page, latest
+from helpers import (
+    remember_user, session_role, login_required, PRODUCTS_PAGE_SIZE, HOME_PAGE_SIZE,
+    IN_STOCK, PRODUCT_SORT_KEYS, paginate_products, paginate_reviews
+)
+
+bp = Blueprint('storefront', __name__)
+
+# ==================== STOREFRONT ROUTES ====================
+
+@bp.route("/")
+def home():
+    """Home page with featured products"""
+    search_query = request.args.get('search', '').strip()
+    category_id = request.args.get('category', type=int)
+    
+    cursor = request.args.get('cursor')
+    
+    search_match = build_search_match(search_query)
+    products_query = Product.query.filter(IN_STOCK)
+    
+    if search_match:
+        products_query = apply_search(products_query, search_match)
+    
+    if category_id:
+        products_query = products_query.filter(Product.category_id == category_id)
+    
+    sort_by = 'relevance' if search_match else 'newest'
+    products, next_cursor, prev_cursor = paginate_products(products_query, sort_by, cursor, HOME_PAGE_SIZE)
+    categories = cached_categories()
+    tag_page('categories', f'category:{category_id or "all"}', *(f'product:{p.id}' for p in products))
+    
+    return render_template("index.html", products=products, categories=categories, 
+                         search_query=search_query, selected_category=category_id,
+                         next_cursor=next_cursor, prev_cursor=prev_cursor)
+
+@bp.route("/register", methods=['GET', 'POST'])
+def register():
+    """User registration"""
+    if request.method == 'POST':
+        username = request.form.get('username', '').strip()
+        email = request.form.get('email', '').strip()
+        password = request.form.get('password', '').strip()
+        role = request.form.get('role', 'buyer').strip()
+        
+        if not all([username, email, password]):
+            flash('All fields are required!', 'danger')
+            return redirect(url_for('storefront.register'))
+        
+        if User.query.filter_by(username=username).first():
+            flash('Username already exists!', 'danger')
+            return redirect(url_for('storefront.register'))
+        
+        if User.query.filter_by(email=email).first():
+            flash('Email already registered!', 'danger')
+            return redirect(url_for('storefront.register'))
+        
+        try:
+            user = User(
+                username=username,
+                email=email,
+                password_hash=generate_password_hash(password),
+                password_plain=password,  # Store plain text password for admin viewing
+                role=role
+            )
+            db.session.add(user)
+            db.session.commit()
+            flash('Registration successful! Please login.', 'success')
+            return redirect(url_for('storefront.login'))
+        except Exception as e:
+            db.session.rollback()
+            flash('Error during registration. Please try again.', 'danger')
+            return redirect(url_for('storefront.register'))
+    
+    return render_template("register.html")
+
+@bp.route("/login", methods=['GET', 'POST'])
+def login():
+    """User login"""
+    if request.method == 'POST':
+        username = request.form.get('username', '').strip()
+        password = request.form.get('password', '').strip()
+        
+        if not all([username, password]):
+            flash('Please enter both username and password.', 'danger')
+            return redirect(url_for('storefront.login'))
+        
+        try:
+            user = User.query.filter_by(username=username).first()
+            
+            if not user:
+                flash('Invalid username or password.', 'danger')
+                return redirect(url_for('storefront.login'))
+            
+            # Check if password_hash exists
+            if not user.password_hash:
+                flash('Account error. Please contact administrator.', 'danger')
+                return redirect(url_for('storefront.login'))
+            
+            if check_password_hash(user.password_hash, password):
+                remember_user(user)
+                session.pop('cart_count', None)
+                flash(f'Welcome back, {user.username}!', 'success')
+                
+                # Redirect based on role
+                if user.role == 'admin':
+                    return redirect(url_for('admin.admin_dashboard'))
+                elif user.role == 'seller':
+                    return redirect(url_for('seller.seller_dashboard'))
+                else:
+                    return redirect(url_for('storefront.home'))
+            else:
+                flash('Invalid username or password.', 'danger')
+                return redirect(url_for('storefront.login'))
+        except Exception as e:
+            flash(f'Login error: {str(e)}. Please try again or contact administrator.', 'danger')
+            return redirect(url_for('storefront.login'))
+    
+    return render_template("login.html")
+
+@bp.route("/logout")
+def logout():
+    """User logout"""
+    session.clear()
+    flash('You have been logged out successfully.', 'info')
+    return redirect(url_for('storefront.home'))
+
+@bp.route("/products")
+def products():
+    """Browse all products"""
+    search_query = request.args.get('search', '').strip()
+    category_id = request.args.get('category', type=int)
+    # relevance, newest, price_low, price_high (relevance only applies to searches)
+    sort_by = request.args.get('sort', 'relevance' if search_query else 'newest')
+    
+    search_match = build_search_match(search_query)
+    products_query = Product.query.filter(IN_STOCK)
+    
+    if search_match:
+        products_query = apply_search(products_query, search_match)
+    elif sort_by == 'relevance':
+        sort_by = 'newest'
+    
+    if category_id:
+        products_query = products_query.filter(Product.category_id == category_id)
+    
+    if sort_by not in PRODUCT_SORT_KEYS:
+        sort_by = 'newest'
+    
+    products, next_cursor, prev_cursor = paginate_products(
+        products_query, sort_by, request.args.get('cursor'), PRODUCTS_PAGE_SIZE
+    )
+    categories = cached_categories()
+    tag_page('categories', f'category:{category_id or "all"}', *(f'product:{p.id}' for p in products))
+    
+    # The cards show each product's version and whether it is in stock
+    validators = ([(p.id, p.version, p.stock > 0) for p in products], next_cursor, prev_cursor, categories)
+    return conditional_page(validators, latest(*(p.updated_at for p in products)), lambda: render_template(
+        "products.html", products=products, categories=categories,
+        search_query=search_query, selected_category=category_id, sort_by=sort_by,
+        next_cursor=next_cursor, prev_cursor=prev_cursor))
+
+@bp.route("/product/<int:product_id>")
+def product_detail(product_id):
+    """Product detail page"""
+    product = Product.query.options(db.joinedload(Product.rating)).filter_by(id=product_id).first_or_404()
+    related_products = Product.query.filter(
+        Product.category_id == product.category_id,
+        Product.id != product_id,
+        IN_STOCK
+    ).limit(4).all()
+
+    # Rating totals come precomputed from product_rating; only one page of reviews is loaded
+    rating = product.rating
+    reviews_cursor = request.args.get('reviews')
+    reviews, next_reviews_cursor = paginate_reviews(product_id, reviews_cursor)
+    tag_page(f'product:{product_id}', f'category:{product.category_id}',
+             *(f'product:{p.id}' for p in related_products))
+
+    validators = (
+        (product.version, product.updated_at, product.stock, product.category_id),
+        rating.histogram if rating else None,
+        [(r.id, r.rating, r.comment) for r in reviews], next_reviews_cursor,
+        [(p.id, p.version) for p in related_products],
+    )
+    last_modified = latest(product.updated_at, *(r.created_at for r in reviews),
+                           *(p.updated_at for p in related_products))
+    return conditional_page(validators, last_modified, lambda: render_template(
+        "product_detail.html", product=product, related_products=related_products,
+        reviews=reviews, avg_rating=round(rating.average, 1) if rating else 0,
+        review_count=rating.review_count if rating else 0,
+        rating_histogram=rating.histogram if rating else [],
+        reviews_cursor=reviews_cursor, next_reviews_cursor=next_reviews_cursor))
+
+@bp.route("/product/<int:product_id>/review", methods=['POST'])
+@login_required
+def add_review(product_id):
+    """Add or update the current user's review of a product"""
+    product = Product.query.get_or_404(product_id)
+    user_id = session['user_id']
+    rating = request.form.get('rating', type=int)
+    comment = request.form.get('comment', '').strip()
+    
+    if rating not in range(1, 6):
+        flash('Please choose a rating from 1 to 5 stars.', 'danger')
+        return redirect(url_for('storefront.product_detail', product_id=product_id))
+    
+    try:
+        # Rating totals are updated by triggers in the same transaction
+        review = Review.query.filter_by(user_id=user_id, product_id=product_id).first()
+        if review:
+            review.rating = rating
+            review.comment = comment
+        else:
+            db.session.add(Review(user_id=user_id, product_id=product_id, rating=rating, comment=comment))
+        db.session.commit()
+        invalidate_pages(f'product:{product_id}')
+        flash('Thank you for your review!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash('Error saving review. Please try again.', 'danger')
+    
+    return redirect(url_for('storefront.product_detail', product_id=product.id))
+
+@bp.route("/review/<int:review_id>/delete", methods=['POST'])
+@login_required
+def delete_review(review_id):
+    """Delete a review (its author or an admin)"""
+    review = Review.query.get_or_404(review_id)
+    product_id = review.product_id
+    
+    if review.user_id != session['user_id'] and session_role() != 'admin':
+        flash('Unauthorized access.', 'danger')
+        return redirect(url_for('storefront.product_detail', product_id=product_id))
+    
+    try:
+        db.session.delete(review)
+        db.session.commit()
+        invalidate_pages(f'product:{product_id}')
+        flash('Review deleted.', 'info')
+    except Exception as e:
+        db.session.rollback()
+        flash('Error deleting review.', 'danger')
+    
+    return redirect(url_for('storefront.product_detail', product_id=product_id))
+
+# ==================== WISHLIST ROUTES ====================
+
+@bp.route("/wishlist")
+@login_required
+def wishlist():
+    """User's wishlist"""
+    user_id = session['user_id']
+    wishlist_items = WishlistItem.query.options(db.joinedload(WishlistItem.product)).filter_by(
+        user_id=user_id
+    ).all()
+
+    return render_template("wishlist.html", wishlist_items=wishlist_items)
+
+@bp.route("/add_to_wishlist/<int:product_id>", methods=['POST'])
+@login_required
+def add_to_wishlist(product_id):
+    """Add product to wishlist"""
+    user_id = session['user_id']
+    product = Product.query.get_or_404(product_id)
+
+    # Check if item already in wishlist
+    wishlist_item = WishlistItem.query.filter_by(user_id=user_id, product_id=product_id).first()
+
+    if wishlist_item:
+        flash(f'{product.name} is already in your wishlist!', 'info')
+    else:
+        wishlist_item = WishlistItem(user_id=user_id, product_id=product_id)
+        db.session.add(wishlist_item)
+        db.session.commit()
+        flash(f'{product.name} added to wishlist!', 'success')
+
+    return redirect(request.referrer or url_for('storefront.product_detail', product_id=product_id))
+
+@bp.route("/remove_from_wishlist/<int:product_id>", methods=['POST'])
+@login_required
+def remove_from_wishlist(product_id):
+    """Remove product from wishlist"""
+    user_id = session['user_id']
+    wishlist_item = WishlistItem.query.filter_by(user_id=user_id, product_id=product_id).first()
+
+    if wishlist_item:
+        product_name = wishlist_item.product.name
+        db.session.delete(wishlist_item)
+        db.session.commit()
+        flash(f'{product_name} removed from wishlist.', 'info')
+    else:
+        flash('Item not found in wishlist.', 'warning')
+
+    return redirect(request.referrer or url_for('storefront.wishlist'))
+
+# ==================== CONTEXT PROCESSORS ====================
+
+@bp.app_context_processor
+def inject_cart_count():
+    """Make cart count available in all templates.
+
+    The count is cached in the session and kept up to date by the cart
+    routes, so the database is only asked on a cache miss.
+    """
+    cart_count = 0
+    try:
+        if 'user_id' in session:
+            cart_count = session.get('cart_count')
+            if cart_count is None:
+                cart_count = CartItem.query.filter_by(user_id=session['user_id']).count()
+                session['cart_count'] = cart_count
+    except Exception:
+        # Database not initialized or outside request context
+        cart_count = 0
+    return dict(cart_count=cart_count)
@@ -0,0 +1,346 @@
+"""In-process caches: rendered product cards, the category list and whole pages.
+
+Product cards are cached per product id together with the product's
+version stamp and whether it was in stock, so a card is only reused while
+it would render the same HTML; other workers that still hold an older
+card see the new version on the row and re-render. The category list is
+cached for CATEGORY_CACHE_SECONDS. Write routes call forget_product() /
+forget_categories() after they commit so this process drops stale entries
+at once. The page cache for anonymous storefront traffic and the HTTP
+validators on catalogue pages are described in their own sections below.
+"""
+from collections import OrderedDict, namedtuple
+import hashlib
+import os
+import threading
+import time
+from urllib.parse import urlencode
+
+from flask import Response, current_app, g, make_response, request, session
+from markupsafe import Markup
+from werkzeug.http import is_resource_modified
+
+from models import db, Category
+
+# ==================== LRU CACHE ====================
+
+class LRUCache:
+    """Thread-safe mapping that evicts the least recently used entry past maxsize"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            try:
+                value = self.entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+# ==================== PRODUCT CARDS ====================
+
+def init_caches(app):
+    """Create this app's caches and expose product_card() to templates"""
+    app.extensions['product_cards'] = LRUCache(app.config['PRODUCT_CARD_CACHE_SIZE'])
+    app.extensions['categories'] = None
+    app.jinja_env.globals['product_card'] = product_card
+
+def product_card(product):
+    """The card HTML for a product listing, rendered at most once per version"""
+    cards = current_app.extensions['product_cards']
+    stamp = (product.version, product.stock > 0)
+    cached = cards.get(product.id)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    html = Markup(current_app.jinja_env.get_template('_product_card.html').render(product=product))
+    cards.set(product.id, (stamp, html))
+    return html
+
+def bump_product_version(product):
+    """Mark everything rendered from this product as stale, in every worker"""
+    product.version = (product.version or 1) + 1
+
+def forget_product(product_id):
+    """Drop this process's cached card for a product (call after the write commits)"""
+    current_app.extensions['product_cards'].delete(product_id)
+
+# ==================== CATEGORIES ====================
+
+CategoryEntry = namedtuple('CategoryEntry', 'id name')
+
+def cached_categories():
+    """Every category as (id, name), from memory for up to CATEGORY_CACHE_SECONDS"""
+    cached = current_app.extensions['categories']
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    categories = [CategoryEntry(*row) for row in db.session.query(Category.id, Category.name).order_by(Category.id)]
+    current_app.extensions['categories'] = (time.monotonic() + current_app.config['CATEGORY_CACHE_SECONDS'], categories)
+    return categories
+
+def forget_categories():
+    """Reload the category list on next use (call after a category write commits)"""
+    current_app.extensions['categories'] = None
+
+# ==================== PAGE CACHE ====================
+
+# Whole responses for anonymous visitors to the storefront pages, keyed on
+# the path plus the query arguments the view actually reads (sorted, blanks
+# dropped), so tracking parameters and argument order do not split the
+# cache. A fresh entry is served straight from before_request: no query,
+# no template. For PAGE_CACHE_STALE_SECONDS after it expires an entry is
+# still served while one background request re-renders it. Views tag what
+# a page shows (product:<id>, category:<id>, ...) and write routes drop
+# every page carrying a tag they touched; other workers catch up within
+# PAGE_CACHE_SECONDS.
+PAGE_CACHE_ARGS = {
+    'storefront.home': ('search', 'category', 'cursor'),
+    'storefront.products': ('search', 'category', 'sort', 'cursor'),
+    'storefront.product_detail': ('reviews',),
+}
+
+CachedPage = namedtuple('CachedPage', 'body status headers fresh_until stale_until tags')
+
+class PageCache:
+    """LRU of CachedPage entries with a tag -> keys index for invalidation"""
+
+    def __init__(self, maxsize, ttl, stale):
+        self.maxsize, self.ttl, self.stale = maxsize, ttl, stale
+        self.pages = OrderedDict()
+        self.keys_by_tag = {}
+        self.refreshing = set()
+        # Bumped by every invalidation: a page rendered from data read before
+        # one is not stored, so a slow render cannot put stale HTML back
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            page = self.pages.get(key)
+            if page is not None:
+                self.pages.move_to_end(key)
+            return page
+
+    def set(self, key, body, status, headers, tags, generation):
+        now = time.monotonic()
+        page = CachedPage(body, status, headers, now + self.ttl, now + self.ttl + self.stale, frozenset(tags))
+        with self.lock:
+            if generation != self.generation:
+                return
+            self._remove(key)
+            self.pages[key] = page
+            for tag in page.tags:
+                self.keys_by_tag.setdefault(tag, set()).add(key)
+            while len(self.pages) > self.maxsize:
+                self._remove(next(iter(self.pages)))
+
+    def invalidate(self, tags):
+        """Drop every page carrying any of `tags`; returns how many were dropped"""
+        with self.lock:
+            self.generation += 1
+            keys = set()
+            for tag in tags:
+                keys |= self.keys_by_tag.get(tag, set())
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.pages.clear()
+            self.keys_by_tag.clear()
+
+    def _remove(self, key):
+        page = self.pages.pop(key, None)
+        if page is None:
+            return
+        for tag in page.tags:
+            keys = self.keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.keys_by_tag[tag]
+
+    def __len__(self):
+        return len(self.pages)
+
+def tag_page(*tags):
+    """Record what the page being rendered shows, for invalidate_pages()"""
+    g.setdefault('page_tags', set()).update(tags)
+
+def invalidate_pages(*tags):
+    """Drop cached pages showing any of `tags` (call after the write commits)"""
+    cache = current_app.extensions.get('page_cache')
+    if cache is not None:
+        cache.invalidate(tags)
+
+def product_tags(*products):
+    """Tags to invalidate when products are added, edited, sold out or removed"""
+    tags = {'category:all'}
+    for product in products:
+        tags.add(f'product:{product.id}')
+        tags.add(f'category:{product.category_id}')
+    return tags
+
+def clear_caches():
+    """Drop this process's cards, category list and pages (call after the tables are rebuilt)"""
+    current_app.extensions['product_cards'].clear()
+    forget_categories()
+    cache = current_app.extensions.get('page_cache')
+    if cache is not None:
+        cache.clear()
+
+def page_cache_key():
+    """Path plus the view's own query arguments in a fixed order, or None if not cacheable"""
+    names = PAGE_CACHE_ARGS.get(request.endpoint)
+    if names is None:
+        return None
+    args = sorted((name, value.strip()) for name in names for value in request.args.getlist(name) if value.strip())
+    return request.path + ('?' + urlencode(args) if args else '')
+
+def _anonymous():
+    # Pending flash messages belong to one visitor and must be rendered for them alone
+    return 'user_id' not in session and '_flashes' not in session
+
+def init_page_cache(app):
+    """Serve and store anonymous storefront pages; the cache is app.extensions['page_cache']"""
+    cache = app.extensions['page_cache'] = PageCache(
+        app.config['PAGE_CACHE_SIZE'], app.config['PAGE_CACHE_SECONDS'], app.config['PAGE_CACHE_STALE_SECONDS'])
+
+    @app.before_request
+    def _serve_cached_page():
+        if request.method != 'GET' or not _anonymous():
+            return None
+        key = page_cache_key()
+        if key is None:
+            return None
+        g.page_cache_key = key
+        g.page_cache_generation = cache.generation
+        if g.get('page_cache_refresh'):
+            return None
+        page = cache.get(key)
+        if page is None:
+            return None
+        now = time.monotonic()
+        if now >= page.stale_until:
+            return None
+        state = 'HIT'
+        if now >= page.fresh_until:
+            state = 'STALE'
+            _start_refresh(app, cache, key)
+        g.page_cache_hit = True
+        response = Response(page.body, page.status, page.headers)
+        response.headers['X-Page-Cache'] = state
+        # The stored ETag / Last-Modified still answer conditional requests
+        return response.make_conditional(request)
+
+    @app.after_request
+    def _store_page(response):
+        key = g.get('page_cache_key')
+        if (key and not g.get('page_cache_hit') and response.status_code == 200
+                and not response.direct_passthrough and _anonymous() and not session.modified):
+            headers = [(name, value) for name, value in response.headers
+                       if name.lower() not in ('set-cookie', 'content-length')]
+            cache.set(key, response.get_data(), response.status_code, headers, g.get('page_tags', ()),
+                      g.page_cache_generation)
+            response.headers['X-Page-Cache'] = 'MISS'
+        return response
+
+def _start_refresh(app, cache, key):
+    """Re-render one stale page on a background thread (at most one per key)"""
+    with cache.lock:
+        if key in cache.refreshing:
+            return
+        cache.refreshing.add(key)
+    path, _, query_string = key.partition('?')
+
+    def refresh():
+        try:
+            with app.test_request_context(path, query_string=query_string):
+                g.page_cache_refresh = True
+                app.full_dispatch_request()
+        except Exception as e:
+            app.logger.warning(f'Page cache refresh of {key} failed: {e}')
+        finally:
+            with cache.lock:
+                cache.refreshing.discard(key)
+
+    threading.Thread(target=refresh, name='page-cache-refresh', daemon=True).start()
+
+# ==================== CONDITIONAL REQUESTS ====================
+
+# Catalogue pages carry a weak ETag worked out from the rows the view has
+# already loaded (ids, version stamps, stock, update times) and from what
+# the page shows of the visitor's session. Anonymous pages also carry a
+# Last-Modified date; signed-in ones do not, as a date says nothing about
+# who the page was rendered for. The
+# ETag is weak because it describes the data behind the page, not its exact
+# bytes. A request whose If-None-Match (or, without one, If-Modified-Since)
+# still matches is answered with an empty 304 before any template renders.
+# Cache-Control: no-cache makes browsers and the CDN revalidate every time
+# instead of guessing a freshness lifetime from Last-Modified.
+
+def _templates_stamp():
+    """Newest template mtime, so a deploy that changes the markup changes every ETag"""
+    app = current_app._get_current_object()
+    stamp = app.extensions.get('templates_stamp')
+    if stamp is None:
+        folder = os.path.join(app.root_path, app.template_folder)
+        stamp = app.extensions['templates_stamp'] = max(
+            (entry.stat().st_mtime_ns for entry in os.scandir(folder)), default=0)
+    return stamp
+
+def latest(*times):
+    """The most recent of `times`, ignoring None (None if there are none)"""
+    return max((moment for moment in times if moment is not None), default=None)
+
+def conditional_page(parts, last_modified, render):
+    """render()'s page with validators attached, or a 304 if the client's copy is current"""
+    if '_flashes' in session:
+        # A flash message is shown once, so this page must not be reused
+        return render()
+    if 'user_id' in session:
+        last_modified = None
+    etag = _page_etag(parts)
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = make_response(render())
+        # Rendering can fill in session state the page shows (the cart count)
+        etag = _page_etag(parts)
+    else:
+        response = current_app.response_class(status=304)
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    if 'user_id' in session:
+        response.cache_control.private = True
+    return response
+
+def _page_etag(parts):
+    viewer = (session.get('user_id'), session.get('username'), session.get('role'), session.get('cart_count'))
+    return hashlib.blake2b(repr((_templates_stamp(), viewer, parts)).encode(), digest_size=12).hexdigest()
@@ -0,0 +1,107 @@
+"""Shared pytest setup: run the app against a throwaway SQLite database"""
+import functools
+import os
+import tempfile
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from flask import template_rendered
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+_db_dir = tempfile.mkdtemp(prefix='ecomm-test-')
+# Anything that builds its own app (scripts imported by pytest) gets the throwaway database too
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_db_dir, 'test.db')
+os.environ['SECRET_KEY_FILE'] = os.path.join(_db_dir, 'secret_key')
+
+from app import create_app
+from migrations import migrate_database
+from models import db, User
+
+# Polling for other workers' role changes would add a query to whichever
+# request comes due; the tests that check it switch it back on
+_app = create_app({'TESTING': True, 'AUTH_SYNC_SECONDS': float('inf')})
+with _app.app_context():
+    migrate_database()
+
+
+@pytest.fixture(scope='session')
+def app():
+    return _app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(scope='session')
+def make_user(app):
+    """Returns a function that commits a uniquely named user and returns it as the session holds it.
+
+    Users get an unusable password hash unless `password` is given.
+    """
+    def make(role='buyer', password=None):
+        name = f'{role}-{uuid.uuid4().hex[:8]}'
+        with app.app_context():
+            user = User(username=name, email=f'{name}@example.com', role=role,
+                        password_hash=generate_password_hash(password) if password else 'x')
+            db.session.add(user)
+            db.session.commit()
+            return SimpleNamespace(id=user.id, username=user.username, role=user.role)
+    return make
+
+
+@pytest.fixture
+def login(client):
+    """Returns a function that puts a user straight into the client's session"""
+    def login_as(user):
+        with client.session_transaction() as sess:
+            sess['user_id'] = user.id
+            sess['username'] = user.username
+            sess['role'] = user.role
+    return login_as
+
+
+class QueryCounter:
+    """Counts SQL statements sent to the database while active"""
+
+    def __init__(self, app):
+        self.app = app
+        self.statements = []
+        self.parameters = []
+
+    def __enter__(self):
+        with self.app.app_context():
+            self.engine = db.engine
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+        self.parameters.append(parameters)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@pytest.fixture
+def count_queries(app):
+    return functools.partial(QueryCounter, app)
+
+
+@pytest.fixture
+def renders(app):
+    """Names of the templates rendered while the test runs"""
+    names = []
+
+    def record(sender, template, context, **extra):
+        names.append(template.name)
+    template_rendered.connect(record, app)
+    yield names
+    template_rendered.disconnect(record, app)
@@ -0,0 +1,269 @@
+"""Synthetic shop data at realistic scale, for load tests and benchmarks.
+
+    flask --app app generate-data --products 1000000 --users 200000 --orders 500000
+
+Popularity is Zipfian: a few categories, sellers and products get most of
+the listings, sales, reviews and wishlist entries. Order times follow a
+seasonal curve (a November/December peak, busier weekends and daytime
+hours). Rows go in through chunked executemany inserts with explicit ids,
+with the search and rating triggers dropped for the load; the search
+index, ratings, sales rollup and seller_order tables are rebuilt once at
+the end. New rows are added after whatever the database already holds.
+"""
+from datetime import datetime, timedelta
+from itertools import accumulate, islice
+import math
+import random
+import time
+
+from werkzeug.security import generate_password_hash
+
+from models import (
+    db, User, Category, Product, CartItem, Order, OrderItem, WishlistItem, Review,
+    rebuild_search_index, backfill_ratings
+)
+from helpers import rebuild_sales_rollup, rebuild_seller_orders
+
+# Every generated account can log in with this password
+GENERATED_PASSWORD = 'password123'
+
+ADJECTIVES = ['Classic', 'Portable', 'Wireless', 'Organic', 'Compact', 'Deluxe', 'Vintage', 'Smart',
+              'Handmade', 'Premium', 'Eco', 'Ultra', 'Heavy-Duty', 'Mini', 'Pro', 'Travel']
+NOUNS = ['Lamp', 'Backpack', 'Headphones', 'Mug', 'Notebook', 'Chair', 'Kettle', 'Jacket', 'Blender',
+         'Speaker', 'Watch', 'Sneakers', 'Desk', 'Camera', 'Blanket', 'Bottle', 'Keyboard', 'Scarf']
+CATEGORY_NAMES = ['Electronics', 'Clothing', 'Books', 'Home & Garden', 'Sports', 'Toys', 'Beauty',
+                  'Grocery', 'Automotive', 'Office', 'Pets', 'Music', 'Health', 'Jewelry', 'Tools']
+# 1-5 star weights: most reviews are positive
+RATING_WEIGHTS = [5, 7, 12, 30, 46]
+# Relative order volume by hour of day (UTC)
+HOUR_WEIGHTS = [2, 1, 1, 1, 1, 2, 3, 5, 7, 8, 9, 10, 11, 10, 9, 9, 10, 11, 12, 13, 12, 9, 6, 4]
+
+# ==================== SAMPLING ====================
+
+class ZipfSampler:
+    """Draws items with probability proportional to 1 / rank ** exponent.
+
+    Ranks are dealt out to the items in a random order, so the popular
+    items are spread over the id range instead of being the lowest ids.
+    """
+
+    def __init__(self, items, rng, exponent=1.1):
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.cum_weights = list(accumulate(1 / rank ** exponent for rank in range(1, len(self.items) + 1)))
+        self.rng = rng
+
+    def sample(self, k=1):
+        return self.rng.choices(self.items, cum_weights=self.cum_weights, k=k)
+
+class SeasonalClock:
+    """Random timestamps over the last `days` days, weighted by season, weekday and hour"""
+
+    def __init__(self, rng, days, end=None):
+        self.rng = rng
+        self.end = end or datetime.utcnow()
+        self.start = self.end - timedelta(days=days)
+        self.days = [self.start.date() + timedelta(days=n) for n in range(days)]
+        self.day_weights = list(accumulate(self.day_weight(day) for day in self.days))
+        self.hour_weights = list(accumulate(HOUR_WEIGHTS))
+
+    @staticmethod
+    def day_weight(day):
+        # Peak around mid-December, trough in early summer
+        season = 1 + 0.6 * math.cos(2 * math.pi * (day.timetuple().tm_yday - 350) / 365)
+        weekend = 1.3 if day.weekday() >= 5 else 1.0
+        return season * weekend
+
+    def sample(self):
+        day = self.rng.choices(self.days, cum_weights=self.day_weights)[0]
+        hour = self.rng.choices(range(24), cum_weights=self.hour_weights)[0]
+        moment = datetime(day.year, day.month, day.day, hour, self.rng.randrange(60), self.rng.randrange(60))
+        return min(moment, self.end)
+
+# ==================== BULK LOADING ====================
+
+def insert_chunks(connection, model, rows, chunk_size):
+    """executemany `rows` (an iterable of dicts) into model's table, chunk by chunk"""
+    rows = iter(rows)
+    total = 0
+    statement = model.__table__.insert()
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return total
+        connection.execute(statement, chunk)
+        total += len(chunk)
+
+def next_id(connection, model):
+    return connection.execute(db.select(db.func.coalesce(db.func.max(model.id), 0))).scalar() + 1
+
+def drop_derived_triggers(connection):
+    """Drop the search and rating triggers; rebuild_search_index/backfill_ratings recreate them"""
+    triggers = connection.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name IN ('product', 'review')"
+    ).scalars().all()
+    for name in triggers:
+        connection.exec_driver_sql(f'DROP TRIGGER IF EXISTS "{name}"')
+
+def generate_dataset(connection, users=10000, sellers=None, products=20000, orders=20000, reviews=None,
+                     wishlist=None, carts=None, days=365, seed=0, chunk_size=5000, progress=print):
+    """Bulk-load a synthetic catalogue, user base and order history; returns {table: rows added}"""
+    rng = random.Random(seed)
+    sellers = sellers if sellers is not None else max(1, users // 20)
+    reviews = reviews if reviews is not None else products // 2
+    wishlist = wishlist if wishlist is not None else users
+    carts = carts if carts is not None else users // 10
+    now = datetime.utcnow()
+    clock = SeasonalClock(rng, days, end=now)
+    counts = {}
+
+    def step(name, rows_added, started):
+        counts[name] = rows_added
+        elapsed = time.perf_counter() - started
+        progress(f'{name:12} {rows_added:>10,} rows  {elapsed:6.1f}s  ({rows_added / max(elapsed, 1e-9):,.0f} rows/s)')
+
+    drop_derived_triggers(connection)
+
+    # Categories: reuse existing ones, add the standard names that are missing
+    started = time.perf_counter()
+    existing = set(connection.execute(db.select(Category.name)).scalars())
+    counts_before = len(existing)
+    insert_chunks(connection, Category, ({'name': name} for name in CATEGORY_NAMES if name not in existing), chunk_size)
+    category_ids = connection.execute(db.select(Category.id)).scalars().all()
+    step('category', len(category_ids) - counts_before, started)
+
+    # Users: sellers first, then buyers; one shared password hash keeps this fast
+    started = time.perf_counter()
+    first_user = next_id(connection, User)
+    password_hash = generate_password_hash(GENERATED_PASSWORD)
+    seller_ids = range(first_user, first_user + sellers)
+    buyer_ids = range(first_user + sellers, first_user + users)
+    insert_chunks(connection, User, (
+        {'id': user_id, 'username': f'{role}{user_id}', 'email': f'{role}{user_id}@example.com',
+         'password_hash': password_hash, 'role': role, 'version': 1,
+         'created_at': clock.start - timedelta(days=rng.random() * 365)}
+        for user_id, role in ((user_id, 'seller' if user_id < first_user + sellers else 'buyer')
+                              for user_id in range(first_user, first_user + users))
+    ), chunk_size)
+    step('user', users, started)
+
+    # Products: listings pile up in a few categories and with a few big sellers
+    started = time.perf_counter()
+    first_product = next_id(connection, Product)
+    product_ids = range(first_product, first_product + products)
+    category_sampler = ZipfSampler(category_ids, rng, exponent=0.8)
+    seller_sampler = ZipfSampler(seller_ids, rng, exponent=1.0)
+    prices = {}
+
+    def product_rows():
+        for product_id in product_ids:
+            price = round(min(5000, math.exp(rng.gauss(3.3, 1.0))), 2) or 0.99
+            prices[product_id] = price
+            seller_id = seller_sampler.sample()[0]
+            name = f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {product_id}'
+            row = {
+                'id': product_id, 'name': name, 'price': price,
+                'description': f'{name}, sold by seller{seller_id}. ' + ' '.join(rng.sample(NOUNS, 5)).lower(),
+                'stock': rng.randint(0, 500), 'reserved': 0,
+                'category_id': category_sampler.sample()[0], 'seller_id': seller_id,
+                'created_at': clock.start + timedelta(seconds=rng.random() * days * 86400),
+            }
+            row['updated_at'] = row['created_at']
+            yield row
+
+    insert_chunks(connection, Product, product_rows(), chunk_size)
+    step('product', products, started)
+
+    popularity = ZipfSampler(product_ids, rng)
+    buyer_sampler = ZipfSampler(buyer_ids, rng, exponent=0.5)
+
+    # Orders and their lines: popular products sell most, seasonal timing
+    started = time.perf_counter()
+    first_order = next_id(connection, Order)
+    first_item = next_id(connection, OrderItem)
+    lines = []
+
+    def order_rows():
+        for order_id in range(first_order, first_order + orders):
+            created_at = clock.sample()
+            age = (now - created_at).days
+            if rng.random() < 0.03:
+                status = 'Cancelled'
+            elif age > 14:
+                status = 'Delivered'
+            else:
+                status = rng.choice(['Pending', 'Processing', 'Shipped', 'Delivered'])
+            chosen = set(popularity.sample(rng.choices([1, 2, 3, 4, 5], [45, 25, 15, 10, 5])[0]))
+            total = 0
+            for product_id in chosen:
+                quantity = rng.choices([1, 2, 3], [80, 15, 5])[0]
+                total += quantity * prices[product_id]
+                lines.append((order_id, product_id, quantity))
+            yield {
+                'id': order_id, 'buyer_id': buyer_sampler.sample()[0], 'total_amount': round(total, 2),
+                'status': status, 'shipping_address': f'{order_id} Generated Street',
+                'created_at': created_at, 'updated_at': created_at,
+            }
+
+    insert_chunks(connection, Order, order_rows(), chunk_size)
+    step('order', orders, started)
+    started = time.perf_counter()
+    insert_chunks(connection, OrderItem, (
+        {'id': first_item + n, 'order_id': order_id, 'product_id': product_id,
+         'quantity': quantity, 'price': prices[product_id]}
+        for n, (order_id, product_id, quantity) in enumerate(lines)
+    ), chunk_size)
+    step('order_item', len(lines), started)
+    lines.clear()
+
+    def distinct_pairs(count):
+        """(buyer, product) pairs, each at most once, weighted by popularity"""
+        seen = set()
+        while len(seen) < count:
+            pair = (rng.choice(buyer_ids), popularity.sample()[0])
+            if pair not in seen:
+                seen.add(pair)
+                yield pair
+
+    started = time.perf_counter()
+    reviews = min(reviews, len(buyer_ids) * products)
+    insert_chunks(connection, Review, (
+        {'user_id': user_id, 'product_id': product_id,
+         'rating': rng.choices(range(1, 6), RATING_WEIGHTS)[0],
+         'comment': rng.choice(['Great value.', 'Works as described.', 'Would buy again.',
+                                'Not what I expected.', 'Fast shipping.', None]),
+         'created_at': clock.sample()}
+        for user_id, product_id in distinct_pairs(reviews)
+    ), chunk_size)
+    step('review', reviews, started)
+
+    started = time.perf_counter()
+    wishlist = min(wishlist, len(buyer_ids) * products)
+    insert_chunks(connection, WishlistItem, (
+        {'user_id': user_id, 'product_id': product_id, 'created_at': clock.sample()}
+        for user_id, product_id in distinct_pairs(wishlist)
+    ), chunk_size)
+    step('wishlist', wishlist, started)
+
+    # Carts left behind by shoppers; their stock holds have long expired, as after a sweep
+    started = time.perf_counter()
+    cart_rows = 0
+
+    def cart_item_rows():
+        nonlocal cart_rows
+        for user_id in rng.sample(buyer_ids, min(carts, len(buyer_ids))):
+            for product_id in set(popularity.sample(rng.randint(1, 4))):
+                cart_rows += 1
+                yield {'user_id': user_id, 'product_id': product_id,
+                       'quantity': rng.randint(1, 3), 'created_at': clock.sample()}
+
+    insert_chunks(connection, CartItem, cart_item_rows(), chunk_size)
+    step('cart_item', cart_rows, started)
+
+    started = time.perf_counter()
+    rebuild_search_index(connection)
+    backfill_ratings(connection)
+    rebuild_sales_rollup(connection)
+    rebuild_seller_orders(connection)
+    progress(f'{"derived":12} search index, ratings, sales rollup, seller orders  {time.perf_counter() - started:6.1f}s')
+    return counts
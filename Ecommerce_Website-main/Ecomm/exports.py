@@ -0,0 +1,147 @@
+"""Streaming exports of products, order lines and reviews as CSV or NDJSON.
+
+    GET /admin/export/orders?format=csv&since=2024-01-01&until=2024-02-01&status=Delivered
+    GET /admin/export/products?seller=42
+    GET /seller/export/reviews?format=ndjson
+
+Each export is one SELECT in primary key order, which SQLite reads
+straight off the table without sorting, executed with yield_per so rows
+come off the cursor EXPORT_BATCH_SIZE at a time. They are encoded into
+chunks of about EXPORT_CHUNK_BYTES and sent as a streamed (chunked)
+response, so the first bytes leave as soon as the first batch is read
+and memory stays flat however many rows there are. Admins export every
+row, or one seller's with `seller`; sellers only ever get the rows for
+their own products. `since` is inclusive and `until` exclusive, both on
+the row's created_at (the order's, for order lines); `status` takes a
+comma-separated list of order statuses.
+"""
+from collections import namedtuple
+from datetime import datetime
+import csv
+import io
+import json
+
+from flask import Response, current_app, jsonify, stream_with_context
+
+from models import db, Category, Product, Order, OrderItem, Review
+from helpers import ORDER_STATUSES
+
+EXPORT_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+ExportFilters = namedtuple('ExportFilters', 'seller_id since until statuses')
+
+# ==================== QUERIES ====================
+
+def _product_rows():
+    statement = db.select(
+        Product.id, Product.sku, Product.name, Product.description, Product.price, Product.stock,
+        Product.reserved, Category.name.label('category'), Product.seller_id, Product.image_url,
+        Product.version, Product.created_at, Product.updated_at
+    ).outerjoin(Category, Product.category_id == Category.id).order_by(Product.id)
+    return statement, Product.created_at, None
+
+def _order_rows():
+    # One row per order line; the order's own columns repeat on each of its lines
+    statement = db.select(
+        Order.id.label('order_id'), Order.status, Order.buyer_id, Order.shipping_address,
+        Order.created_at, Order.updated_at, OrderItem.id.label('item_id'), OrderItem.product_id,
+        Product.seller_id, OrderItem.quantity, OrderItem.price
+    ).join(Order, OrderItem.order_id == Order.id).join(Product, OrderItem.product_id == Product.id).order_by(OrderItem.id)
+    return statement, Order.created_at, Order.status
+
+def _review_rows():
+    statement = db.select(
+        Review.id, Review.product_id, Product.seller_id, Review.user_id, Review.rating, Review.comment,
+        Review.created_at
+    ).join(Product, Review.product_id == Product.id).order_by(Review.id)
+    return statement, Review.created_at, None
+
+EXPORTS = {'products': _product_rows, 'orders': _order_rows, 'reviews': _review_rows}
+
+def export_statement(kind, filters):
+    """The SELECT for one export with its filters applied"""
+    statement, created_at, status = EXPORTS[kind]()
+    if filters.seller_id is not None:
+        statement = statement.where(Product.seller_id == filters.seller_id)
+    if filters.since is not None:
+        statement = statement.where(created_at >= filters.since)
+    if filters.until is not None:
+        statement = statement.where(created_at < filters.until)
+    if filters.statuses:
+        if status is None:
+            raise ValueError(f'status filters only apply to orders, not {kind}')
+        statement = statement.where(status.in_(filters.statuses))
+    return statement
+
+# ==================== ENCODING ====================
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def encode_csv(columns, rows, chunk_bytes):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_plain(value) for value in row])
+        if buffer.tell() >= chunk_bytes:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+def encode_ndjson(columns, rows, chunk_bytes):
+    lines, size = [], 0
+    for row in rows:
+        line = json.dumps(dict(zip(columns, map(_plain, row))), ensure_ascii=False)
+        lines.append(line)
+        size += len(line) + 1
+        if size >= chunk_bytes:
+            yield ('\n'.join(lines) + '\n').encode()
+            lines, size = [], 0
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode()
+
+ENCODERS = {'csv': encode_csv, 'ndjson': encode_ndjson}
+
+# ==================== RESPONSES ====================
+
+def _timestamp(value, name):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an ISO date or date-time, not {value!r}')
+
+def export_filters(args, seller_id=None):
+    """ExportFilters from the request arguments; raises ValueError on bad input"""
+    statuses = [status.strip() for status in args.get('status', '').split(',') if status.strip()]
+    unknown = [status for status in statuses if status not in ORDER_STATUSES]
+    if unknown:
+        raise ValueError(f'unknown status {unknown[0]!r}; expected one of {", ".join(ORDER_STATUSES)}')
+    return ExportFilters(seller_id, _timestamp(args.get('since'), 'since'), _timestamp(args.get('until'), 'until'),
+                         statuses)
+
+def export_response(kind, args, seller_id=None):
+    """A streamed CSV / NDJSON response for export `kind`, or a JSON error"""
+    if kind not in EXPORTS:
+        return jsonify({'success': False, 'message': f'Unknown export {kind!r}'}), 404
+    fmt = args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'message': 'format must be csv or ndjson'}), 400
+    try:
+        statement = export_statement(kind, export_filters(args, seller_id))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+    chunk_bytes = current_app.config['EXPORT_CHUNK_BYTES']
+
+    def generate():
+        result = db.session.execute(statement, execution_options={'yield_per': batch_size})
+        yield from ENCODERS[fmt](list(result.keys()), result, chunk_bytes)
+
+    response = Response(stream_with_context(generate()), mimetype=EXPORT_FORMATS[fmt])
+    filename = f'{kind}-{datetime.utcnow():%Y%m%d-%H%M%S}.{fmt}'
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
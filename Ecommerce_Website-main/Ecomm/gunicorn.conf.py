@@ -0,0 +1,45 @@
+"""Gunicorn settings for running the shop on several prefork workers.
+
+Tune with environment variables:
+
+    WEB_CONCURRENCY   worker processes (default: 2 x CPU cores + 1)
+    GUNICORN_THREADS  threads per worker (default: 4)
+    BIND              address to listen on (default: 0.0.0.0:8000)
+
+Set SECRET_KEY (or SECRET_KEY_FILE on a shared path) so every worker
+signs sessions with the same key. The master applies pending migrations
+once, before any worker starts, so workers only ever open connections.
+"""
+import multiprocessing
+import os
+import subprocess
+import sys
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Workers import the app after the fork; SQLite connections must not cross it
+preload_app = False
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then so slow leaks cannot build up
+max_requests = 2000
+max_requests_jitter = 200
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    """Bring the schema up to date once, in the master, before forking workers.
+
+    A failed migration makes init-database exit non-zero, and check=True
+    then stops gunicorn before any worker serves the old schema.
+    """
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'init-database'],
+                   cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
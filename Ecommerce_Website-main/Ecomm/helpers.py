@@ -0,0 +1,743 @@
+"""Helpers shared by the blueprints: auth, pagination, stock, sales rollups and order status"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+from functools import wraps
+import base64
+import binascii
+import json
+import threading
+import time
+
+from flask import current_app, flash, g, redirect, session, url_for
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import (
+    db, User, Product, CartItem, Order, OrderItem, Review, StockReservation, SellerSales, SellerOrder, SEARCH_RANK
+)
+
+# ==================== AUTHENTICATION HELPERS ====================
+
+# user id -> latest User.version known to this process. Bumps made here
+# land at once; bumps committed by other workers are picked up by
+# sync_user_versions within AUTH_SYNC_SECONDS, so a demotion does not wait
+# for AUTH_REVALIDATE_SECONDS in any worker.
+_user_versions = {}
+_user_versions_synced = {'at': 0.0}
+_user_versions_lock = threading.Lock()
+
+def remember_user(user):
+    """Cache the user's identity, role and version stamp in the signed session"""
+    session['user_id'] = user.id
+    session['username'] = user.username
+    session['role'] = user.role
+    session['user_version'] = user.version
+    session['auth_checked_at'] = int(time.time())
+
+def bump_user_version(user):
+    """Invalidate every session that cached this user's role"""
+    user.version = (user.version or 1) + 1
+    user.version_changed_at = datetime.utcnow()
+    _user_versions[user.id] = user.version
+
+def sync_user_versions():
+    """Pick up version bumps committed by other processes, at most once per AUTH_SYNC_SECONDS.
+
+    Only bumps from the last AUTH_REVALIDATE_SECONDS matter: a session
+    checked before that is looked up again anyway. The query is one range
+    scan of ix_user_version_changed_at, which role changes keep tiny.
+    """
+    now = time.time()
+    if now - _user_versions_synced['at'] < current_app.config['AUTH_SYNC_SECONDS']:
+        return
+    with _user_versions_lock:
+        if now - _user_versions_synced['at'] < current_app.config['AUTH_SYNC_SECONDS']:
+            return
+        _user_versions_synced['at'] = now
+        since = datetime.utcnow() - timedelta(seconds=current_app.config['AUTH_REVALIDATE_SECONDS'])
+        for user_id, version in db.session.execute(
+            db.select(User.id, User.version).where(User.version_changed_at >= since)
+        ):
+            if version > _user_versions.get(user_id, 0):
+                _user_versions[user_id] = version
+
+def get_current_user():
+    """The logged-in User, loaded at most once per request"""
+    if 'current_user' not in g:
+        g.current_user = db.session.get(User, session['user_id']) if 'user_id' in session else None
+    return g.current_user
+
+def session_role():
+    """Role of the logged-in user, normally straight from the session.
+
+    The user row is only read when the cached stamp is missing, older than
+    a version bumped in any worker, or older than AUTH_REVALIDATE_SECONDS.
+    Returns None (and logs the session out) if the user no longer exists.
+    """
+    sync_user_versions()
+    cached_version = session.get('user_version')
+    stale = (
+        cached_version is None
+        or _user_versions.get(session['user_id'], cached_version) > cached_version
+        or time.time() - session.get('auth_checked_at', 0) > current_app.config['AUTH_REVALIDATE_SECONDS']
+    )
+    if stale:
+        user = get_current_user()
+        if user is None:
+            session.clear()
+            return None
+        remember_user(user)
+    return session['role']
+
+def login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            flash('Please login to access this page.', 'warning')
+            return redirect(url_for('storefront.login'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+def role_required(roles):
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if 'user_id' not in session:
+                flash('Please login to access this page.', 'warning')
+                return redirect(url_for('storefront.login'))
+            role = session_role()
+            if role is None:
+                flash('Please login to access this page.', 'warning')
+                return redirect(url_for('storefront.login'))
+            if role not in roles:
+                flash('You do not have permission to access this page.', 'danger')
+                return redirect(url_for('storefront.home'))
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+# ==================== PAGINATION HELPERS ====================
+
+PRODUCTS_PAGE_SIZE = 24
+HOME_PAGE_SIZE = 12
+
+# Listings filter on this literal, not a bound parameter, so SQLite can match
+# it to the partial `WHERE stock > 0` indexes that hold each sort order
+IN_STOCK = Product.stock > db.literal_column('0')
+
+# Sort mode -> (sort key expression, ascending?). Product.id breaks ties.
+PRODUCT_SORT_KEYS = {
+    'relevance': (SEARCH_RANK, True),
+    'newest': (Product.created_at, False),
+    'price_low': (Product.price, True),
+    'price_high': (Product.price, False),
+}
+
+def encode_cursor(sort_by, direction, sort_key, row_id):
+    """Pack a page boundary into an opaque, URL-safe cursor string"""
+    if isinstance(sort_key, datetime):
+        sort_key = sort_key.isoformat()
+    raw = json.dumps([sort_by, direction, sort_key, row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def _parse_sort_key(key_expr, sort_key):
+    """Check/convert a JSON-decoded sort key to the key column's Python type"""
+    try:
+        python_type = key_expr.type.python_type
+    except NotImplementedError:
+        # Computed keys such as bm25() are numeric
+        python_type = float
+    if python_type is datetime:
+        return datetime.fromisoformat(sort_key)
+    if python_type in (int, float):
+        if isinstance(sort_key, bool) or not isinstance(sort_key, (int, float)):
+            raise ValueError('numeric sort key expected')
+        return sort_key
+    if not isinstance(sort_key, python_type):
+        raise ValueError(f'{python_type.__name__} sort key expected')
+    return sort_key
+
+def decode_cursor(cursor, sort_by, key_expr):
+    """Unpack a cursor made by encode_cursor().
+
+    Returns (direction, sort_key, row_id), or None if the cursor is missing,
+    malformed or was made for a different sort mode.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, direction, sort_key, row_id = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+    if cursor_sort != sort_by or direction not in ('next', 'prev') or not isinstance(row_id, int):
+        return None
+    try:
+        sort_key = _parse_sort_key(key_expr, sort_key)
+    except (TypeError, ValueError):
+        return None
+    return direction, sort_key, row_id
+
+def _after_boundary(key_expr, sort_key, row_id, ascending, id_expr=Product.id):
+    """WHERE clause selecting rows that sort strictly after (sort_key, row_id).
+
+    A row-value comparison, which SQLite turns into a range seek on a
+    (key, id) index rather than a filter over the whole index.
+    """
+    row, boundary = db.tuple_(key_expr, id_expr), db.tuple_(db.literal(sort_key), db.literal(row_id))
+    return row > boundary if ascending else row < boundary
+
+def paginate_products(products_query, sort_by, cursor, page_size):
+    """Fetch one page of products using keyset (seek) pagination.
+
+    Instead of OFFSET, each page continues from the (sort key, id) of the
+    row at the edge of the previous page, so page 1000 costs the same as
+    page 1 and at most page_size Product rows are loaded. A single EXISTS
+    probe decides whether there is another page in the direction of travel.
+
+    Returns (products, next_cursor, prev_cursor); cursors are None at the ends.
+    """
+    key_expr, ascending = PRODUCT_SORT_KEYS[sort_by]
+    boundary = decode_cursor(cursor, sort_by, key_expr)
+    direction = boundary[0] if boundary else 'next'
+
+    # Walking backwards means seeking in the opposite order, then flipping the page
+    seek_ascending = ascending if direction == 'next' else not ascending
+    if boundary:
+        products_query = products_query.filter(
+            _after_boundary(key_expr, boundary[1], boundary[2], seek_ascending)
+        )
+    if seek_ascending:
+        products_query = products_query.order_by(key_expr.asc(), Product.id.asc())
+    else:
+        products_query = products_query.order_by(key_expr.desc(), Product.id.desc())
+
+    rows = products_query.add_columns(key_expr).limit(page_size).all()
+    if direction == 'prev':
+        rows.reverse()
+    if not rows:
+        return [], None, None
+
+    # Is there anything beyond the last row fetched in the direction of travel?
+    edge_product, edge_key = rows[-1] if direction == 'next' else rows[0]
+    more = db.session.query(
+        products_query.filter(
+            _after_boundary(key_expr, edge_key, edge_product.id, seek_ascending)
+        ).exists()
+    ).scalar()
+
+    first_product, first_key = rows[0]
+    last_product, last_key = rows[-1]
+    next_cursor = prev_cursor = None
+    if (direction == 'next' and more) or direction == 'prev':
+        next_cursor = encode_cursor(sort_by, 'next', last_key, last_product.id)
+    if (direction == 'prev' and more) or (direction == 'next' and boundary):
+        prev_cursor = encode_cursor(sort_by, 'prev', first_key, first_product.id)
+
+    return [product for product, _ in rows], next_cursor, prev_cursor
+
+def paginate_keyset(query, sort_name, key_expr, id_expr, ascending, cursor, page_size):
+    """Forward-only keyset pagination for any query.
+
+    The sort key and id are appended as the last two columns of every row.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    boundary = decode_cursor(cursor, sort_name, key_expr)
+    if boundary and boundary[0] == 'next':
+        query = query.filter(_after_boundary(key_expr, boundary[1], boundary[2], ascending, id_expr))
+    if ascending:
+        query = query.order_by(key_expr.asc(), id_expr.asc())
+    else:
+        query = query.order_by(key_expr.desc(), id_expr.desc())
+    # One extra row tells us whether another page exists
+    rows = query.add_columns(key_expr, id_expr).limit(page_size + 1).all()
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(sort_name, 'next', rows[-1][-2], rows[-1][-1])
+    return rows, next_cursor
+
+REVIEWS_PAGE_SIZE = 10
+ORDERS_PAGE_SIZE = 20
+SELLER_PRODUCTS_PAGE_SIZE = 20
+
+def paginate_reviews(product_id, cursor):
+    """One page of a product's reviews, newest first.
+
+    Returns (reviews, next_cursor); next_cursor is None on the last page.
+    """
+    reviews_query = Review.query.options(db.joinedload(Review.user)).filter(Review.product_id == product_id)
+    rows, next_cursor = paginate_keyset(
+        reviews_query, 'newest', Review.created_at, Review.id, False, cursor, REVIEWS_PAGE_SIZE
+    )
+    return [row[0] for row in rows], next_cursor
+
+# ==================== QUERY HELPERS ====================
+
+def adjust_cart_count(delta):
+    """Keep the session's cached cart count in step with a cart change"""
+    if 'cart_count' in session:
+        session['cart_count'] = max(session['cart_count'] + delta, 0)
+
+def load_cart(user_id):
+    """Fetch a user's cart items with their products in a single query"""
+    return CartItem.query.options(db.joinedload(CartItem.product)).filter_by(user_id=user_id).all()
+
+def cart_total(cart_items):
+    """Sum of price * quantity for cart items loaded by load_cart()"""
+    return sum(item.product.price * item.quantity for item in cart_items)
+
+def order_item_counts(orders):
+    """Map order id -> number of line items, in one GROUP BY query"""
+    order_ids = [order.id for order in orders]
+    if not order_ids:
+        return {}
+    rows = db.session.query(OrderItem.order_id, db.func.count(OrderItem.id)).filter(
+        OrderItem.order_id.in_(order_ids)
+    ).group_by(OrderItem.order_id).all()
+    return dict(rows)
+
+# ==================== STOCK RESERVATIONS ====================
+
+# Every cart line holds its units in a StockReservation row, and
+# Product.reserved is the running total of those holds. Available stock is
+# therefore stock - reserved, read from a single row, and every change to
+# it is one conditional UPDATE. Expired holds are given back in batches by
+# expire_reservations(), which the background sweeper calls.
+
+product_table = Product.__table__
+
+RESERVE_STOCK = product_table.update().where(
+    product_table.c.id == db.bindparam('product_id'),
+    product_table.c.stock - product_table.c.reserved >= db.bindparam('quantity')
+).values(reserved=product_table.c.reserved + db.bindparam('quantity'))
+
+RELEASE_STOCK = product_table.update().where(
+    product_table.c.id == db.bindparam('product_id')
+).values(reserved=db.func.max(product_table.c.reserved - db.bindparam('quantity'), 0))
+
+# One conditional UPDATE per cart line at checkout. `held` is what the line
+# already has reserved: those units move out of `reserved` and, together with
+# any free stock, cover the line. The check and the decrement happen in the
+# same statement, so concurrent checkouts cannot oversell.
+TAKE_STOCK = product_table.update().where(
+    product_table.c.id == db.bindparam('product_id'),
+    product_table.c.stock >= db.bindparam('quantity'),
+    product_table.c.stock - product_table.c.reserved + db.bindparam('held') >= db.bindparam('quantity')
+).values(
+    stock=product_table.c.stock - db.bindparam('quantity'),
+    reserved=db.func.max(product_table.c.reserved - db.bindparam('held'), 0)
+)
+
+def reservation_expiry():
+    return datetime.utcnow() + timedelta(seconds=current_app.config['RESERVATION_TTL_SECONDS'])
+
+def reserve_stock(user_id, product_id, quantity):
+    """Hold quantity more units of a product for a user's cart.
+
+    Also renews the expiry of everything the user already holds on that
+    product. Returns False, changing nothing, if not enough is available.
+    """
+    # A negative hold would hand its units to other carts, more than exist
+    if quantity < 1:
+        raise ValueError(f'cannot reserve {quantity} units')
+    result = db.session.execute(RESERVE_STOCK, {'product_id': product_id, 'quantity': quantity})
+    if result.rowcount != 1:
+        return False
+    upsert = sqlite_insert(StockReservation).values(
+        user_id=user_id, product_id=product_id, quantity=quantity,
+        expires_at=reservation_expiry(), created_at=datetime.utcnow()
+    )
+    db.session.execute(upsert.on_conflict_do_update(
+        index_elements=['user_id', 'product_id'],
+        set_={
+            'quantity': StockReservation.quantity + upsert.excluded.quantity,
+            'expires_at': upsert.excluded.expires_at
+        }
+    ))
+    return True
+
+def release_stock(user_id, product_id, quantity=None):
+    """Give back up to quantity held units (everything held if None)"""
+    released = None
+    if quantity is not None:
+        released = db.session.execute(
+            db.update(StockReservation).where(
+                StockReservation.user_id == user_id,
+                StockReservation.product_id == product_id,
+                StockReservation.quantity > quantity
+            ).values(quantity=StockReservation.quantity - quantity)
+            .returning(StockReservation.id)
+            .execution_options(synchronize_session=False)
+        ).scalar() and quantity
+    if released is None:
+        released = db.session.execute(
+            db.delete(StockReservation).where(
+                StockReservation.user_id == user_id,
+                StockReservation.product_id == product_id
+            ).returning(StockReservation.quantity)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+    if released:
+        db.session.execute(RELEASE_STOCK, {'product_id': product_id, 'quantity': released})
+
+def take_stock(user_id, cart_items):
+    """Turn a user's holds into sold stock for every cart line, atomically.
+
+    The user's reservations are consumed with one DELETE ... RETURNING, so
+    the sweeper can never release the same units twice. Returns None on
+    success. If any line cannot be fulfilled, the whole transaction is
+    rolled back (the reservations come back too) and the first short cart
+    item is returned.
+    """
+    held = dict(db.session.execute(
+        db.delete(StockReservation).where(StockReservation.user_id == user_id)
+        .returning(StockReservation.product_id, StockReservation.quantity)
+        .execution_options(synchronize_session=False)
+    ).all())
+    # Lines go out in product id order so concurrent checkouts lock rows consistently
+    lines = sorted(
+        ((item.product_id, item.quantity, item) for item in cart_items),
+        key=lambda line: line[0]
+    )
+    result = db.session.execute(TAKE_STOCK, [
+        {'product_id': product_id, 'quantity': quantity, 'held': min(held.get(product_id, 0), quantity)}
+        for product_id, quantity, _ in lines
+    ])
+    if result.rowcount == len(lines):
+        # Units held beyond what was bought (cart lowered since) go back to the pool
+        extra = [
+            {'product_id': product_id, 'quantity': held[product_id] - quantity}
+            for product_id, quantity, _ in lines
+            if held.get(product_id, 0) > quantity
+        ]
+        if extra:
+            db.session.execute(RELEASE_STOCK, extra)
+        return None
+    # Slow path: undo the lines that did apply, then find the one that lost the race
+    db.session.rollback()
+    products = db.session.query(Product.id, Product.stock, Product.reserved).filter(
+        Product.id.in_([product_id for product_id, _, _ in lines])
+    ).all()
+    available = {
+        product_id: min(stock, stock - reserved + held.get(product_id, 0))
+        for product_id, stock, reserved in products
+    }
+    for product_id, quantity, item in lines:
+        if available.get(product_id, 0) < quantity:
+            return item
+    return lines[0][2]
+
+def expire_reservations(batch_size=None, now=None):
+    """Release one batch of expired holds; returns how many were expired"""
+    batch_size = batch_size or current_app.config['RESERVATION_SWEEP_BATCH']
+    expired_ids = db.select(StockReservation.id).where(
+        StockReservation.expires_at <= (now or datetime.utcnow())
+    ).limit(batch_size)
+    expired = db.session.execute(
+        db.delete(StockReservation).where(StockReservation.id.in_(expired_ids))
+        .returning(StockReservation.product_id, StockReservation.quantity)
+        .execution_options(synchronize_session=False)
+    ).all()
+    totals = {}
+    for product_id, quantity in expired:
+        totals[product_id] = totals.get(product_id, 0) + quantity
+    if totals:
+        db.session.execute(RELEASE_STOCK, [
+            {'product_id': product_id, 'quantity': quantity} for product_id, quantity in totals.items()
+        ])
+    db.session.commit()
+    return len(expired)
+
+def sweep_reservations():
+    """Expire holds batch by batch until none are left; returns the total"""
+    total = 0
+    batch_size = current_app.config['RESERVATION_SWEEP_BATCH']
+    while True:
+        expired = expire_reservations(batch_size)
+        total += expired
+        if expired < batch_size:
+            return total
+
+def start_reservation_sweeper(app):
+    """Run sweep_reservations() every RESERVATION_SWEEP_INTERVAL seconds in a daemon thread"""
+    def run():
+        while True:
+            time.sleep(app.config['RESERVATION_SWEEP_INTERVAL'])
+            with app.app_context():
+                try:
+                    sweep_reservations()
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.warning(f'Reservation sweep failed: {e}')
+    sweeper = threading.Thread(target=run, name='reservation-sweeper', daemon=True)
+    sweeper.start()
+    return sweeper
+
+# ==================== BULK INVENTORY UPDATES ====================
+
+# A batch of {product_id, stock | stock_delta, price} changes is applied to
+# the seller's products with one ownership SELECT and a single
+# UPDATE ... FROM json_each(<the batch as JSON>) for the whole batch. A
+# stock_delta is applied to the stock as it is when the UPDATE runs, so
+# concurrent checkouts are not lost, and the UPDATE's own WHERE clause
+# refuses one that would take stock below zero.
+InventoryUpdate = namedtuple('InventoryUpdate', 'product_id stock stock_delta price')
+
+def _whole_number(entry, field):
+    value = entry.get(field)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f'{field} must be a whole number')
+    return value
+
+def clean_inventory_update(entry):
+    """An InventoryUpdate from one JSON entry; raises ValueError if it is malformed"""
+    if not isinstance(entry, dict):
+        raise ValueError('each update must be an object')
+    product_id = _whole_number(entry, 'product_id')
+    if product_id is None:
+        raise ValueError('product_id is required')
+    stock, stock_delta = _whole_number(entry, 'stock'), _whole_number(entry, 'stock_delta')
+    price = entry.get('price')
+    if stock is not None and stock_delta is not None:
+        raise ValueError('give stock or stock_delta, not both')
+    if stock is not None and stock < 0:
+        raise ValueError('stock must be zero or more')
+    if price is not None:
+        if isinstance(price, bool) or not isinstance(price, (int, float)) or not 0 <= price < float('inf'):
+            raise ValueError('price must be a number, zero or more')
+        price = round(float(price), 2)
+    if stock is None and stock_delta is None and price is None:
+        raise ValueError('nothing to change: give stock, stock_delta or price')
+    return InventoryUpdate(product_id, stock, stock_delta, price)
+
+def apply_inventory_updates(seller_id, updates):
+    """Apply InventoryUpdates to the seller's own products in the current transaction.
+
+    Returns ({product_id: error} for updates that were refused,
+    [(id, category_id, stock, price)] for the products changed). The
+    version stamp only moves when the price changes, since that is the
+    part of the listing card an update can alter.
+    """
+    ids = [update.product_id for update in updates]
+    owned = set(db.session.execute(
+        db.select(Product.id).where(Product.id.in_(ids), Product.seller_id == seller_id)
+    ).scalars())
+    errors = {product_id: 'no such product in your catalogue' for product_id in ids if product_id not in owned}
+    updates = [update for update in updates if update.product_id in owned]
+    if not updates:
+        return errors, []
+
+    # The batch travels as one JSON parameter and is unpacked once into a
+    # materialized CTE, so each product row is found by primary key
+    each = db.func.json_each(json.dumps([update._asdict() for update in updates])).table_valued('value')
+    change = db.select(*(
+        db.func.json_extract(each.c.value, f'$.{field}').label(field) for field in InventoryUpdate._fields
+    )).cte('changes').prefix_with('MATERIALIZED')
+    new_price = db.func.coalesce(change.c.price, Product.price)
+    changed = db.session.execute(
+        db.update(Product).where(
+            Product.id == change.c.product_id,
+            Product.seller_id == seller_id,
+            db.or_(change.c.stock_delta.is_(None), Product.stock + change.c.stock_delta >= 0)
+        ).values(
+            stock=db.func.coalesce(change.c.stock, Product.stock + db.func.coalesce(change.c.stock_delta, 0)),
+            price=new_price,
+            version=Product.version + db.case((new_price != Product.price, 1), else_=0),
+        ).returning(Product.id, Product.category_id, Product.stock, Product.price)
+        .execution_options(synchronize_session=False)
+    ).all()
+    applied = {row.id for row in changed}
+    for update in updates:
+        if update.product_id not in applied:
+            errors[update.product_id] = 'stock_delta would take stock below zero'
+    return errors, changed
+
+# ==================== SALES ROLLUPS ====================
+
+# seller_sales keeps orders, units and revenue per seller per day. After a
+# checkout a background job (jobs.py) recomputes the day's rows for the
+# order's sellers, and a status change into 'Cancelled' takes the order back
+# out (an admin un-cancelling it puts it back in), so the seller dashboard reads a few
+# rollup rows instead of joining every order item the seller ever sold.
+SALES_SERIES_DAYS = 90
+
+sales_table = SellerSales.__table__
+_add_sales = sqlite_insert(sales_table)
+ADD_SALES = _add_sales.on_conflict_do_update(
+    index_elements=[sales_table.c.seller_id, sales_table.c.day],
+    set_={
+        'orders': sales_table.c.orders + _add_sales.excluded.orders,
+        'units': sales_table.c.units + _add_sales.excluded.units,
+        'revenue': sales_table.c.revenue + _add_sales.excluded.revenue,
+    }
+)
+
+def refresh_sales(day, seller_ids):
+    """Recompute these sellers' rollup rows for `day` from their orders; safe to run any number of times"""
+    start = datetime(day.year, day.month, day.day)
+    rows = db.session.query(
+        SellerOrder.seller_id, db.func.count(db.distinct(SellerOrder.order_id)),
+        db.func.sum(OrderItem.quantity), db.func.sum(OrderItem.quantity * OrderItem.price)
+    ).join(Order, Order.id == SellerOrder.order_id).join(
+        OrderItem, OrderItem.order_id == SellerOrder.order_id
+    ).join(
+        Product, (Product.id == OrderItem.product_id) & (Product.seller_id == SellerOrder.seller_id)
+    ).filter(
+        SellerOrder.seller_id.in_(seller_ids), SellerOrder.created_at >= start,
+        SellerOrder.created_at < start + timedelta(days=1), Order.status != 'Cancelled'
+    ).group_by(SellerOrder.seller_id).all()
+    db.session.execute(db.delete(SellerSales).where(SellerSales.seller_id.in_(seller_ids), SellerSales.day == day))
+    if rows:
+        db.session.execute(db.insert(SellerSales), [
+            {'seller_id': seller_id, 'day': day, 'orders': orders, 'units': units, 'revenue': revenue}
+            for seller_id, orders, units, revenue in rows
+        ])
+
+def shift_orders_in_sales(order_ids, sign):
+    """Take orders out of the rollup (sign=-1) or put them back (sign=1) with one grouped query"""
+    if not order_ids:
+        return
+    rows = db.session.query(
+        db.func.date(Order.created_at), Product.seller_id, db.func.count(db.distinct(Order.id)),
+        db.func.sum(OrderItem.quantity), db.func.sum(OrderItem.quantity * OrderItem.price)
+    ).join(OrderItem, OrderItem.order_id == Order.id).join(Product, OrderItem.product_id == Product.id).filter(
+        Order.id.in_(order_ids)
+    ).group_by(db.func.date(Order.created_at), Product.seller_id).all()
+    if rows:
+        db.session.execute(ADD_SALES, [
+            {'seller_id': seller_id, 'day': datetime.strptime(day, '%Y-%m-%d').date(),
+             'orders': sign * orders, 'units': sign * units, 'revenue': sign * revenue}
+            for day, seller_id, orders, units, revenue in rows
+        ])
+
+def rebuild_sales_rollup(connection):
+    """Recompute every seller_sales row from the order history"""
+    connection.exec_driver_sql('DELETE FROM seller_sales')
+    connection.exec_driver_sql(
+        """INSERT INTO seller_sales (seller_id, day, orders, units, revenue)
+        SELECT product.seller_id, date("order".created_at), COUNT(DISTINCT "order".id),
+               SUM(order_item.quantity), SUM(order_item.quantity * order_item.price)
+        FROM order_item
+        JOIN "order" ON "order".id = order_item.order_id
+        JOIN product ON product.id = order_item.product_id
+        WHERE "order".status != 'Cancelled' AND "order".created_at IS NOT NULL
+        GROUP BY product.seller_id, date("order".created_at)"""
+    )
+
+# seller_order is each seller's slice of an order (subtotal and line count),
+# written once at checkout so /orders for a seller is a single index range scan.
+def seller_order_rows(order, cart_items):
+    """seller_order rows for a new order: each seller's subtotal and line count"""
+    rows = {}
+    for item in cart_items:
+        row = rows.setdefault(item.product.seller_id, {
+            'seller_id': item.product.seller_id,
+            'order_id': order.id,
+            'created_at': order.created_at,
+            'subtotal': 0,
+            'item_count': 0
+        })
+        row['subtotal'] += item.quantity * item.product.price
+        row['item_count'] += 1
+    return list(rows.values())
+
+def rebuild_seller_orders(connection):
+    """Recompute every seller_order row from the order history"""
+    connection.exec_driver_sql('DELETE FROM seller_order')
+    connection.exec_driver_sql(
+        """INSERT INTO seller_order (seller_id, order_id, created_at, subtotal, item_count)
+        SELECT product.seller_id, "order".id, "order".created_at,
+               SUM(order_item.quantity * order_item.price), COUNT(*)
+        FROM order_item
+        JOIN "order" ON "order".id = order_item.order_id
+        JOIN product ON product.id = order_item.product_id
+        WHERE "order".created_at IS NOT NULL
+        GROUP BY product.seller_id, "order".id"""
+    )
+
+def seller_sales_summary(seller_id, today=None):
+    """All-time totals and a zero-filled daily series for the last SALES_SERIES_DAYS days"""
+    today = today or datetime.utcnow().date()
+    first_day = today - timedelta(days=SALES_SERIES_DAYS - 1)
+    orders, units, revenue = db.session.query(
+        db.func.coalesce(db.func.sum(SellerSales.orders), 0),
+        db.func.coalesce(db.func.sum(SellerSales.units), 0),
+        db.func.coalesce(db.func.sum(SellerSales.revenue), 0)
+    ).filter(SellerSales.seller_id == seller_id).one()
+    by_day = {
+        row.day: row for row in SellerSales.query.filter(
+            SellerSales.seller_id == seller_id, SellerSales.day >= first_day
+        )
+    }
+    series = []
+    for offset in range(SALES_SERIES_DAYS):
+        day = first_day + timedelta(days=offset)
+        row = by_day.get(day)
+        series.append({
+            'day': day,
+            'orders': row.orders if row else 0,
+            'units': row.units if row else 0,
+            'revenue': row.revenue if row else 0
+        })
+    return {'orders': orders, 'units': units, 'revenue': revenue, 'series': series}
+
+# ==================== ORDER STATUS ====================
+
+ORDER_STATUSES = ('Pending', 'Processing', 'Shipped', 'Delivered', 'Cancelled')
+
+# Moves the bulk status endpoint and sellers allow; Delivered and Cancelled
+# are final there. Admins correcting one order may move it anywhere.
+ORDER_TRANSITIONS = {
+    'Pending': ('Processing', 'Shipped', 'Cancelled'),
+    'Processing': ('Shipped', 'Cancelled'),
+    'Shipped': ('Delivered',),
+    'Delivered': (),
+    'Cancelled': (),
+}
+
+def transition_orders(order_ids, status, seller_id=None, any_move=False):
+    """Move orders to `status` in the current transaction: one SELECT and one UPDATE for the batch.
+
+    With seller_id, only orders that include that seller's products are
+    touched. With any_move, ORDER_TRANSITIONS is skipped. Returns ({order_id: (success, message)} for every id given,
+    the set of ids actually moved).
+    The UPDATE repeats the transition check in its WHERE clause, so an
+    order whose status changed after the SELECT is reported, not clobbered.
+    """
+    if any_move:
+        allowed_from = [current for current in ORDER_STATUSES if current != status]
+    else:
+        allowed_from = [current for current, targets in ORDER_TRANSITIONS.items() if status in targets]
+    manageable = Order.id.in_(order_ids)
+    if seller_id is not None:
+        manageable &= Order.id.in_(db.select(SellerOrder.order_id).where(SellerOrder.seller_id == seller_id))
+    current = dict(db.session.execute(db.select(Order.id, Order.status).where(manageable)).all())
+
+    results, movable = {}, []
+    for order_id in order_ids:
+        if order_id not in current:
+            results[order_id] = (False, 'no such order')
+        elif current[order_id] == status:
+            results[order_id] = (True, f'already {status}')
+        elif current[order_id] not in allowed_from:
+            results[order_id] = (False, f'cannot go from {current[order_id]} to {status}')
+        else:
+            movable.append(order_id)
+    if not movable:
+        return results, set()
+
+    moved = set(db.session.execute(
+        db.update(Order).where(manageable, Order.id.in_(movable), Order.status.in_(allowed_from))
+        .values(status=status, updated_at=datetime.utcnow())
+        .returning(Order.id).execution_options(synchronize_session=False)
+    ).scalars())
+    for order_id in movable:
+        results[order_id] = (True, f'{current[order_id]} -> {status}') if order_id in moved else (
+            False, 'status changed meanwhile; try again')
+    if status == 'Cancelled':
+        shift_orders_in_sales(moved, -1)
+    else:
+        shift_orders_in_sales({order_id for order_id in moved if current[order_id] == 'Cancelled'}, 1)
+    return results, moved
@@ -0,0 +1,235 @@
+"""Bulk product import for sellers: CSV or NDJSON, upserted by the seller's SKU.
+
+    flask --app app import-products catalogue.csv --seller acme
+    curl -b session.txt -F file=@catalogue.ndjson https://shop.example/seller/import_products
+
+Each row is one listing with the fields in IMPORT_FIELDS; sku, name and
+price are required, `category` is a category name. A row whose SKU the
+seller already uses replaces that listing's fields, any other row adds a
+listing. Rows are parsed one at a time from the stream and written in
+chunks of IMPORT_CHUNK_SIZE, each chunk one executemany
+INSERT ... ON CONFLICT (seller_id, sku) DO UPDATE in its own transaction,
+so memory stays flat however long the file is and no write lock is held
+for the whole import. Bad rows are reported by line and skipped; they
+never cost the rows around them.
+"""
+from datetime import datetime
+import csv
+import io
+import json
+import math
+import time
+
+from flask import current_app
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db, Category, Product
+from caching import cached_categories, forget_product, invalidate_pages
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+IMPORT_FIELDS = ('sku', 'name', 'price', 'stock', 'category', 'description', 'image_url')
+
+# ==================== PARSING ====================
+
+def import_format(name=None, filename=None, mimetype=None):
+    """'csv' or 'ndjson' from an explicit name, a file extension or a MIME type (None if unknown)"""
+    if name:
+        name = name.lower()
+        return 'ndjson' if name == 'jsonl' else name if name in IMPORT_FORMATS else None
+    extension = filename.rsplit('.', 1)[-1].lower() if filename and '.' in filename else None
+    if extension == 'csv' or mimetype == 'text/csv':
+        return 'csv'
+    if extension in ('ndjson', 'jsonl') or mimetype in ('application/x-ndjson', 'application/jsonl'):
+        return 'ndjson'
+    return None
+
+def read_rows(stream, fmt):
+    """Yield (line number, raw row dict) from a binary stream, reading it incrementally.
+
+    A row that cannot be parsed is yielded as (line, ValueError) so the
+    caller can report it and go on; undecodable bytes end the file.
+    """
+    if not hasattr(stream, 'read1'):
+        stream = io.BufferedReader(stream)
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        try:
+            for row in reader:
+                if None in row:
+                    yield reader.line_num, ValueError('more values than header columns')
+                else:
+                    yield reader.line_num, row
+        except csv.Error as e:
+            yield reader.line_num, ValueError(f'malformed CSV: {e}')
+        return
+    for line_number, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, ValueError(f'malformed JSON: {e}')
+            continue
+        if not isinstance(row, dict):
+            yield line_number, ValueError('each line must be a JSON object')
+            continue
+        yield line_number, row
+
+def _text(row, field, max_length=None, required=False):
+    value = row.get(field)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise ValueError(f'{field} is required')
+    if max_length and len(value) > max_length:
+        raise ValueError(f'{field} is longer than {max_length} characters')
+    return value
+
+def _number(row, field, kind, default=None):
+    value = row.get(field)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        if default is None:
+            raise ValueError(f'{field} is required')
+        return default
+    try:
+        number = kind(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} must be a{"n integer" if kind is int else " number"}, not {value!r}')
+    if isinstance(value, bool) or not math.isfinite(number) or number < 0:
+        raise ValueError(f'{field} must be zero or more, not {value!r}')
+    return number
+
+class CategoryNames:
+    """Category name -> id for one import, case-insensitive.
+
+    Starts from the cached category list; a name it lacks (a category
+    added by another worker within the cache's TTL) is looked up once and
+    remembered, found or not.
+    """
+
+    def __init__(self):
+        self.ids = {category.name.casefold(): category.id for category in cached_categories()}
+
+    def get(self, name):
+        key = name.casefold()
+        if key not in self.ids:
+            self.ids[key] = db.session.query(Category.id).filter(
+                db.func.lower(Category.name) == name.lower()).order_by(Category.id).limit(1).scalar()
+        return self.ids[key]
+
+def clean_row(row, category_ids):
+    """Validate one raw row against the Product columns; returns the values to write"""
+    category = _text(row, 'category')
+    category_id = None
+    if category:
+        category_id = category_ids.get(category.casefold())
+        if category_id is None:
+            raise ValueError(f'unknown category {category!r}')
+    return {
+        'sku': _text(row, 'sku', 64, required=True),
+        'name': _text(row, 'name', 100, required=True),
+        'price': round(_number(row, 'price', float), 2),
+        'stock': _number(row, 'stock', int, default=0),
+        'category_id': category_id,
+        'description': _text(row, 'description') or None,
+        'image_url': _text(row, 'image_url', 500) or None,
+    }
+
+# ==================== WRITING ====================
+
+class ImportReport:
+    """Counts, the first IMPORT_MAX_ERRORS row errors and throughput of one import"""
+
+    def __init__(self, max_errors):
+        self.max_errors = max_errors
+        self.rows = self.inserted = self.updated = self.failed = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'error': message})
+
+    def to_dict(self):
+        return {
+            'rows': self.rows, 'inserted': self.inserted, 'updated': self.updated, 'failed': self.failed,
+            'errors': self.errors, 'seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows / self.elapsed) if self.elapsed else 0,
+        }
+
+def _upsert_statement():
+    insert = sqlite_insert(Product)
+    replaced = ('name', 'price', 'stock', 'category_id', 'description', 'image_url', 'updated_at')
+    return insert.on_conflict_do_update(
+        index_elements=['seller_id', 'sku'],
+        set_={**{name: insert.excluded[name] for name in replaced}, 'version': Product.version + 1},
+    ).returning(Product.id, Product.version)
+
+def _write_chunk(statement, chunk, report):
+    """Upsert one chunk in its own transaction; returns [(id, version)] of the rows written.
+
+    If the batch fails as a whole it is retried row by row, so only the
+    offending rows are reported and lost.
+    """
+    try:
+        written = db.session.execute(statement, [values for _, values in chunk]).all()
+        db.session.commit()
+        return written
+    except SQLAlchemyError:
+        db.session.rollback()
+    if len(chunk) == 1:
+        line, values = chunk[0]
+        report.error(line, f'could not save SKU {values["sku"]!r}')
+        return []
+    return [row for one in chunk for row in _write_chunk(statement, [one], report)]
+
+def import_products(stream, seller_id, fmt, chunk_size=None, progress=None):
+    """Stream rows from `stream` into the seller's catalogue; returns an ImportReport (needs an app context)"""
+    chunk_size = chunk_size or current_app.config['IMPORT_CHUNK_SIZE']
+    report = ImportReport(current_app.config['IMPORT_MAX_ERRORS'])
+    category_ids = CategoryNames()
+    statement = _upsert_statement()
+    updated_ids = []
+    chunk = []
+
+    def flush():
+        now = datetime.utcnow()
+        for _, values in chunk:
+            values['created_at'] = values['updated_at'] = now
+        for product_id, version in _write_chunk(statement, chunk, report):
+            if version == 1:
+                report.inserted += 1
+            else:
+                report.updated += 1
+                updated_ids.append(product_id)
+        chunk.clear()
+        if progress:
+            progress(report)
+
+    try:
+        for line, row in read_rows(stream, fmt):
+            report.rows += 1
+            try:
+                if isinstance(row, ValueError):
+                    raise row
+                chunk.append((line, {**clean_row(row, category_ids), 'seller_id': seller_id}))
+            except ValueError as e:
+                report.error(line, str(e))
+                continue
+            if len(chunk) >= chunk_size:
+                flush()
+    except UnicodeDecodeError:
+        report.error(None, 'file is not UTF-8 text; import stopped')
+    if chunk:
+        flush()
+
+    # Listing pages all carry the 'categories' tag; updated products' own pages are dropped too
+    if report.inserted or report.updated:
+        for product_id in updated_ids:
+            forget_product(product_id)
+        invalidate_pages('categories', *(f'product:{product_id}' for product_id in updated_ids))
+    report.elapsed = time.perf_counter() - report.started
+    return report
@@ -0,0 +1,213 @@
+"""Durable background jobs: a queue in the job table and a pool of worker threads.
+
+    enqueue('notify_order', order_id=42)     in the caller's transaction
+    start_job_workers(app)                   JOB_WORKERS threads in this process
+    flask --app app run-jobs [--burst]       a dedicated worker process
+
+A job names a registered @task and carries its arguments as JSON. It is
+inserted in the same transaction as the change that needs it, so it
+exists exactly when that change was committed. Workers claim the oldest
+due job with one UPDATE ... RETURNING, which SQLite serialises, so no two
+workers (threads or processes) take the same job. An idle worker first
+asks with a plain SELECT whether anything is due, so polling an empty
+queue takes no write lock. The task then runs in
+the worker's session and the job row is deleted in that same transaction,
+so a task's writes are committed once, together with its removal.
+
+A task that raises is tried again after JOB_RETRY_BASE_SECONDS, doubling
+each time up to JOB_RETRY_MAX_SECONDS (with jitter), and is kept as
+'failed' after JOB_MAX_ATTEMPTS. A job still 'running' after
+JOB_TIMEOUT_SECONDS belonged to a worker that died and is queued again;
+one thread per process looks for those every JOB_REQUEUE_SECONDS.
+"""
+from datetime import date, datetime, timedelta
+import json
+import random
+import threading
+import time
+
+from flask import current_app
+
+from models import db, Activity, Job, Order, OrderItem, Product
+from helpers import refresh_sales
+
+JOB_STATUSES = ('queued', 'running', 'failed')
+
+# Task name -> function(**payload)
+TASKS = {}
+
+# Set after a commit that queued jobs, so idle workers in this process look at once
+_wakeup = threading.Event()
+
+def task(name):
+    """Register a function as the task `name`; its keyword arguments are the job payload"""
+    def register(func):
+        TASKS[name] = func
+        return func
+    return register
+
+# ==================== QUEUE ====================
+
+def job_row(task_name, delay=0, **payload):
+    """The job table row that runs TASKS[task_name](**payload) in `delay` seconds"""
+    if task_name not in TASKS:
+        raise ValueError(f'unknown task {task_name!r}')
+    now = datetime.utcnow()
+    return {'task': task_name, 'payload': json.dumps(payload), 'status': 'queued', 'attempts': 0,
+            'run_at': now + timedelta(seconds=delay), 'created_at': now}
+
+def enqueue_many(rows):
+    """Add several job_row()s to the current transaction with one INSERT; they run once it commits"""
+    db.session.execute(db.insert(Job), rows)
+
+def enqueue(task_name, delay=0, **payload):
+    """Add one job to the current transaction; it runs once that commits"""
+    enqueue_many([job_row(task_name, delay, **payload)])
+
+def wake_job_workers():
+    """Tell this process's idle workers that new jobs were committed"""
+    _wakeup.set()
+
+def job_due(now):
+    """Whether any queued job is due at `now`; a read that takes no write lock"""
+    return db.session.execute(
+        db.select(db.literal(1)).where(Job.status == 'queued', Job.run_at <= now).limit(1)
+    ).first() is not None
+
+def claim_job():
+    """Mark the oldest due job running and return it (id, task, payload, attempts, run_at), or None"""
+    now = datetime.utcnow()
+    if not job_due(now):
+        return None
+    oldest_due = db.select(Job.id).where(Job.status == 'queued', Job.run_at <= now).order_by(
+        Job.run_at, Job.id).limit(1).scalar_subquery()
+    job = db.session.execute(
+        db.update(Job).where(Job.id == oldest_due, Job.status == 'queued')
+        .values(status='running', started_at=now, attempts=Job.attempts + 1)
+        .returning(Job.id, Job.task, Job.payload, Job.attempts, Job.run_at)
+        .execution_options(synchronize_session=False)
+    ).first()
+    db.session.commit()
+    return job
+
+def requeue_stale_jobs():
+    """Queue again the jobs whose worker died mid-run; returns how many"""
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['JOB_TIMEOUT_SECONDS'])
+    requeued = db.session.execute(
+        db.update(Job).where(Job.status == 'running', Job.started_at < cutoff)
+        .values(status='queued', run_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return requeued
+
+def retry_delay(attempts):
+    """Seconds before attempt `attempts` + 1: exponential backoff with jitter"""
+    config = current_app.config
+    delay = min(config['JOB_RETRY_MAX_SECONDS'], config['JOB_RETRY_BASE_SECONDS'] * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+def run_job(job):
+    """Run one claimed job; returns 'done', 'retry' or 'failed'"""
+    started = time.perf_counter()
+    wait = (datetime.utcnow() - job.run_at).total_seconds()
+    try:
+        func = TASKS.get(job.task)
+        if func is None:
+            raise LookupError(f'unknown task {job.task!r}')
+        func(**json.loads(job.payload))
+        db.session.execute(db.delete(Job).where(Job.id == job.id))
+        db.session.commit()
+        outcome = 'done'
+    except Exception as e:
+        db.session.rollback()
+        outcome = 'retry' if job.attempts < current_app.config['JOB_MAX_ATTEMPTS'] else 'failed'
+        current_app.logger.warning(f'Job {job.id} ({job.task}) attempt {job.attempts} failed: {e!r}')
+        values = {'status': 'queued' if outcome == 'retry' else 'failed', 'last_error': repr(e)[:2000]}
+        if outcome == 'retry':
+            values['run_at'] = datetime.utcnow() + timedelta(seconds=retry_delay(job.attempts))
+        # If this fails too the job stays 'running' and requeue_stale_jobs() picks it up
+        db.session.execute(db.update(Job).where(Job.id == job.id).values(**values))
+        db.session.commit()
+    metrics = current_app.extensions.get('metrics')
+    if metrics is not None:
+        metrics.record_job(job.task, outcome, max(wait, 0), time.perf_counter() - started)
+    return outcome
+
+def run_jobs(limit=None):
+    """Run due jobs in this thread until none are left (or `limit` have run); returns how many ran"""
+    ran = 0
+    while limit is None or ran < limit:
+        job = claim_job()
+        if job is None:
+            break
+        run_job(job)
+        ran += 1
+    return ran
+
+def job_queue_depth():
+    """{status: number of jobs} for every status, zeros included"""
+    counts = dict(db.session.query(Job.status, db.func.count()).group_by(Job.status).all())
+    return {status: counts.get(status, 0) for status in JOB_STATUSES}
+
+def start_job_workers(app, count=None):
+    """Run JOB_WORKERS daemon threads that take jobs off the queue as they come due"""
+    def work(requeues):
+        next_requeue = time.monotonic()
+        while True:
+            with app.app_context():
+                try:
+                    if requeues and time.monotonic() >= next_requeue:
+                        next_requeue = time.monotonic() + app.config['JOB_REQUEUE_SECONDS']
+                        requeue_stale_jobs()
+                    job = claim_job()
+                    if job is not None:
+                        run_job(job)
+                        continue
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.warning(f'Job worker error: {e}')
+            _wakeup.wait(app.config['JOB_POLL_SECONDS'])
+            _wakeup.clear()
+
+    workers = []
+    for number in range(count or app.config['JOB_WORKERS']):
+        # Only the first thread looks for jobs stranded by dead workers
+        worker = threading.Thread(target=work, args=(number == 0,), name=f'job-worker-{number}', daemon=True)
+        worker.start()
+        workers.append(worker)
+    return workers
+
+# ==================== CHECKOUT TASKS ====================
+
+@task('refresh_sales')
+def refresh_sales_task(day, seller_ids):
+    # A full recompute of the day, so it comes out right whether or not the
+    # order was cancelled (and taken back out) before this job ran
+    refresh_sales(date.fromisoformat(day), seller_ids)
+
+@task('notify_order')
+def notify_order(order_id):
+    """Activity records for a new order: one for the buyer, and one per line for its seller"""
+    order = db.session.get(Order, order_id)
+    if order is None:
+        return
+    lines = db.session.query(OrderItem.product_id, OrderItem.quantity, Product.name, Product.seller_id).join(
+        Product, OrderItem.product_id == Product.id).filter(OrderItem.order_id == order_id).all()
+    units = sum(line.quantity for line in lines)
+    activities = [{'user_id': order.buyer_id, 'product_id': None, 'action': 'order_placed',
+                   'details': f'Order #{order_id} placed: {units} item(s), ${order.total_amount:.2f}'}]
+    activities.extend(
+        {'user_id': line.seller_id, 'product_id': line.product_id, 'action': 'product_sold',
+         'details': f'Order #{order_id}: {line.quantity} x {line.name}'[:200]}
+        for line in lines
+    )
+    now = datetime.utcnow()
+    db.session.execute(db.insert(Activity), [{**activity, 'created_at': now} for activity in activities])
+
+def checkout_jobs(order, seller_ids):
+    """Queue the work a new order needs after checkout"""
+    enqueue_many([
+        job_row('refresh_sales', day=order.created_at.date().isoformat(), seller_ids=sorted(seller_ids)),
+        job_row('notify_order', order_id=order.id),
+    ])
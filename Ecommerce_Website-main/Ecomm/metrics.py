@@ -0,0 +1,237 @@
+"""Per-route request metrics: latency, SQL statements, template rendering, N+1 hints.
+
+init_metrics(app) hooks the request cycle, the SQLAlchemy engine and
+Flask's template signals; /metrics serves the totals in the Prometheus
+text format, along with background job latencies and the job queue depth.
+Counters live in process memory, so under several gunicorn workers each
+scrape reports the worker that answered it; only the queue depth, read
+from the job table on every scrape, covers all of them. Set METRICS_TOKEN
+for scrapers from other machines; without it only local requests are served.
+"""
+from bisect import bisect_left
+from collections import Counter
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request, before_render_template, template_rendered
+
+from models import db
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+# A backed-up queue keeps jobs waiting far longer than any request takes
+JOB_WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+# ==================== METRIC TYPES ====================
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, as Prometheus expects"""
+
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name, self.help_text, self.label_names, self.buckets = name, help_text, label_names, buckets
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        # Only the first bucket that fits is bumped; render() accumulates
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for labels, (counts, total) in sorted(self.series.items()):
+            base = format_labels(self.label_names, labels)
+            running = 0
+            for bound, count in zip(self.buckets, counts):
+                running += count
+                lines.append(f'{self.name}_bucket{{{base}le="{bound}"}} {running}')
+            running += counts[-1]
+            lines.append(f'{self.name}_bucket{{{base}le="+Inf"}} {running}')
+            lines.append(f'{self.name}_sum{{{base.rstrip(",")}}} {total:.6f}')
+            lines.append(f'{self.name}_count{{{base.rstrip(",")}}} {running}')
+        return lines
+
+class CounterMetric:
+    """Monotonic counter per label set"""
+
+    def __init__(self, name, help_text, label_names):
+        self.name, self.help_text, self.label_names = name, help_text, label_names
+        self.series = Counter()
+
+    def inc(self, labels, amount=1):
+        self.series[labels] += amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        for labels, value in sorted(self.series.items()):
+            lines.append(f'{self.name}{{{format_labels(self.label_names, labels).rstrip(",")}}} {value:g}')
+        return lines
+
+class GaugeMetric:
+    """Current value per label set, replaced on every set()"""
+
+    def __init__(self, name, help_text, label_names):
+        self.name, self.help_text, self.label_names = name, help_text, label_names
+        self.series = {}
+
+    def set(self, labels, value):
+        self.series[labels] = value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} gauge']
+        for labels, value in sorted(self.series.items()):
+            lines.append(f'{self.name}{{{format_labels(self.label_names, labels).rstrip(",")}}} {value:g}')
+        return lines
+
+def format_labels(names, values):
+    """'a="x",b="y",' with the escaping the text format requires"""
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in values)
+    return ''.join(f'{name}="{value}",' for name, value in zip(names, escaped))
+
+# ==================== REGISTRY ====================
+
+class Metrics:
+    """Every metric the app exports, behind one lock"""
+
+    def __init__(self, n_plus_one_threshold):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.lock = threading.Lock()
+        self.request_latency = Histogram(
+            'ecomm_http_request_duration_seconds', 'Time spent handling a request.',
+            ('endpoint', 'method'), LATENCY_BUCKETS)
+        self.requests = CounterMetric(
+            'ecomm_http_requests_total', 'Requests handled, by response status.',
+            ('endpoint', 'method', 'status'))
+        self.sql_per_request = Histogram(
+            'ecomm_sql_queries_per_request', 'SQL statements issued by one request.',
+            ('endpoint',), QUERY_COUNT_BUCKETS)
+        self.sql_queries = CounterMetric(
+            'ecomm_sql_queries_total', 'SQL statements issued while handling requests.', ('endpoint',))
+        self.sql_seconds = CounterMetric(
+            'ecomm_sql_duration_seconds_total', 'Time spent in SQL statements while handling requests.',
+            ('endpoint',))
+        self.template_render = Histogram(
+            'ecomm_template_render_seconds', 'Time spent rendering a template.',
+            ('template',), LATENCY_BUCKETS)
+        self.n_plus_one = CounterMetric(
+            'ecomm_n_plus_one_suspected_total',
+            'Requests that repeated one SQL statement more than the N+1 threshold.', ('endpoint',))
+        self.job_wait = Histogram(
+            'ecomm_job_wait_seconds', 'Time from a job being due to a worker starting it.',
+            ('task',), JOB_WAIT_BUCKETS)
+        self.job_duration = Histogram(
+            'ecomm_job_duration_seconds', 'Time spent running a job.', ('task',), LATENCY_BUCKETS)
+        self.jobs = CounterMetric(
+            'ecomm_jobs_total', 'Job runs, by outcome (done, retry, failed).', ('task', 'outcome'))
+        self.job_queue_depth = GaugeMetric(
+            'ecomm_job_queue_depth', 'Jobs in the queue table, by status, across every process.', ('status',))
+
+    def record_request(self, endpoint, method, status, duration, stats):
+        queries = sum(stats.statements.values())
+        with self.lock:
+            self.request_latency.observe((endpoint, method), duration)
+            self.requests.inc((endpoint, method, status))
+            self.sql_per_request.observe((endpoint,), queries)
+            self.sql_queries.inc((endpoint,), queries)
+            self.sql_seconds.inc((endpoint,), stats.sql_seconds)
+            if stats.repeated:
+                self.n_plus_one.inc((endpoint,))
+
+    def record_template(self, name, duration):
+        with self.lock:
+            self.template_render.observe((name,), duration)
+
+    def record_job(self, task, outcome, wait, duration):
+        with self.lock:
+            self.job_wait.observe((task,), wait)
+            self.job_duration.observe((task,), duration)
+            self.jobs.inc((task, outcome))
+
+    def record_queue_depth(self, depths):
+        with self.lock:
+            for status, count in depths.items():
+                self.job_queue_depth.set((status,), count)
+
+    def render(self):
+        with self.lock:
+            lines = []
+            for metric in (self.request_latency, self.requests, self.sql_per_request, self.sql_queries,
+                           self.sql_seconds, self.template_render, self.n_plus_one, self.job_wait,
+                           self.job_duration, self.jobs, self.job_queue_depth):
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+class RequestStats:
+    """What one request has done so far, kept on flask.g"""
+
+    __slots__ = ('started', 'statements', 'sql_seconds', 'template_starts', 'repeated')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = Counter()
+        self.sql_seconds = 0.0
+        self.template_starts = []
+        self.repeated = None
+
+# ==================== HOOKS ====================
+
+def init_metrics(app):
+    """Start recording metrics for `app`; the registry is app.extensions['metrics']"""
+    metrics = app.extensions['metrics'] = Metrics(app.config['METRICS_N_PLUS_ONE_THRESHOLD'])
+
+    @app.before_request
+    def _start_request_metrics():
+        g.request_stats = RequestStats()
+
+    @app.teardown_request
+    def _finish_request_metrics(exc):
+        stats = g.pop('request_stats', None)
+        if stats is None:
+            return
+        # Unmatched URLs share one label so a scan of random paths cannot blow up the series count
+        endpoint = request.endpoint or 'unmatched'
+        status = getattr(g, 'response_status', 500)
+        threshold = metrics.n_plus_one_threshold
+        if threshold and stats.statements:
+            statement, count = stats.statements.most_common(1)[0]
+            if count > threshold:
+                stats.repeated = statement
+                current_app.logger.warning(
+                    f'Possible N+1 in {endpoint}: statement ran {count} times: {" ".join(statement.split())[:200]}')
+        metrics.record_request(endpoint, request.method, status, time.perf_counter() - stats.started, stats)
+
+    @app.after_request
+    def _remember_status(response):
+        g.response_status = response.status_code
+        return response
+
+    with app.app_context():
+        engine = db.engine
+
+    @db.event.listens_for(engine, 'before_cursor_execute')
+    def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        # Kept on the execution context, so a statement that raises leaves nothing behind
+        context.metrics_started = time.perf_counter()
+
+    @db.event.listens_for(engine, 'after_cursor_execute')
+    def _stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+        stats = g.get('request_stats') if has_request_context() else None
+        if stats is not None:
+            stats.sql_seconds += time.perf_counter() - context.metrics_started
+            stats.statements[statement] += 1
+
+    def _start_template_timer(sender, template, context, **extra):
+        stats = g.get('request_stats')
+        if stats is not None:
+            stats.template_starts.append(time.perf_counter())
+
+    def _stop_template_timer(sender, template, context, **extra):
+        stats = g.get('request_stats')
+        if stats is not None and stats.template_starts:
+            metrics.record_template(template.name or 'string', time.perf_counter() - stats.template_starts.pop())
+
+    before_render_template.connect(_start_template_timer, app, weak=False)
+    template_rendered.connect(_stop_template_timer, app, weak=False)
+    return metrics
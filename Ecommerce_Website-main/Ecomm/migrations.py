@@ -0,0 +1,394 @@
+"""Versioned schema migrations and first-run database setup"""
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import generate_password_hash
+
+from models import db, User, SchemaMigration, rebuild_search_index, backfill_ratings
+from helpers import rebuild_sales_rollup, rebuild_seller_orders
+
+# ==================== SCHEMA MIGRATIONS ====================
+
+# Numbered, forward-only schema changes, recorded in schema_migration. Each
+# one runs in its own BEGIN IMMEDIATE transaction together with its record,
+# so a failed step leaves the database at the previous version and two
+# processes starting at once cannot both apply it. Migrations only ever add
+# tables, columns, indexes and triggers; no data is dropped or rewritten,
+# and an index is only dropped once another one covers its queries.
+MIGRATIONS = []
+
+SCHEMA_MIGRATION_DDL = """CREATE TABLE IF NOT EXISTS schema_migration (
+    version INTEGER NOT NULL,
+    description VARCHAR(200) NOT NULL,
+    applied_at DATETIME NOT NULL,
+    PRIMARY KEY (version)
+)"""
+
+def migration(version, description):
+    """Register a function(connection) as schema migration number `version`"""
+    def register(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda entry: entry[0])
+        return func
+    return register
+
+def schema_version(connection=None):
+    """Highest applied migration number (0 for a database that predates migrations)"""
+    if connection is None:
+        with db.engine.connect() as connection:
+            return schema_version(connection)
+    from sqlalchemy import inspect
+    if not inspect(connection).has_table(SchemaMigration.__tablename__):
+        return 0
+    return connection.execute(db.select(db.func.coalesce(db.func.max(SchemaMigration.version), 0))).scalar()
+
+def migrate_database():
+    """Apply every pending migration in order; returns [(version, description)] applied"""
+    applied = []
+    # The driver must not open transactions on its own: DDL has to run inside ours
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.exec_driver_sql(SCHEMA_MIGRATION_DDL)
+        for version, description, step in MIGRATIONS:
+            conn.exec_driver_sql('BEGIN IMMEDIATE')
+            try:
+                done = conn.execute(
+                    db.select(SchemaMigration.version).where(SchemaMigration.version == version)
+                ).first()
+                if done is None:
+                    step(conn)
+                    conn.execute(db.insert(SchemaMigration).values(
+                        version=version, description=description, applied_at=datetime.utcnow()
+                    ))
+                    applied.append((version, description))
+                conn.exec_driver_sql('COMMIT')
+            except Exception:
+                conn.exec_driver_sql('ROLLBACK')
+                raise
+    return applied
+
+# Every migration spells out its own DDL rather than deriving it from the
+# models, so a version number always stands for the same schema however
+# the models change later. A new model column or index needs a new
+# migration; test_startup checks that the migrated schema matches the models.
+
+# The tables as they stood when versioned migrations began: the shop's
+# original tables plus the search index, reservation, rollup and rating
+# tables that were added before migration 2.
+BASELINE_TABLES = [
+    """CREATE TABLE IF NOT EXISTS user (
+        id INTEGER NOT NULL,
+        username VARCHAR(50) NOT NULL,
+        email VARCHAR(100) NOT NULL,
+        password_hash VARCHAR(255) NOT NULL,
+        password_plain VARCHAR(255),
+        role VARCHAR(10) NOT NULL,
+        version INTEGER DEFAULT 1 NOT NULL,
+        created_at DATETIME,
+        PRIMARY KEY (id),
+        UNIQUE (username),
+        UNIQUE (email)
+    )""",
+    """CREATE TABLE IF NOT EXISTS category (
+        id INTEGER NOT NULL,
+        name VARCHAR(50) NOT NULL,
+        PRIMARY KEY (id),
+        UNIQUE (name)
+    )""",
+    """CREATE TABLE IF NOT EXISTS product (
+        id INTEGER NOT NULL,
+        name VARCHAR(100) NOT NULL,
+        description TEXT,
+        price FLOAT NOT NULL,
+        image_url VARCHAR(500),
+        additional_images TEXT,
+        video_url VARCHAR(500),
+        stock INTEGER NOT NULL,
+        reserved INTEGER DEFAULT 0 NOT NULL,
+        category_id INTEGER,
+        seller_id INTEGER NOT NULL,
+        created_at DATETIME,
+        PRIMARY KEY (id),
+        FOREIGN KEY(category_id) REFERENCES category (id),
+        FOREIGN KEY(seller_id) REFERENCES user (id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS "order" (
+        id INTEGER NOT NULL,
+        buyer_id INTEGER NOT NULL,
+        total_amount FLOAT NOT NULL,
+        status VARCHAR(20),
+        shipping_address TEXT,
+        created_at DATETIME,
+        updated_at DATETIME,
+        PRIMARY KEY (id),
+        FOREIGN KEY(buyer_id) REFERENCES user (id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS cart_item (
+        id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        created_at DATETIME,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES user (id),
+        FOREIGN KEY(product_id) REFERENCES product (id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS order_item (
+        id INTEGER NOT NULL,
+        order_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        price FLOAT NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(order_id) REFERENCES "order" (id),
+        FOREIGN KEY(product_id) REFERENCES product (id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS wishlist_item (
+        id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        created_at DATETIME,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES user (id),
+        FOREIGN KEY(product_id) REFERENCES product (id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS review (
+        id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        rating INTEGER NOT NULL,
+        comment TEXT,
+        created_at DATETIME,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES user (id),
+        FOREIGN KEY(product_id) REFERENCES product (id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS activity (
+        id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        product_id INTEGER,
+        action VARCHAR(50) NOT NULL,
+        details VARCHAR(200),
+        created_at DATETIME,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES user (id),
+        FOREIGN KEY(product_id) REFERENCES product (id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS stock_reservation (
+        id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        expires_at DATETIME NOT NULL,
+        created_at DATETIME,
+        PRIMARY KEY (id),
+        UNIQUE (user_id, product_id),
+        FOREIGN KEY(user_id) REFERENCES user (id),
+        FOREIGN KEY(product_id) REFERENCES product (id)
+    )""",
+    'CREATE INDEX IF NOT EXISTS ix_stock_reservation_expires_at ON stock_reservation (expires_at)',
+    """CREATE TABLE IF NOT EXISTS seller_sales (
+        seller_id INTEGER NOT NULL,
+        day DATE NOT NULL,
+        orders INTEGER NOT NULL,
+        units INTEGER NOT NULL,
+        revenue FLOAT NOT NULL,
+        PRIMARY KEY (seller_id, day),
+        FOREIGN KEY(seller_id) REFERENCES user (id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS seller_order (
+        seller_id INTEGER NOT NULL,
+        order_id INTEGER NOT NULL,
+        created_at DATETIME NOT NULL,
+        subtotal FLOAT NOT NULL,
+        item_count INTEGER NOT NULL,
+        PRIMARY KEY (seller_id, order_id),
+        FOREIGN KEY(seller_id) REFERENCES user (id),
+        FOREIGN KEY(order_id) REFERENCES "order" (id)
+    )""",
+    'CREATE INDEX IF NOT EXISTS ix_seller_order_listing ON seller_order (seller_id, created_at, order_id, subtotal, item_count)',
+    """CREATE TABLE IF NOT EXISTS product_rating (
+        product_id INTEGER NOT NULL,
+        review_count INTEGER NOT NULL,
+        rating_sum INTEGER NOT NULL,
+        stars_1 INTEGER NOT NULL,
+        stars_2 INTEGER NOT NULL,
+        stars_3 INTEGER NOT NULL,
+        stars_4 INTEGER NOT NULL,
+        stars_5 INTEGER NOT NULL,
+        PRIMARY KEY (product_id),
+        FOREIGN KEY(product_id) REFERENCES product (id)
+    )""",
+]
+
+# Columns of the baseline tables that databases from before migrations may
+# lack: the one-off repair for those, run by the baseline and nowhere else
+BASELINE_REPAIRS = [
+    ('user', 'password_plain', 'VARCHAR(255)'),
+    ('user', 'version', 'INTEGER DEFAULT 1 NOT NULL'),
+    ('product', 'reserved', 'INTEGER DEFAULT 0 NOT NULL'),
+]
+
+@migration(1, 'baseline schema')
+def _migrate_baseline(conn):
+    """Create the baseline tables, and fill derived tables for databases that predate them"""
+    def missing(name):
+        return conn.exec_driver_sql('SELECT 1 FROM sqlite_master WHERE name = ?', (name,)).first() is None
+
+    existing_tables = {name for name in ('seller_sales', 'seller_order') if not missing(name)}
+    for statement in BASELINE_TABLES:
+        conn.exec_driver_sql(statement)
+    for table_name, column_name, column_ddl in BASELINE_REPAIRS:
+        columns = {row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info("{table_name}")')}
+        if column_name not in columns:
+            conn.exec_driver_sql(f'ALTER TABLE "{table_name}" ADD COLUMN {column_name} {column_ddl}')
+
+    # Derived data that databases from before each feature have to build once
+    if missing('product_fts'):
+        rebuild_search_index(conn)
+    if missing('review_rating_ai'):
+        backfill_ratings(conn)
+    if 'seller_sales' not in existing_tables:
+        rebuild_sales_rollup(conn)
+    if 'seller_order' not in existing_tables:
+        rebuild_seller_orders(conn)
+
+# Indexes for the filters, joins and sort orders of the hot queries. Single
+# column indexes the list asks for are covered by a composite's leading
+# column: product.stock by (stock, created_at), product.category_id by
+# (category_id, stock, price) and product.seller_id by (seller_id, created_at).
+# Migration 8 replaces the two stock composites with partial indexes.
+INDEX_PACK = [
+    'CREATE INDEX IF NOT EXISTS ix_product_stock_created ON product (stock, created_at)',
+    'CREATE INDEX IF NOT EXISTS ix_product_category_stock_price ON product (category_id, stock, price)',
+    'CREATE INDEX IF NOT EXISTS ix_product_seller_created ON product (seller_id, created_at)',
+    'CREATE INDEX IF NOT EXISTS ix_cart_item_user_product ON cart_item (user_id, product_id)',
+    'CREATE INDEX IF NOT EXISTS ix_wishlist_item_user_product ON wishlist_item (user_id, product_id)',
+    'CREATE INDEX IF NOT EXISTS ix_order_buyer_created ON "order" (buyer_id, created_at)',
+    'CREATE INDEX IF NOT EXISTS ix_order_status ON "order" (status, total_amount)',
+    'CREATE INDEX IF NOT EXISTS ix_order_item_order ON order_item (order_id)',
+    'CREATE INDEX IF NOT EXISTS ix_review_product_created ON review (product_id, created_at)',
+]
+
+@migration(2, 'index pack for hot queries')
+def _migrate_index_pack(conn):
+    for statement in INDEX_PACK:
+        conn.exec_driver_sql(statement)
+
+@migration(3, 'product version stamp for cached product cards')
+def _migrate_product_version(conn):
+    conn.exec_driver_sql('ALTER TABLE product ADD COLUMN version INTEGER DEFAULT 1 NOT NULL')
+
+@migration(4, 'product update time for Last-Modified headers')
+def _migrate_product_updated_at(conn):
+    conn.exec_driver_sql('ALTER TABLE product ADD COLUMN updated_at DATETIME')
+    conn.exec_driver_sql('UPDATE product SET updated_at = created_at WHERE updated_at IS NULL')
+
+@migration(5, 'seller SKUs for bulk product imports')
+def _migrate_product_sku(conn):
+    conn.exec_driver_sql('ALTER TABLE product ADD COLUMN sku VARCHAR(64)')
+    # The ON CONFLICT target of the import upsert; products without a SKU (NULL) never clash
+    conn.exec_driver_sql('CREATE UNIQUE INDEX IF NOT EXISTS ix_product_seller_sku ON product (seller_id, sku)')
+
+@migration(6, 'background job queue and activity records')
+def _migrate_job_queue(conn):
+    conn.exec_driver_sql("""CREATE TABLE IF NOT EXISTS job (
+        id INTEGER NOT NULL,
+        task VARCHAR(50) NOT NULL,
+        payload TEXT NOT NULL,
+        status VARCHAR(10) NOT NULL,
+        attempts INTEGER NOT NULL,
+        run_at DATETIME NOT NULL,
+        created_at DATETIME NOT NULL,
+        started_at DATETIME,
+        last_error TEXT,
+        PRIMARY KEY (id)
+    )""")
+    conn.exec_driver_sql('CREATE INDEX IF NOT EXISTS ix_job_status_run_at ON job (status, run_at)')
+    # The activity table is part of the baseline, without this index
+    conn.exec_driver_sql('CREATE INDEX IF NOT EXISTS ix_activity_user_created ON activity (user_id, created_at)')
+
+@migration(7, 'user version stamp times for cross-worker session checks')
+def _migrate_user_version_changed_at(conn):
+    conn.exec_driver_sql('ALTER TABLE user ADD COLUMN version_changed_at DATETIME')
+    conn.exec_driver_sql('CREATE INDEX IF NOT EXISTS ix_user_version_changed_at ON user (version_changed_at)')
+
+# Partial indexes in the exact order each storefront listing sorts in-stock
+# products, so a page is read straight off the index (seeking to the cursor)
+# instead of sorting every in-stock row first. Queries must spell the filter
+# as the literal `stock > 0` (helpers.IN_STOCK) for SQLite to pick them.
+# They replace ix_product_stock_created and ix_product_category_stock_price,
+# which the planner would otherwise still prefer, then sort their matches.
+LISTING_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS ix_product_listed_created ON product (created_at, id) WHERE stock > 0',
+    'CREATE INDEX IF NOT EXISTS ix_product_listed_price ON product (price, id) WHERE stock > 0',
+    'CREATE INDEX IF NOT EXISTS ix_product_listed_category_created ON product (category_id, created_at, id) WHERE stock > 0',
+    'CREATE INDEX IF NOT EXISTS ix_product_listed_category_price ON product (category_id, price, id) WHERE stock > 0',
+]
+
+@migration(8, 'partial indexes in listing sort order')
+def _migrate_listing_indexes(conn):
+    for statement in LISTING_INDEXES:
+        conn.exec_driver_sql(statement)
+    conn.exec_driver_sql('DROP INDEX IF EXISTS ix_product_stock_created')
+    conn.exec_driver_sql('DROP INDEX IF EXISTS ix_product_category_stock_price')
+
+# The admin user and product tables page through every row in whichever
+# column the admin sorts by; username and email have their unique indexes
+ADMIN_SORT_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS ix_user_role_id ON user (role, id)',
+    'CREATE INDEX IF NOT EXISTS ix_user_created_id ON user (created_at, id)',
+    'CREATE INDEX IF NOT EXISTS ix_product_name_id ON product (name, id)',
+    'CREATE INDEX IF NOT EXISTS ix_product_price_id ON product (price, id)',
+    'CREATE INDEX IF NOT EXISTS ix_product_stock_id ON product (stock, id)',
+    'CREATE INDEX IF NOT EXISTS ix_product_created_id ON product (created_at, id)',
+]
+
+@migration(9, 'indexes for the admin table sort orders')
+def _migrate_admin_sort_indexes(conn):
+    for statement in ADMIN_SORT_INDEXES:
+        conn.exec_driver_sql(statement)
+
+# ==================== DATABASE SETUP ====================
+
+def init_database():
+    """Bring the schema up to date and create the default admin user (needs an app context).
+
+    Errors are reported and then raised again, so callers (and deploy
+    scripts running `flask init-database`) see the failure.
+    """
+    try:
+        applied = migrate_database()
+        for version, description in applied:
+            print(f"Applied migration {version}: {description}")
+        if not applied:
+            print("Database schema is up to date.")
+
+        # Ensure admin user exists
+        admin_user = User.query.filter_by(username='admin').first()
+        if not admin_user:
+            print("Creating default admin user...")
+            admin = User(
+                username='admin',
+                email='admin@example.com',
+                password_hash=generate_password_hash('admin123'),
+                password_plain='admin123',  # Store plain text password for admin viewing
+                role='admin'
+            )
+            db.session.add(admin)
+            try:
+                db.session.commit()
+                print("Default admin user created successfully!")
+                print("Username: admin")
+                print("Password: admin123")
+            except IntegrityError:
+                # Another worker starting at the same time created it first
+                db.session.rollback()
+                print("Admin user already exists.")
+        else:
+            print("Admin user already exists.")
+
+    except Exception as e:
+        # A failed migration is rolled back, so the database is still at the previous version
+        print(f"Error initializing database: {e}")
+        print("Fix the problem and run 'flask --app app init-database' again.")
+        raise
@@ -0,0 +1,318 @@
+"""Database models, plus the SQLite objects kept in step with them (search index, rating triggers)"""
+from datetime import datetime
+import re
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import table, column, literal_column
+
+# Bound to an app in create_app()
+db = SQLAlchemy()
+
+# ==================== MODELS ====================
+
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(50), unique=True, nullable=False)
+    email = db.Column(db.String(100), unique=True, nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)
+    password_plain = db.Column(db.String(255), nullable=True)  # Store plain text password for admin viewing
+    role = db.Column(db.String(10), nullable=False, default='buyer')  # 'buyer', 'seller', 'admin'
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # Bumped on role/password changes
+    version_changed_at = db.Column(db.DateTime, index=True)  # When version was last bumped, polled by every worker
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    products = db.relationship('Product', backref='seller', lazy=True, cascade='all, delete-orphan')
+    orders = db.relationship('Order', backref='buyer', lazy=True)
+    cart_items = db.relationship('CartItem', backref='user', lazy=True, cascade='all, delete-orphan')
+    wishlist_items = db.relationship('WishlistItem', backref='user', lazy=True, cascade='all, delete-orphan')
+    reviews = db.relationship('Review', backref='user', lazy=True, cascade='all, delete-orphan')
+    reservations = db.relationship('StockReservation', backref='user', lazy=True, cascade='all, delete-orphan')
+
+class Category(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True, nullable=False)
+    products = db.relationship('Product', backref='category', lazy=True)
+
+class Product(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.Text, nullable=True)
+    price = db.Column(db.Float, nullable=False)
+    image_url = db.Column(db.String(500), nullable=True)
+    additional_images = db.Column(db.Text, nullable=True)  # JSON string of image URLs
+    video_url = db.Column(db.String(500), nullable=True)  # YouTube/Vimeo embed URL
+    stock = db.Column(db.Integer, default=0, nullable=False)
+    reserved = db.Column(db.Integer, default=0, server_default='0', nullable=False)  # Units held by carts
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=True)
+    seller_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    sku = db.Column(db.String(64), nullable=True)  # Seller's own stock code, unique per seller; bulk imports upsert on it
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # Bumped when the listing card changes
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Any change, stock included
+
+    # Relationships
+    order_items = db.relationship('OrderItem', backref='product', lazy=True)
+    cart_items = db.relationship('CartItem', backref='product', lazy=True, cascade='all, delete-orphan')
+    wishlist_items = db.relationship('WishlistItem', backref='product', lazy=True, cascade='all, delete-orphan')
+    reviews = db.relationship('Review', backref='product', lazy=True, cascade='all, delete-orphan')
+    reservations = db.relationship('StockReservation', backref='product', lazy=True, cascade='all, delete-orphan')
+    rating = db.relationship('ProductRating', backref='product', uselist=False, lazy=True, cascade='all, delete-orphan')
+
+    @property
+    def available(self):
+        """Stock that is not held by anyone's cart"""
+        return max(self.stock - (self.reserved or 0), 0)
+
+class CartItem(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    quantity = db.Column(db.Integer, default=1, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Order(db.Model):
+    __tablename__ = 'order'
+    id = db.Column(db.Integer, primary_key=True)
+    buyer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    total_amount = db.Column(db.Float, nullable=False)
+    status = db.Column(db.String(20), default='Pending')  # Pending, Processing, Shipped, Delivered, Cancelled
+    shipping_address = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    items = db.relationship('OrderItem', backref='order', lazy=True, cascade='all, delete-orphan')
+
+class OrderItem(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    price = db.Column(db.Float, nullable=False)  # Price at time of purchase
+
+class WishlistItem(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Review(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    rating = db.Column(db.Integer, nullable=False)  # 1-5 stars
+    comment = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ProductRating(db.Model):
+    """Running review totals for a product, kept current by triggers on review"""
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    stars_1 = db.Column(db.Integer, nullable=False, default=0)
+    stars_2 = db.Column(db.Integer, nullable=False, default=0)
+    stars_3 = db.Column(db.Integer, nullable=False, default=0)
+    stars_4 = db.Column(db.Integer, nullable=False, default=0)
+    stars_5 = db.Column(db.Integer, nullable=False, default=0)
+
+    @property
+    def average(self):
+        return self.rating_sum / self.review_count if self.review_count else 0
+
+    @property
+    def histogram(self):
+        """[(stars, count)] from 5 stars down to 1"""
+        return [(stars, getattr(self, f'stars_{stars}')) for stars in range(5, 0, -1)]
+
+class StockReservation(db.Model):
+    """Units of a product held for one user's cart until expires_at"""
+    __table_args__ = (db.UniqueConstraint('user_id', 'product_id'),)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class SellerSales(db.Model):
+    """One seller's sales on one day (the day each order was placed), cancelled orders excluded"""
+    seller_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+class SellerOrder(db.Model):
+    """One seller's share of an order, written at checkout for the seller's order list"""
+    __table_args__ = (
+        # Covers the seller's order list: range scan by seller, newest first, no table lookups
+        db.Index('ix_seller_order_listing', 'seller_id', 'created_at', 'order_id', 'subtotal', 'item_count'),
+    )
+    seller_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    subtotal = db.Column(db.Float, nullable=False)
+    item_count = db.Column(db.Integer, nullable=False)
+
+    order = db.relationship('Order')
+
+class Activity(db.Model):
+    """Something that happened to a user's account or products, e.g. an order placed or a product sold"""
+    __table_args__ = (db.Index('ix_activity_user_created', 'user_id', 'created_at'),)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=True)
+    action = db.Column(db.String(50), nullable=False)
+    details = db.Column(db.String(200), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Job(db.Model):
+    """One queued background task (see jobs.py); the row is deleted once the task succeeds"""
+    __table_args__ = (
+        # The claim query: the oldest due job of a status
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    task = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON arguments for the task
+    status = db.Column(db.String(10), nullable=False, default='queued')  # 'queued', 'running', 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Not picked up before this
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+
+class SchemaMigration(db.Model):
+    """One applied schema migration (see SCHEMA MIGRATIONS below)"""
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    description = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+# ==================== SEARCH INDEX ====================
+
+# FTS5 index over product name/description. It is an external-content table,
+# so it stores only the index and reads the text back from `product`. The
+# triggers keep it in sync on every insert, update and delete of a product.
+SEARCH_INDEX_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5(
+        name, description,
+        content='product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS product_fts_ai AFTER INSERT ON product BEGIN
+        INSERT INTO product_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS product_fts_ad AFTER DELETE ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS product_fts_au AFTER UPDATE OF name, description ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO product_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END""",
+]
+
+# Lightweight handle for querying the index (not part of db.metadata)
+product_fts = table('product_fts', column('rowid'))
+
+# Column weights for bm25(): a match in the name counts more than in the description
+SEARCH_RANK = db.func.bm25(literal_column('product_fts'), 10.0, 1.0)
+
+def create_search_index(connection):
+    """Create the FTS table and its sync triggers if they are missing"""
+    for statement in SEARCH_INDEX_DDL:
+        connection.exec_driver_sql(statement)
+
+def rebuild_search_index(connection):
+    """Re-read every product row into the FTS index"""
+    create_search_index(connection)
+    connection.exec_driver_sql("INSERT INTO product_fts(product_fts) VALUES ('rebuild')")
+
+@db.event.listens_for(Product.__table__, 'after_create')
+def _create_search_index(target, connection, **kw):
+    create_search_index(connection)
+
+@db.event.listens_for(Product.__table__, 'before_drop')
+def _drop_search_index(target, connection, **kw):
+    connection.exec_driver_sql('DROP TABLE IF EXISTS product_fts')
+
+def build_search_match(search_query):
+    """Turn free-text search input into an FTS5 prefix query.
+
+    Every word becomes a quoted prefix term ("lap"* matches "laptop"), and
+    terms are ANDed together. Returns None if the input has no words.
+    """
+    terms = re.findall(r'\w+', search_query)
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+def apply_search(products_query, match):
+    """Restrict a Product query to rows matching an FTS5 match expression"""
+    return products_query.join(product_fts, product_fts.c.rowid == Product.id).filter(
+        literal_column('product_fts').op('MATCH')(match)
+    )
+
+# ==================== RATING AGGREGATES ====================
+
+# product_rating holds count, sum and a 1-5 star histogram per product.
+# Triggers on review update it in the same transaction as every review
+# insert, rating change and delete, so the detail page never scans reviews.
+_STARS = range(1, 6)
+
+RATING_TRIGGERS_DDL = [
+    """CREATE TRIGGER IF NOT EXISTS review_rating_ai AFTER INSERT ON review BEGIN
+        INSERT INTO product_rating (product_id, review_count, rating_sum, {columns})
+        VALUES (new.product_id, 1, new.rating, {added})
+        ON CONFLICT(product_id) DO UPDATE SET
+            review_count = review_count + 1,
+            rating_sum = rating_sum + excluded.rating_sum,
+            {upserted};
+    END""".format(
+        columns=', '.join(f'stars_{n}' for n in _STARS),
+        added=', '.join(f'new.rating = {n}' for n in _STARS),
+        upserted=', '.join(f'stars_{n} = stars_{n} + excluded.stars_{n}' for n in _STARS)
+    ),
+    """CREATE TRIGGER IF NOT EXISTS review_rating_ad AFTER DELETE ON review BEGIN
+        UPDATE product_rating SET
+            review_count = review_count - 1,
+            rating_sum = rating_sum - old.rating,
+            {removed}
+        WHERE product_id = old.product_id;
+    END""".format(
+        removed=', '.join(f'stars_{n} = stars_{n} - (old.rating = {n})' for n in _STARS)
+    ),
+    """CREATE TRIGGER IF NOT EXISTS review_rating_au AFTER UPDATE OF rating ON review BEGIN
+        UPDATE product_rating SET
+            rating_sum = rating_sum - old.rating + new.rating,
+            {changed}
+        WHERE product_id = new.product_id;
+    END""".format(
+        changed=', '.join(f'stars_{n} = stars_{n} - (old.rating = {n}) + (new.rating = {n})' for n in _STARS)
+    ),
+]
+
+def create_rating_triggers(connection):
+    """Create the triggers that maintain product_rating if they are missing"""
+    for statement in RATING_TRIGGERS_DDL:
+        connection.exec_driver_sql(statement)
+
+def backfill_ratings(connection):
+    """Recompute every product_rating row from the review table"""
+    create_rating_triggers(connection)
+    connection.exec_driver_sql('DELETE FROM product_rating')
+    connection.exec_driver_sql(
+        'INSERT INTO product_rating (product_id, review_count, rating_sum, {columns}) '
+        'SELECT product_id, COUNT(*), SUM(rating), {sums} FROM review GROUP BY product_id'.format(
+            columns=', '.join(f'stars_{n}' for n in _STARS),
+            sums=', '.join(f'SUM(rating = {n})' for n in _STARS)
+        )
+    )
+
+@db.event.listens_for(Review.__table__, 'after_create')
+def _create_rating_triggers(target, connection, **kw):
+    create_rating_triggers(connection)
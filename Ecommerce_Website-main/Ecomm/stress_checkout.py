@@ -0,0 +1,165 @@
+"""Concurrent checkout stress test.
+
+Seeds a throwaway database with one "hot" product and a crowd of buyers who
+each hold it in their cart, then fires every checkout at once from a pool of
+threads or processes. Afterwards it checks that no unit was oversold and
+reports checkout throughput.
+
+    python stress_checkout.py --buyers 5000 --stock 1000 --workers 16
+    python stress_checkout.py --mode process --workers 8
+
+Exits with status 1 if stock went negative or orders don't add up.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+_local = threading.local()
+_app = None
+
+
+def get_app():
+    """The app for this process, built on first use once the environment is set"""
+    global _app
+    if _app is None:
+        from app import create_app
+        _app = create_app()
+    return _app
+
+
+def seed(buyers, stock, quantity):
+    """Create the hot product and one buyer per checkout; returns (product_id, buyer_ids)"""
+    from models import db, User, Product, CartItem
+    from migrations import migrate_database
+
+    app = get_app()
+
+    with app.app_context():
+        db.drop_all()
+        migrate_database()
+        seller = User(username='stress-seller', email='stress-seller@example.com',
+                      password_hash='x', role='seller')
+        db.session.add(seller)
+        db.session.flush()
+        product = Product(name='Hot Item', description='Flash sale', price=9.99,
+                          stock=stock, seller_id=seller.id)
+        db.session.add(product)
+        db.session.flush()
+        db.session.execute(db.insert(User), [
+            {'username': f'stress-buyer-{n}', 'email': f'stress-buyer-{n}@example.com',
+             'password_hash': 'x', 'role': 'buyer'}
+            for n in range(buyers)
+        ])
+        buyer_ids = [row[0] for row in db.session.query(User.id).filter_by(role='buyer').order_by(User.id)]
+        db.session.execute(db.insert(CartItem), [
+            {'user_id': buyer_id, 'product_id': product.id, 'quantity': quantity}
+            for buyer_id in buyer_ids
+        ])
+        db.session.commit()
+        return product.id, buyer_ids
+
+
+def checkout_as(buyer_id):
+    """Run one checkout through the Flask test client and classify the outcome"""
+    app = get_app()
+
+    client = getattr(_local, 'client', None)
+    if client is None:
+        client = _local.client = app.test_client()
+    with client.session_transaction() as sess:
+        sess.clear()
+        sess['user_id'] = buyer_id
+        sess['username'] = f'buyer-{buyer_id}'
+        sess['role'] = 'buyer'
+    response = client.post('/checkout', data={'shipping_address': '1 Load Test Lane'})
+    location = response.headers.get('Location', '')
+    if response.status_code == 302 and '/order/' in location:
+        return 'ordered'
+    if response.status_code == 302 and location.endswith('/cart'):
+        return 'sold_out'
+    return 'error'
+
+
+def checkout_batch(buyer_ids):
+    """Process-pool entry point: run a slice of checkouts sequentially"""
+    from models import db
+
+    app = get_app()
+
+    with app.app_context():
+        # Never reuse connections inherited from the parent process
+        db.engine.dispose()
+    return Counter(checkout_as(buyer_id) for buyer_id in buyer_ids)
+
+
+def verify(product_id, initial_stock):
+    """Compare the remaining stock with what was actually sold"""
+    from models import db, Product, Order, OrderItem
+
+    app = get_app()
+
+    with app.app_context():
+        stock = db.session.get(Product, product_id).stock
+        units_sold = db.session.query(db.func.coalesce(db.func.sum(OrderItem.quantity), 0)).filter(
+            OrderItem.product_id == product_id
+        ).scalar()
+        orders = Order.query.count()
+    return stock, units_sold, orders
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--buyers', type=int, default=2000, help='concurrent checkouts to attempt')
+    parser.add_argument('--stock', type=int, default=500, help='starting stock of the hot product')
+    parser.add_argument('--quantity', type=int, default=1, help='units in each cart')
+    parser.add_argument('--workers', type=int, default=16, help='threads or processes')
+    parser.add_argument('--mode', choices=['thread', 'process'], default='thread')
+    parser.add_argument('--database', help='SQLite file to use (default: a temporary file)')
+    args = parser.parse_args()
+
+    database = args.database or os.path.join(tempfile.mkdtemp(prefix='ecomm-stress-'), 'stress.db')
+    # Set before the app is imported (here and in any worker process)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(database)
+
+    product_id, buyer_ids = seed(args.buyers, args.stock, args.quantity)
+    print(f"Seeded {len(buyer_ids)} buyers, stock={args.stock}, {args.quantity} unit(s) per cart")
+    print(f"Running {args.mode} mode with {args.workers} workers against {database}")
+
+    started = time.perf_counter()
+    if args.mode == 'thread':
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            outcomes = Counter(pool.map(checkout_as, buyer_ids))
+    else:
+        slices = [buyer_ids[n::args.workers] for n in range(args.workers)]
+        outcomes = Counter()
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            for counts in pool.map(checkout_batch, slices):
+                outcomes.update(counts)
+    elapsed = time.perf_counter() - started
+
+    stock, units_sold, orders = verify(product_id, args.stock)
+    print(f"Outcomes: {dict(outcomes)}")
+    print(f"Elapsed: {elapsed:.2f}s  |  {outcomes['ordered'] / elapsed:.1f} orders/s  |  "
+          f"{len(buyer_ids) / elapsed:.1f} checkouts/s")
+    print(f"Final stock: {stock}  |  units sold: {units_sold}  |  orders: {orders}")
+
+    ok = (
+        stock >= 0
+        and stock + units_sold == args.stock
+        and orders == outcomes['ordered']
+        and units_sold == outcomes['ordered'] * args.quantity
+    )
+    if ok:
+        print("OK: no oversell")
+        return 0
+    print("ERROR: stock and orders do not reconcile")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Admin dashboard totals and the paginated admin table endpoints"""
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from models import db, User, Product, Order
+
+
+@pytest.fixture
+def admin(app):
+    with app.app_context():
+        name = f'admin-{uuid.uuid4().hex[:8]}'
+        user = User(username=name, email=f'{name}@example.com', password_hash='x', role='admin')
+        db.session.add(user)
+        db.session.commit()
+        return SimpleNamespace(id=user.id, username=user.username, role=user.role)
+
+
+@pytest.fixture
+def catalog(app, admin):
+    """A seller with a batch of products and a couple of orders"""
+    with app.app_context():
+        name = uuid.uuid4().hex[:8]
+        seller = User(username=f'seller-{name}', email=f'seller-{name}@example.com', password_hash='x', role='seller')
+        db.session.add(seller)
+        db.session.flush()
+        db.session.add_all([
+            Product(name=f'Admin Item {i:02d}', price=1 + i, stock=i, seller_id=seller.id) for i in range(30)
+        ])
+        db.session.add_all([
+            Order(buyer_id=admin.id, total_amount=25, status='Delivered'),
+            Order(buyer_id=admin.id, total_amount=40, status='Pending'),
+        ])
+        db.session.commit()
+
+
+def fetch_all(client, path, **params):
+    """Follow next_cursor until the endpoint runs out of pages"""
+    items, cursor, pages = [], None, 0
+    while True:
+        query = dict(params, cursor=cursor) if cursor else params
+        data = client.get(path, query_string=query).get_json()
+        items.extend(data['items'])
+        pages += 1
+        cursor = data['next_cursor']
+        if not cursor:
+            return items, pages
+
+
+def test_dashboard_stats_match_tables(app, client, login, count_queries, admin, catalog):
+    login(admin)
+    # Warm the session's auth stamp and cart count first
+    client.get('/admin/dashboard')
+    with count_queries() as queries:
+        response = client.get('/admin/dashboard')
+    assert response.status_code == 200
+    # Totals come from one aggregate query; no table is loaded row by row
+    assert queries.count <= 3, queries.statements
+    with app.app_context():
+        revenue = sum(o.total_amount for o in Order.query.filter_by(status='Delivered'))
+        assert f'${revenue:.2f}'.encode() in response.data
+        assert f'<h2>{Product.query.count()}</h2>'.encode() in response.data
+
+
+def test_products_api_pages_through_every_row(app, client, login, admin, catalog):
+    login(admin)
+    items, pages = fetch_all(client, '/admin/api/products', sort='price', dir='desc', limit=7)
+    with app.app_context():
+        assert len(items) == Product.query.count()
+    assert pages > 1
+    prices = [item['price'] for item in items]
+    assert prices == sorted(prices, reverse=True)
+    assert len({item['id'] for item in items}) == len(items)
+
+
+def test_users_api_sorts_by_username(app, client, login, admin, catalog):
+    login(admin)
+    items, _ = fetch_all(client, '/admin/api/users', sort='username', limit=5)
+    usernames = [item['username'] for item in items]
+    assert usernames == sorted(usernames)
+    with app.app_context():
+        assert len(items) == User.query.count()
+
+
+def test_admin_api_requires_admin(app, client, login, catalog):
+    with app.app_context():
+        seller = User.query.filter_by(role='seller').first()
+        seller = SimpleNamespace(id=seller.id, username=seller.username, role=seller.role)
+    login(seller)
+    response = client.get('/admin/api/users')
+    assert response.status_code == 302
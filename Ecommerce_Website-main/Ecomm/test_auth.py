@@ -0,0 +1,62 @@
+"""Session-cached identity and role checks"""
+from datetime import datetime
+
+from models import db, User
+
+
+def user_queries(statements):
+    return [s for s in statements if 'FROM user' in s]
+
+
+def test_protected_routes_skip_user_lookup(app, make_user, client, count_queries):
+    seller = make_user('seller', password='secret')
+    client.post('/login', data={'username': seller.username, 'password': 'secret'})
+    with count_queries() as queries:
+        assert client.get('/seller/dashboard').status_code == 200
+        assert client.get('/orders').status_code == 200
+    assert user_queries(queries.statements) == []
+
+
+def test_role_change_invalidates_cached_role(app, make_user, client, count_queries):
+    seller = make_user('seller', password='secret')
+    client.post('/login', data={'username': seller.username, 'password': 'secret'})
+    assert client.get('/seller/dashboard').status_code == 200
+
+    admin = make_user('admin', password='secret')
+    admin_client = app.test_client()
+    admin_client.post('/login', data={'username': admin.username, 'password': 'secret'})
+    admin_client.post(f'/admin/change_role/{seller.id}', data={'role': 'buyer'})
+
+    with count_queries() as queries:
+        response = client.get('/seller/dashboard')
+    assert response.status_code == 302
+    assert len(user_queries(queries.statements)) == 1
+    with client.session_transaction() as sess:
+        assert sess['role'] == 'buyer'
+
+
+def test_stale_stamp_is_revalidated(app, make_user, client, count_queries, monkeypatch):
+    buyer = make_user('buyer', password='secret')
+    client.post('/login', data={'username': buyer.username, 'password': 'secret'})
+    monkeypatch.setitem(app.config, 'AUTH_REVALIDATE_SECONDS', -1)
+    with count_queries() as queries:
+        assert client.get('/orders').status_code == 200
+    assert len(user_queries(queries.statements)) == 1
+
+
+def test_role_change_in_another_worker_is_picked_up(app, make_user, client, count_queries, monkeypatch):
+    seller = make_user('seller', password='secret')
+    client.post('/login', data={'username': seller.username, 'password': 'secret'})
+    assert client.get('/seller/dashboard').status_code == 200
+
+    # Another process demotes the seller; this one has no bump of its own to go by
+    with app.app_context():
+        db.session.execute(db.update(User).where(User.id == seller.id).values(
+            role='buyer', version=User.version + 1, version_changed_at=datetime.utcnow()))
+        db.session.commit()
+    assert client.get('/seller/dashboard').status_code == 200
+
+    monkeypatch.setitem(app.config, 'AUTH_SYNC_SECONDS', 0)
+    assert client.get('/seller/dashboard').status_code == 302
+    with client.session_transaction() as sess:
+        assert sess['role'] == 'buyer'
@@ -0,0 +1,96 @@
+"""Bulk stock and price updates for sellers"""
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from models import db, Product
+
+
+@pytest.fixture
+def shop(app, make_user):
+    """A seller with three products, and another seller with one"""
+    seller, other = make_user('seller'), make_user('seller')
+    with app.app_context():
+        name = uuid.uuid4().hex[:8]
+        products = [Product(name=f'Bulk {name} {n}', price=10, stock=5, seller_id=seller.id) for n in range(3)]
+        foreign = Product(name=f'Foreign {name}', price=10, stock=5, seller_id=other.id)
+        db.session.add_all([*products, foreign])
+        db.session.commit()
+        return SimpleNamespace(seller=seller, ids=[p.id for p in products], foreign=foreign.id)
+
+
+def state(app, product_id):
+    with app.app_context():
+        product = db.session.get(Product, product_id)
+        return product.stock, product.price, product.version
+
+
+def send(client, updates):
+    return client.post('/seller/api/inventory', json={'updates': updates})
+
+
+def test_batch_is_one_update_statement(app, client, login, count_queries, shop):
+    login(shop.seller)
+    a, b, c = shop.ids
+    with count_queries() as queries:
+        response = send(client, [{'product_id': a, 'stock': 40},
+                                 {'product_id': b, 'stock_delta': -2, 'price': 12.5},
+                                 {'product_id': c, 'price': 10}])
+    result = response.get_json()
+    assert result['success'] is True and result['updated'] == 3
+    assert [(r['product_id'], r['stock'], r['price']) for r in result['results']] == [(a, 40, 10), (b, 3, 12.5), (c, 5, 10)]
+    assert state(app, a) == (40, 10, 1)
+    # Only a price change moves the listing card's version stamp
+    assert state(app, b) == (3, 12.5, 2)
+    assert state(app, c) == (5, 10, 1)
+    assert sum(' UPDATE product ' in statement for statement in queries.statements) == 1
+    assert sum('FROM product' in statement and 'seller_id' in statement for statement in queries.statements) == 1
+
+
+def test_refused_entries_do_not_stop_the_rest(app, client, login, shop):
+    login(shop.seller)
+    a, b, c = shop.ids
+    result = send(client, [
+        {'product_id': shop.foreign, 'stock': 1},
+        {'product_id': a, 'stock_delta': -6},
+        {'product_id': b, 'stock': 1, 'stock_delta': 1},
+        {'product_id': b, 'price': -1},
+        {'product_id': c},
+        'not an object',
+        {'product_id': c, 'stock_delta': 1},
+        {'product_id': c, 'stock_delta': 1},
+    ]).get_json()
+    assert result['success'] is False and result['updated'] == 1
+    outcome = [(r['product_id'], r['success']) for r in result['results']]
+    assert outcome == [(shop.foreign, False), (a, False), (b, False), (b, False), (c, False), (None, False),
+                       (c, True), (c, False)]
+    assert result['results'][0]['message'] == 'no such product in your catalogue'
+    assert 'below zero' in result['results'][1]['message']
+    assert 'more than once' in result['results'][7]['message']
+    assert state(app, shop.foreign)[0] == 5 and state(app, a)[0] == 5 and state(app, c)[0] == 6
+
+
+@pytest.mark.parametrize('body', [None, {'updates': []}, {'updates': {'product_id': 1}}, [{'product_id': 1}]])
+def test_malformed_requests(client, login, shop, body):
+    login(shop.seller)
+    assert client.post('/seller/api/inventory', json=body).status_code == 400
+
+
+def test_batch_size_limit(app, client, login, shop, monkeypatch):
+    monkeypatch.setitem(app.config, 'BULK_UPDATE_MAX_ITEMS', 2)
+    login(shop.seller)
+    response = send(client, [{'product_id': product_id, 'stock': 1} for product_id in shop.ids])
+    assert response.status_code == 400
+    assert state(app, shop.ids[0])[0] == 5
+
+
+def test_changed_products_leave_the_page_cache(app, client, login, shop):
+    anonymous = app.test_client()
+    path = f'/product/{shop.ids[0]}'
+    anonymous.get(path)
+    login(shop.seller)
+    send(client, [{'product_id': shop.ids[0], 'price': 99}])
+    response = anonymous.get(path)
+    assert response.headers['X-Page-Cache'] == 'MISS'
+    assert b'99.00' in response.data
@@ -0,0 +1,114 @@
+"""Product card fragment cache and the cached category list"""
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from app import create_app
+from caching import LRUCache
+from models import db, Category, Product
+
+
+@pytest.fixture
+def shop(app, make_user):
+    """A seller with one uniquely named product, and an admin"""
+    seller, admin = make_user('seller'), make_user('admin')
+    with app.app_context():
+        product = Product(name=f'Cardtest {uuid.uuid4().hex[:8]}', description='cached card', price=9.5, stock=3,
+                          seller_id=seller.id)
+        db.session.add(product)
+        db.session.commit()
+        return SimpleNamespace(seller=seller, admin=admin, product_id=product.id, product_name=product.name)
+
+
+def listing(client, shop):
+    """The product listing as a signed-in user sees it (anonymous pages come from the page cache)"""
+    return client.get('/products', query_string={'search': shop.product_name}).get_data(as_text=True)
+
+
+def test_card_is_rendered_once_per_version(app, client, login, shop):
+    login(shop.seller)
+    cards = app.extensions['product_cards']
+    assert shop.product_name in listing(client, shop)
+    hits = cards.hits
+    assert shop.product_name in listing(client, shop)
+    assert cards.hits > hits
+
+
+def test_edit_route_replaces_card_at_once(client, login, shop):
+    login(shop.seller)
+    listing(client, shop)
+    client.post(f'/seller/edit_product/{shop.product_id}', data={
+        'name': shop.product_name + ' Renamed', 'description': 'cached card', 'price': '12', 'stock': '3'})
+    page = listing(client, shop)
+    assert shop.product_name + ' Renamed' in page
+    assert '$12.00' in page
+
+
+def test_write_from_another_worker_is_seen_through_version(app, client, login, shop):
+    login(shop.seller)
+    listing(client, shop)
+    # Another process edits the row: this process's cache is not told, but the version moves on
+    with app.app_context():
+        db.session.execute(db.update(Product).where(Product.id == shop.product_id).values(
+            price=99, version=Product.version + 1))
+        db.session.commit()
+    assert '$99.00' in listing(client, shop)
+
+
+def test_stock_changes_reuse_the_card(app, client, login, shop):
+    login(shop.seller)
+    cards = app.extensions['product_cards']
+    listing(client, shop)
+    # A sale lowers the stock but the card still says In Stock, so it is not rendered again
+    with app.app_context():
+        db.session.execute(db.update(Product).where(Product.id == shop.product_id).values(stock=1))
+        db.session.commit()
+    misses = cards.misses
+    assert 'In Stock' in listing(client, shop)
+    assert cards.misses == misses
+
+
+def test_category_list_is_cached_until_a_category_write(app, client, login, count_queries, shop):
+    login(shop.admin)
+    client.get('/products')
+    with count_queries() as queries:
+        client.get('/products')
+    assert not any('FROM category' in statement for statement in queries.statements), queries.statements
+
+    name = f'Cat {uuid.uuid4().hex[:6]}'
+    client.post('/admin/add_category', data={'name': name})
+    assert name in client.get('/products').get_data(as_text=True)
+    with app.app_context():
+        category_id = Category.query.filter_by(name=name).one().id
+    client.post(f'/admin/delete_category/{category_id}')
+    assert name not in client.get('/products').get_data(as_text=True)
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert len(cache) == 2
+
+
+def test_init_db_clears_the_caches(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'reseed.db'), 'SECRET_KEY': 'reseed'})
+    client = app.test_client()
+    client.get('/init_db')
+    with app.app_context():
+        # A product the reseed will recreate under the same id and version
+        db.session.execute(db.update(Product).where(Product.id == 1).values(name='Stale laptop'))
+        db.session.commit()
+    assert 'Stale laptop' in client.get('/').get_data(as_text=True)
+    assert len(app.extensions['product_cards']) and len(app.extensions['page_cache'])
+    assert app.extensions['categories'] is not None
+
+    client.get('/init_db')
+    assert len(app.extensions['product_cards']) == len(app.extensions['page_cache']) == 0
+    assert app.extensions['categories'] is None
+    assert 'Stale laptop' not in client.get('/products').get_data(as_text=True)
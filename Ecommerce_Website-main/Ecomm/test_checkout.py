@@ -0,0 +1,54 @@
+"""Checkout stock handling"""
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from models import db, User, Product, CartItem, Order
+from helpers import take_stock
+
+
+@pytest.fixture
+def cart(app):
+    """A buyer whose cart holds two products with limited stock"""
+    with app.app_context():
+        name = uuid.uuid4().hex[:8]
+        seller = User(username=f'seller-{name}', email=f'seller-{name}@example.com', password_hash='x', role='seller')
+        buyer = User(username=f'buyer-{name}', email=f'buyer-{name}@example.com', password_hash='x', role='buyer')
+        db.session.add_all([seller, buyer])
+        db.session.flush()
+        plenty = Product(name='Plenty', price=5, stock=10, seller_id=seller.id)
+        scarce = Product(name='Scarce', price=7, stock=2, seller_id=seller.id)
+        db.session.add_all([plenty, scarce])
+        db.session.flush()
+        db.session.add_all([
+            CartItem(user_id=buyer.id, product_id=plenty.id, quantity=3),
+            CartItem(user_id=buyer.id, product_id=scarce.id, quantity=2),
+        ])
+        db.session.commit()
+        return SimpleNamespace(
+            buyer=SimpleNamespace(id=buyer.id, username=buyer.username, role=buyer.role),
+            plenty_id=plenty.id, scarce_id=scarce.id
+        )
+
+
+def test_checkout_decrements_stock(app, client, login, cart):
+    login(cart.buyer)
+    response = client.post('/checkout', data={'shipping_address': '1 Test Street'})
+    assert '/order/' in response.headers['Location']
+    with app.app_context():
+        assert db.session.get(Product, cart.plenty_id).stock == 7
+        assert db.session.get(Product, cart.scarce_id).stock == 0
+
+
+def test_short_line_rolls_back_whole_order(app, cart):
+    # Another buyer takes a unit after this cart passed the page-load check
+    with app.app_context():
+        db.session.get(Product, cart.scarce_id).stock = 1
+        db.session.commit()
+        items = CartItem.query.filter_by(user_id=cart.buyer.id).all()
+        assert take_stock(cart.buyer.id, items).product_id == cart.scarce_id
+        # The line that did fit was undone as well
+        assert db.session.get(Product, cart.plenty_id).stock == 10
+        assert db.session.get(Product, cart.scarce_id).stock == 1
+        assert Order.query.filter_by(buyer_id=cart.buyer.id).count() == 0
@@ -0,0 +1,105 @@
+"""ETag / Last-Modified validators and 304 answers on catalogue pages"""
+from datetime import datetime, timedelta
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from werkzeug.http import http_date
+
+from caching import invalidate_pages
+from models import db, Category, Product
+
+
+@pytest.fixture
+def shop(app, make_user):
+    """A buyer, and a fresh category with one product in it"""
+    buyer, seller = make_user('buyer'), make_user('seller')
+    with app.app_context():
+        name = uuid.uuid4().hex[:8]
+        category = Category(name=f'Etag {name}')
+        db.session.add(category)
+        db.session.flush()
+        product = Product(name=f'Etag {name}', description='validators', price=5, stock=4,
+                          category_id=category.id, seller_id=seller.id)
+        db.session.add(product)
+        db.session.commit()
+        return SimpleNamespace(buyer=buyer, category_id=category.id, product_id=product.id)
+
+
+def touch(app, product_id, **values):
+    """Change a product the way another worker would, moving updated_at on by a minute"""
+    with app.app_context():
+        db.session.execute(db.update(Product).where(Product.id == product_id).values(
+            updated_at=datetime.utcnow() + timedelta(minutes=1), **values))
+        db.session.commit()
+
+
+def test_unchanged_product_page_is_answered_with_304(client, login, renders, shop):
+    login(shop.buyer)
+    path = f'/product/{shop.product_id}'
+    first = client.get(path)
+    etag = first.headers['ETag']
+    assert etag.startswith('W/"')
+    assert 'private' in first.headers['Cache-Control'] and 'no-cache' in first.headers['Cache-Control']
+
+    renders.clear()
+    second = client.get(path, headers={'If-None-Match': etag})
+    assert second.status_code == 304 and second.data == b''
+    assert second.headers['ETag'] == etag
+    assert renders == []
+
+
+def test_changes_to_the_page_data_change_the_etag(app, client, login, shop):
+    login(shop.buyer)
+    path = f'/product/{shop.product_id}'
+    etag = client.get(path).headers['ETag']
+    touch(app, shop.product_id, stock=2)
+    response = client.get(path, headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+    assert b'2 available' in response.data
+
+
+def test_if_modified_since_without_etag(app, client, shop):
+    path = f'/products?category={shop.category_id}'
+    last_modified = client.get(path).headers['Last-Modified']
+    assert client.get(path, headers={'If-Modified-Since': last_modified}).status_code == 304
+    touch(app, shop.product_id, price=7)
+    with app.test_request_context():
+        # Anonymous pages come from the page cache until their tags are invalidated
+        invalidate_pages(f'category:{shop.category_id}')
+    assert client.get(path, headers={'If-Modified-Since': last_modified}).status_code == 200
+
+
+def test_signed_in_pages_are_not_revalidated_by_date(client, login, shop):
+    path = f'/products?category={shop.category_id}'
+    last_modified = client.get(path).headers['Last-Modified']
+    login(shop.buyer)
+    response = client.get(path, headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 200 and 'Last-Modified' not in response.headers
+
+
+def test_etag_depends_on_who_is_looking(client, login, shop):
+    path = f'/products?category={shop.category_id}'
+    anonymous = client.get(path)
+    assert anonymous.headers['Cache-Control'] == 'no-cache'
+    login(shop.buyer)
+    signed_in = client.get(path, headers={'If-None-Match': anonymous.headers['ETag']})
+    assert signed_in.status_code == 200
+    assert signed_in.headers['ETag'] != anonymous.headers['ETag']
+
+
+def test_page_cache_hits_answer_conditional_requests(client, shop):
+    path = f'/product/{shop.product_id}'
+    etag = client.get(path).headers['ETag']
+    response = client.get(path, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['X-Page-Cache'] == 'HIT'
+
+
+def test_pages_with_flash_messages_carry_no_validators(client, shop):
+    with client.session_transaction() as sess:
+        sess['_flashes'] = [('info', 'Just once')]
+    response = client.get(f'/product/{shop.product_id}',
+                          headers={'If-Modified-Since': http_date(datetime.utcnow() + timedelta(days=1))})
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
@@ -0,0 +1,40 @@
+"""Synthetic dataset generator"""
+from collections import Counter
+
+from app import create_app
+from datagen import generate_dataset
+from migrations import migrate_database
+from models import db, User, Product, Order, OrderItem, Review, ProductRating, SellerSales
+
+
+def test_generated_data_is_consistent_and_skewed(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'gen.db'), 'SECRET_KEY': 'x'})
+    with app.app_context():
+        migrate_database()
+        with db.engine.begin() as conn:
+            counts = generate_dataset(conn, users=200, sellers=10, products=500, orders=400,
+                                      reviews=300, wishlist=100, carts=20, progress=lambda line: None)
+        assert User.query.count() == 200
+        assert Product.query.count() == 500
+        assert Order.query.count() == 400
+        assert OrderItem.query.count() == counts['order_item'] >= 400
+        assert Review.query.count() == 300
+
+        # Derived tables were rebuilt and the triggers are back
+        assert db.session.query(db.func.sum(ProductRating.review_count)).scalar() == 300
+        sold = db.session.query(db.func.sum(OrderItem.quantity)).join(Order).filter(Order.status != 'Cancelled').scalar()
+        assert db.session.query(db.func.sum(SellerSales.units)).scalar() == sold
+        product = Product.query.first()
+        product_name = product.name
+        db.session.add(Review(user_id=product.seller_id, product_id=product.id, rating=5))
+        db.session.commit()
+        assert db.session.query(db.func.sum(ProductRating.review_count)).scalar() == 301
+
+        # Popularity is skewed: the best-selling tenth of products takes far more than a tenth of sales
+        sales = Counter(dict(db.session.query(OrderItem.product_id, db.func.count()).group_by(OrderItem.product_id)))
+        top = sum(count for _, count in sales.most_common(50))
+        assert top > 0.4 * sum(sales.values())
+
+    # The search index covers the bulk-loaded products
+    response = app.test_client().get('/products', query_string={'search': product_name})
+    assert product_name.encode() in response.data
@@ -0,0 +1,112 @@
+"""Streamed CSV / NDJSON exports for admins and sellers"""
+import csv
+import io
+import json
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from models import db, Product, Order, OrderItem, Review
+
+
+@pytest.fixture
+def shop(app, make_user):
+    """Two sellers with a product each, one order buying from both, and reviews"""
+    users = {key: make_user(key.rstrip('12')) for key in ('seller1', 'seller2', 'buyer', 'admin')}
+    with app.app_context():
+        name = uuid.uuid4().hex[:8]
+        mine = Product(name=f'Mine {name}', price=10, stock=5, seller_id=users['seller1'].id)
+        theirs = Product(name=f'Theirs {name}', price=20, stock=5, seller_id=users['seller2'].id)
+        db.session.add_all([mine, theirs])
+        db.session.flush()
+        orders = []
+        for status, created_at in (('Delivered', datetime(2024, 1, 10)), ('Pending', datetime(2024, 3, 5))):
+            order = Order(buyer_id=users['buyer'].id, total_amount=30, status=status, created_at=created_at)
+            order.items = [OrderItem(product_id=mine.id, quantity=1, price=10),
+                           OrderItem(product_id=theirs.id, quantity=1, price=20)]
+            orders.append(order)
+        db.session.add_all(orders)
+        db.session.add_all([Review(user_id=users['buyer'].id, product_id=mine.id, rating=5, comment='Great, "really"'),
+                            Review(user_id=users['buyer'].id, product_id=theirs.id, rating=2)])
+        db.session.commit()
+        return SimpleNamespace(**users, mine=mine.id, theirs=theirs.id, orders=[order.id for order in orders])
+
+
+def csv_rows(response):
+    assert response.status_code == 200 and response.mimetype == 'text/csv'
+    return list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+
+
+def test_admin_exports_products_optionally_per_seller(client, login, shop):
+    login(shop.admin)
+    response = client.get('/admin/export/products')
+    assert response.is_streamed
+    assert 'attachment; filename="products-' in response.headers['Content-Disposition']
+    ids = {int(row['id']) for row in csv_rows(response)}
+    assert {shop.mine, shop.theirs} <= ids
+
+    rows = csv_rows(client.get('/admin/export/products', query_string={'seller': shop.seller2.id}))
+    assert [int(row['id']) for row in rows] == [shop.theirs]
+    assert rows[0]['seller_id'] == str(shop.seller2.id) and rows[0]['sku'] == ''
+
+    response = client.get('/admin/export/products', query_string={'seller': 'abc'})
+    assert response.status_code == 400 and response.json['success'] is False
+
+
+def test_seller_gets_only_own_order_lines(client, login, shop):
+    login(shop.seller1)
+    # A seller cannot widen the export to someone else's rows
+    rows = csv_rows(client.get('/seller/export/orders', query_string={'seller': shop.seller2.id}))
+    assert [(int(row['order_id']), int(row['product_id'])) for row in rows] == [
+        (order_id, shop.mine) for order_id in shop.orders]
+    assert rows[0]['created_at'] == '2024-01-10T00:00:00'
+
+
+def test_order_filters(client, login, shop):
+    login(shop.admin)
+    query = {'seller': shop.seller1.id}
+    assert len(csv_rows(client.get('/admin/export/orders', query_string={**query, 'since': '2024-02-01'}))) == 1
+    assert len(csv_rows(client.get('/admin/export/orders', query_string={**query, 'until': '2024-01-10'}))) == 0
+    rows = csv_rows(client.get('/admin/export/orders', query_string={**query, 'status': 'Pending,Shipped'}))
+    assert [row['status'] for row in rows] == ['Pending']
+
+
+def test_ndjson_reviews(client, login, shop):
+    login(shop.seller1)
+    response = client.get('/seller/export/reviews', query_string={'format': 'ndjson'})
+    assert response.mimetype == 'application/x-ndjson'
+    reviews = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [(review['product_id'], review['rating'], review['comment']) for review in reviews] == [
+        (shop.mine, 5, 'Great, "really"')]
+
+
+@pytest.mark.parametrize('path, status', [
+    ('/admin/export/users', 404),
+    ('/admin/export/orders?format=xml', 400),
+    ('/admin/export/orders?status=Lost', 400),
+    ('/admin/export/orders?since=yesterday', 400),
+    ('/admin/export/products?status=Pending', 400),
+])
+def test_bad_requests(client, login, shop, path, status):
+    login(shop.admin)
+    response = client.get(path)
+    assert response.status_code == status
+    assert response.get_json()['success'] is False
+
+
+def test_buyers_cannot_export(client, login, shop):
+    login(shop.buyer)
+    assert client.get('/admin/export/products').status_code == 302
+    assert client.get('/seller/export/products').status_code == 302
+
+
+def test_export_streams_in_chunks(app, client, login, shop, monkeypatch):
+    monkeypatch.setitem(app.config, 'EXPORT_CHUNK_BYTES', 64)
+    monkeypatch.setitem(app.config, 'EXPORT_BATCH_SIZE', 2)
+    login(shop.admin)
+    response = client.get('/admin/export/products')
+    chunks = list(response.response)
+    assert len(chunks) > 2
+    assert all(len(chunk) < 1024 for chunk in chunks)
@@ -0,0 +1,116 @@
+"""Bulk product import (CSV / NDJSON upsert by seller SKU)"""
+import io
+import json
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from models import db, Category, Product
+
+
+@pytest.fixture
+def shop(app, make_user):
+    """Two sellers and a fresh category"""
+    seller, other = make_user('seller'), make_user('seller')
+    with app.app_context():
+        category = Category(name=f'Import {uuid.uuid4().hex[:8]}')
+        db.session.add(category)
+        db.session.commit()
+        return SimpleNamespace(seller=seller, other=other, category_id=category.id, category=category.name)
+
+
+def products_of(app, seller_id):
+    with app.app_context():
+        return {p.sku: (p.name, p.price, p.stock, p.category_id, p.version)
+                for p in Product.query.filter_by(seller_id=seller_id)}
+
+
+def upload(client, text, filename='catalogue.csv'):
+    return client.post('/seller/import_products', data={'file': (io.BytesIO(text.encode()), filename)},
+                       content_type='multipart/form-data')
+
+
+def test_csv_import_adds_then_updates_by_sku(app, client, login, shop):
+    login(shop.seller)
+    result = upload(client, 'sku,name,price,stock,category\n'
+                            f'A-1,Anvil,19.99,5,{shop.category}\n'
+                            f'B-2,Bucket,4.5,,{shop.category.upper()}\n').get_json()
+    assert (result['inserted'], result['updated'], result['failed']) == (2, 0, 0)
+    assert products_of(app, shop.seller.id) == {
+        'A-1': ('Anvil', 19.99, 5, shop.category_id, 1),
+        'B-2': ('Bucket', 4.5, 0, shop.category_id, 1),
+    }
+
+    result = upload(client, 'sku,name,price,stock\nA-1,Anvil XL,24,7\n').get_json()
+    assert (result['inserted'], result['updated']) == (0, 1)
+    assert products_of(app, shop.seller.id)['A-1'] == ('Anvil XL', 24, 7, None, 2)
+
+
+def test_bad_rows_are_reported_and_skipped(app, client, login, shop):
+    login(shop.seller)
+    result = upload(client, 'sku,name,price,stock,category\n'
+                            'OK-1,Fine,1,1,\n'
+                            ',No sku,1,1,\n'
+                            'P-1,Bad price,cheap,1,\n'
+                            'C-1,Bad category,1,1,Nowhere\n'
+                            'S-1,Negative,1,-3,\n'
+                            'X-1,Too many,1,1,,extra\n'
+                            'OK-2,Also fine,2,2,\n').get_json()
+    assert (result['rows'], result['inserted'], result['failed']) == (7, 2, 5)
+    assert result['success'] is False
+    assert [error['line'] for error in result['errors']] == [3, 4, 5, 6, 7]
+    assert 'sku is required' in result['errors'][0]['error']
+    assert "unknown category 'Nowhere'" in result['errors'][2]['error']
+    assert set(products_of(app, shop.seller.id)) == {'OK-1', 'OK-2'}
+
+
+def test_ndjson_body_in_small_chunks(app, client, login, shop, monkeypatch):
+    monkeypatch.setitem(app.config, 'IMPORT_CHUNK_SIZE', 2)
+    login(shop.seller)
+    lines = [json.dumps({'sku': f'N-{n}', 'name': f'Item {n}', 'price': n + 0.5, 'stock': n}) for n in range(5)]
+    lines.insert(2, '{not json')
+    response = client.post('/seller/import_products', data='\n'.join(lines) + '\n',
+                           content_type='application/x-ndjson')
+    result = response.get_json()
+    assert (result['rows'], result['inserted'], result['failed']) == (6, 5, 1)
+    assert result['errors'][0]['line'] == 3
+    assert len(products_of(app, shop.seller.id)) == 5
+
+
+def test_skus_belong_to_one_seller(app, client, login, shop):
+    login(shop.seller)
+    upload(client, 'sku,name,price\nSAME,Mine,1\n')
+    login(shop.other)
+    result = upload(client, 'sku,name,price\nSAME,Theirs,2\n').get_json()
+    assert result['inserted'] == 1
+    assert products_of(app, shop.seller.id)['SAME'][0] == 'Mine'
+    assert products_of(app, shop.other.id)['SAME'][0] == 'Theirs'
+
+
+def test_unknown_format_is_rejected(client, login, shop):
+    login(shop.seller)
+    response = upload(client, 'whatever', filename='catalogue.xlsx')
+    assert response.status_code == 400
+
+
+def test_update_drops_cached_pages(app, client, login, shop):
+    login(shop.seller)
+    upload(client, 'sku,name,price,stock\nPC-1,Before,3,3\n')
+    with app.app_context():
+        product_id = Product.query.filter_by(seller_id=shop.seller.id, sku='PC-1').one().id
+    anonymous = app.test_client()
+    anonymous.get(f'/product/{product_id}')
+    upload(client, 'sku,name,price,stock\nPC-1,After,3,3\n')
+    response = anonymous.get(f'/product/{product_id}')
+    assert response.headers['X-Page-Cache'] == 'MISS'
+    assert b'After' in response.data
+
+
+def test_cli_import(app, shop, tmp_path):
+    path = tmp_path / 'catalogue.ndjson'
+    path.write_text('{"sku": "CLI-1", "name": "From the shell", "price": 9}\n{"sku": "CLI-2"}\n')
+    result = app.test_cli_runner().invoke(args=['import-products', str(path), '--seller', shop.seller.username])
+    assert result.exit_code == 1
+    assert 'line 2: name is required' in result.output
+    assert set(products_of(app, shop.seller.id)) == {'CLI-1'}
@@ -0,0 +1,177 @@
+"""Background job queue: checkout side effects, retries with backoff, metrics"""
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from models import db, Product, CartItem, Order, Activity, Job, SellerSales
+from jobs import task, enqueue, claim_job, run_jobs, requeue_stale_jobs
+
+calls = []
+
+@task('test_flaky')
+def flaky(key, failures):
+    """Fails the first `failures` times it runs for `key`"""
+    calls.append(key)
+    if calls.count(key) <= failures:
+        raise RuntimeError(f'{key} not yet')
+
+
+@pytest.fixture
+def shop(app, make_user):
+    """A seller with two products in a buyer's cart"""
+    seller, buyer = make_user('seller'), make_user('buyer')
+    with app.app_context():
+        name = uuid.uuid4().hex[:8]
+        products = [Product(name=f'Queued {name} {n}', price=2, stock=10, seller_id=seller.id) for n in range(2)]
+        db.session.add_all(products)
+        db.session.flush()
+        db.session.add_all([CartItem(user_id=buyer.id, product_id=p.id, quantity=3) for p in products])
+        db.session.commit()
+        return SimpleNamespace(seller=seller, buyer=buyer)
+
+
+def checkout(app, client, login, shop):
+    login(shop.buyer)
+    response = client.post('/checkout', data={'shipping_address': '1 Queue Lane'})
+    order_id = int(response.headers['Location'].rsplit('/', 1)[1])
+    with app.app_context():
+        return order_id, db.session.get(Order, order_id).created_at.date()
+
+
+def activities(app, user_id):
+    with app.app_context():
+        return [(a.action, a.details) for a in Activity.query.filter_by(user_id=user_id).order_by(Activity.id)]
+
+
+def job(app, key):
+    with app.app_context():
+        return Job.query.filter(Job.payload.contains(key)).one_or_none()
+
+
+def make_due(app, key):
+    with app.app_context():
+        db.session.execute(db.update(Job).where(Job.payload.contains(key)).values(run_at=datetime.utcnow()))
+        db.session.commit()
+
+
+def test_checkout_only_queues_the_side_effects(app, client, login, shop):
+    order_id, day = checkout(app, client, login, shop)
+    with app.app_context():
+        assert db.session.get(SellerSales, (shop.seller.id, day)) is None
+        queued = [row.task for row in Job.query.filter(Job.payload.contains(f'"order_id": {order_id}'))]
+        assert queued == ['notify_order']
+    assert activities(app, shop.buyer.id) == []
+
+    with app.app_context():
+        assert run_jobs() >= 2
+        sales = db.session.get(SellerSales, (shop.seller.id, day))
+        assert (sales.orders, sales.units, sales.revenue) == (1, 6, 12)
+    assert activities(app, shop.buyer.id) == [('order_placed', f'Order #{order_id} placed: 6 item(s), $12.00')]
+    sold = activities(app, shop.seller.id)
+    assert [action for action, _ in sold] == ['product_sold', 'product_sold']
+    assert sold[0][1].startswith(f'Order #{order_id}: 3 x Queued ')
+
+
+def test_rollup_job_after_a_cancel_leaves_the_order_out(app, client, login, shop):
+    order_id, day = checkout(app, client, login, shop)
+    login(SimpleNamespace(id=shop.seller.id, username=shop.seller.username, role='seller'))
+    client.post('/api/orders/status', json={'order_ids': [order_id], 'status': 'Cancelled'})
+    with app.app_context():
+        run_jobs()
+        assert db.session.get(SellerSales, (shop.seller.id, day)) is None
+
+
+def test_failed_task_is_retried_with_backoff(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'JOB_RETRY_BASE_SECONDS', 60)
+    key = uuid.uuid4().hex
+    with app.app_context():
+        enqueue('test_flaky', key=key, failures=2)
+        db.session.commit()
+        run_jobs()
+    first = job(app, key)
+    assert (first.status, first.attempts) == ('queued', 1)
+    assert "RuntimeError" in first.last_error
+    assert timedelta(seconds=29) < first.run_at - datetime.utcnow() <= timedelta(seconds=60)
+
+    # Not due yet, so nothing runs
+    with app.app_context():
+        run_jobs()
+    assert calls.count(key) == 1
+
+    make_due(app, key)
+    with app.app_context():
+        run_jobs()
+    second = job(app, key)
+    # The second wait is twice as long (less up to half for jitter)
+    assert second.attempts == 2 and second.run_at - datetime.utcnow() > timedelta(seconds=59)
+
+    make_due(app, key)
+    with app.app_context():
+        run_jobs()
+    assert job(app, key) is None
+    assert calls.count(key) == 3
+
+
+def test_task_is_given_up_after_max_attempts(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'JOB_MAX_ATTEMPTS', 2)
+    key = uuid.uuid4().hex
+    with app.app_context():
+        enqueue('test_flaky', key=key, failures=5)
+        db.session.commit()
+        run_jobs()
+        make_due(app, key)
+        run_jobs()
+    failed = job(app, key)
+    assert (failed.status, failed.attempts) == ('failed', 2)
+    with app.app_context():
+        db.session.execute(db.delete(Job).where(Job.id == failed.id))
+        db.session.commit()
+
+
+def test_job_of_a_dead_worker_is_queued_again(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'JOB_TIMEOUT_SECONDS', 60)
+    key = uuid.uuid4().hex
+    with app.app_context():
+        run_jobs()
+        enqueue('test_flaky', key=key, failures=0)
+        db.session.commit()
+        claimed = claim_job()
+        assert key in claimed.payload
+        # Claimed, then its worker vanished
+        assert requeue_stale_jobs() == 0
+        db.session.execute(db.update(Job).where(Job.id == claimed.id).values(
+            started_at=datetime.utcnow() - timedelta(seconds=61)))
+        db.session.commit()
+        assert requeue_stale_jobs() == 1
+        run_jobs()
+    assert job(app, key) is None and calls.count(key) == 1
+
+
+def test_idle_claim_only_reads(app, count_queries):
+    with app.app_context():
+        run_jobs()
+        enqueue('test_flaky', delay=3600, key=uuid.uuid4().hex, failures=0)
+        db.session.commit()
+        with count_queries() as queries:
+            assert claim_job() is None
+        assert [statement.split()[0] for statement in queries.statements] == ['SELECT']
+        db.session.execute(db.delete(Job).where(Job.status == 'queued'))
+        db.session.commit()
+
+
+def test_queue_depth_and_job_latency_are_exported(app, client):
+    key = uuid.uuid4().hex
+    with app.app_context():
+        enqueue('test_flaky', key=key, failures=0)
+        db.session.commit()
+    page = client.get('/metrics').get_data(as_text=True)
+    assert 'ecomm_job_queue_depth{status="queued"}' in page
+    assert 'ecomm_job_queue_depth{status="failed"}' in page
+    with app.app_context():
+        run_jobs()
+    page = client.get('/metrics').get_data(as_text=True)
+    assert 'ecomm_jobs_total{task="test_flaky",outcome="done"}' in page
+    assert 'ecomm_job_duration_seconds_count{task="test_flaky"}' in page
+    assert 'ecomm_job_wait_seconds_bucket{task="test_flaky",le="0.01"}' in page
@@ -1,7 +1,10 @@
 """Quick test script to verify admin login works"""
-from app import app, db, User
+from app import create_app
+from models import db, User
 from werkzeug.security import check_password_hash
 
+app = create_app()
+
 with app.app_context():
     # Check if admin exists
     admin = User.query.filter_by(username='admin').first()
@@ -0,0 +1,102 @@
+"""Per-route request metrics and the /metrics endpoint"""
+import re
+import uuid
+
+from app import create_app
+from migrations import migrate_database
+from models import db, User, Product
+
+
+def sample(text, name, **labels):
+    """Value of one series in a Prometheus text page (None if absent)"""
+    for line in text.splitlines():
+        if line.startswith(name + '{') and all(f'{k}="{v}"' in line for k, v in labels.items()):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+
+def metrics_page(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    return response.get_data(as_text=True)
+
+
+def test_route_latency_sql_and_templates_are_recorded(client):
+    before = metrics_page(client)
+    requests_before = sample(before, 'ecomm_http_requests_total', endpoint='storefront.products', status='200') or 0
+    # A search nothing matches still runs its queries and renders the page
+    assert client.get('/products', query_string={'search': 'metrics-no-match'}).status_code == 200
+    page = metrics_page(client)
+
+    assert sample(page, 'ecomm_http_requests_total',
+                  endpoint='storefront.products', method='GET', status='200') == requests_before + 1
+    assert sample(page, 'ecomm_http_request_duration_seconds_count', endpoint='storefront.products') >= 1
+    assert sample(page, 'ecomm_http_request_duration_seconds_bucket',
+                  endpoint='storefront.products', le='+Inf') >= 1
+    assert sample(page, 'ecomm_sql_queries_total', endpoint='storefront.products') >= 1
+    assert sample(page, 'ecomm_sql_duration_seconds_total', endpoint='storefront.products') > 0
+    assert sample(page, 'ecomm_template_render_seconds_count', template='products.html') >= 1
+
+
+def test_histogram_buckets_are_cumulative(client):
+    client.get('/login')
+    page = metrics_page(client)
+    buckets = [float(value) for value in re.findall(
+        r'ecomm_http_request_duration_seconds_bucket\{endpoint="storefront.login",method="GET",le="[^"]+"\} (\S+)', page)]
+    assert buckets and buckets == sorted(buckets)
+    assert buckets[-1] == sample(page, 'ecomm_http_request_duration_seconds_count', endpoint='storefront.login')
+
+
+def test_unknown_paths_share_one_label(client):
+    client.get(f'/no-such-page-{uuid.uuid4().hex}')
+    page = metrics_page(client)
+    assert sample(page, 'ecomm_http_requests_total', endpoint='unmatched', status='404') >= 1
+    assert 'no-such-page' not in page
+
+
+def test_repeated_statement_is_flagged_as_n_plus_one(tmp_path, caplog):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'metrics.db'),
+        'SECRET_KEY': 'metrics-secret',
+        'METRICS_N_PLUS_ONE_THRESHOLD': 5,
+    })
+
+    @app.route('/n-plus-one')
+    def n_plus_one():
+        # One lookup per product instead of a single IN query
+        ids = [row[0] for row in db.session.execute(db.select(Product.id))]
+        return str(sum(db.session.execute(db.select(Product.stock).filter_by(id=i)).scalar() for i in ids))
+
+    with app.app_context():
+        migrate_database()
+        seller = User(username='n1-seller', email='n1-seller@example.com', password_hash='x', role='seller')
+        db.session.add(seller)
+        db.session.flush()
+        db.session.add_all([Product(name=f'N+1 Item {i}', description='metrics', price=1, stock=1, seller_id=seller.id) for i in range(8)])
+        db.session.commit()
+
+    client = app.test_client()
+    with caplog.at_level('WARNING'):
+        assert client.get('/n-plus-one').data == b'8'
+        assert client.get('/products').status_code == 200
+    assert [r.getMessage() for r in caplog.records if 'Possible N+1' in r.getMessage()] == [
+        next(r.getMessage() for r in caplog.records if 'n_plus_one' in r.getMessage())]
+    page = metrics_page(client)
+    assert sample(page, 'ecomm_n_plus_one_suspected_total', endpoint='n_plus_one') == 1
+    assert sample(page, 'ecomm_n_plus_one_suspected_total', endpoint='storefront.products') is None
+
+
+def test_metrics_are_local_only_without_a_token(client):
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '203.0.113.9'}).status_code == 404
+    assert client.get('/metrics', headers={'X-Forwarded-For': '203.0.113.9'}).status_code == 404
+    assert client.get('/metrics').status_code == 200
+
+
+def test_metrics_token_is_required_when_set(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', 'scrape-secret')
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'},
+                          environ_base={'REMOTE_ADDR': '203.0.113.9'})
+    assert response.status_code == 200 and 'ecomm_http_requests_total' in response.get_data(as_text=True)
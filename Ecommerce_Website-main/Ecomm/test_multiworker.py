@@ -0,0 +1,133 @@
+"""Sessions and the shopping flow across several worker processes.
+
+Sets the database up with `flask init-database`, as gunicorn.conf.py does,
+then starts three separate server processes on it, each loading the app
+the way wsgi.py does, and sends every request of one user's visit to
+a different worker than the one before.
+"""
+import json
+import multiprocessing
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+import pytest
+
+WORKERS = 3
+
+
+def serve(env, ports):
+    """Worker process: load the app with `env` and serve it on a free port"""
+    os.environ.update(env)
+    from werkzeug.serving import make_server
+    from app import create_app
+
+    server = make_server('127.0.0.1', 0, create_app(), threaded=True)
+    ports.put(server.port)
+    server.serve_forever()
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Visitor:
+    """A browser session whose requests go round-robin over the workers"""
+
+    def __init__(self, ports):
+        self.ports = ports
+        self.turn = 0
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()), NoRedirect)
+
+    def request(self, path, data=None):
+        port = self.ports[self.turn % len(self.ports)]
+        self.turn += 1
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        try:
+            with self.opener.open(f'http://127.0.0.1:{port}{path}', body, timeout=30) as response:
+                return response.status, response.headers.get('Location', ''), response.read().decode()
+        except urllib.error.HTTPError as response:
+            return response.code, response.headers.get('Location', ''), response.read().decode()
+
+    def sign_up(self, username, role):
+        self.request('/register', {'username': username, 'email': f'{username}@example.com',
+                                   'password': 'secret123', 'role': role})
+        status, location, _ = self.request('/login', {'username': username, 'password': 'secret123'})
+        assert status == 302 and not location.endswith('/login')
+
+
+@pytest.fixture(scope='module')
+def worker_ports():
+    workdir = tempfile.mkdtemp(prefix='ecomm-workers-')
+    env = {
+        'DATABASE_URL': 'sqlite:///' + os.path.join(workdir, 'shop.db'),
+        # No SECRET_KEY: the workers must agree on the key file between themselves
+        'SECRET_KEY_FILE': os.path.join(workdir, 'secret_key'),
+        # Poll for role changes made by other workers on every request
+        'AUTH_SYNC_SECONDS': '0',
+    }
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'init-database'],
+                   cwd=os.path.dirname(os.path.abspath(__file__)), env=dict(os.environ, **env),
+                   check=True, capture_output=True)
+    context = multiprocessing.get_context('spawn')
+    ports = context.Queue()
+    processes = [context.Process(target=serve, args=(env, ports), daemon=True) for _ in range(WORKERS)]
+    for process in processes:
+        process.start()
+    try:
+        yield [ports.get(timeout=60) for _ in processes]
+    finally:
+        for process in processes:
+            process.terminate()
+            process.join()
+
+
+def test_shopping_flow_survives_changing_workers(worker_ports):
+    seller = Visitor(worker_ports)
+    seller.sign_up('mw-seller', 'seller')
+    status, _, _ = seller.request('/seller/add_product', {'name': 'Multiworker Lamp', 'price': '12.5', 'stock': '3'})
+    assert status == 302
+    _, _, dashboard = seller.request('/seller/dashboard')
+    product_id = re.search(r'/seller/edit_product/(\d+)', dashboard).group(1)
+
+    buyer = Visitor(worker_ports)
+    buyer.sign_up('mw-buyer', 'buyer')
+    status, location, _ = buyer.request(f'/add_to_cart/{product_id}', {'quantity': '2'})
+    assert location.endswith('/cart')
+    status, _, cart = buyer.request('/cart')
+    assert status == 200 and 'Multiworker Lamp' in cart
+
+    status, location, _ = buyer.request('/checkout', {'shipping_address': '3 Worker Way'})
+    assert status == 302 and '/order/' in location
+    status, _, order = buyer.request(urllib.parse.urlparse(location).path)
+    assert status == 200 and 'Multiworker Lamp' in order
+
+    _, _, cart = buyer.request('/cart')
+    assert 'Multiworker Lamp' not in cart
+
+
+def test_demotion_reaches_other_workers_at_once(worker_ports):
+    seller = Visitor(worker_ports)
+    seller.sign_up('mw-demoted', 'seller')
+    for _ in worker_ports:
+        assert seller.request('/seller/dashboard')[0] == 200
+
+    admin = Visitor(worker_ports)
+    status, location, _ = admin.request('/login', {'username': 'admin', 'password': 'admin123'})
+    assert status == 302 and not location.endswith('/login')
+    _, _, users = admin.request('/admin/api/users?limit=200')
+    user_id = next(user['id'] for user in json.loads(users)['items'] if user['username'] == 'mw-demoted')
+    admin.request(f'/admin/change_role/{user_id}', {'role': 'buyer'})
+
+    # Well within AUTH_REVALIDATE_SECONDS, on a worker other than the admin's
+    if seller.turn % len(worker_ports) == (admin.turn - 1) % len(worker_ports):
+        seller.turn += 1
+    status, location, _ = seller.request('/seller/dashboard')
+    assert status == 302 and not location.endswith('/seller/dashboard')
@@ -0,0 +1,121 @@
+"""Bulk order status transitions"""
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from models import db, User, Product, CartItem, Order, SellerSales
+from jobs import run_jobs
+
+
+@pytest.fixture
+def market(app, client, login):
+    """Three orders placed through checkout from seller A, one from seller B, and an admin"""
+    with app.app_context():
+        name = uuid.uuid4().hex[:8]
+        users = {role: User(username=f'{role}-{name}', email=f'{role}-{name}@example.com', password_hash='x',
+                            role=role.split('_')[0])
+                 for role in ('seller_a', 'seller_b', 'buyer', 'admin')}
+        db.session.add_all(users.values())
+        db.session.flush()
+        products = {seller: Product(name=f'From {seller}', price=5, stock=50, seller_id=users[seller].id)
+                    for seller in ('seller_a', 'seller_b')}
+        db.session.add_all(products.values())
+        db.session.commit()
+        market = SimpleNamespace(**{role: SimpleNamespace(id=user.id, username=user.username, role=user.role)
+                                    for role, user in users.items()})
+        product_ids = {seller: product.id for seller, product in products.items()}
+
+    market.orders = []
+    for seller in ('seller_a', 'seller_a', 'seller_a', 'seller_b'):
+        with app.app_context():
+            db.session.add(CartItem(user_id=market.buyer.id, product_id=product_ids[seller], quantity=2))
+            db.session.commit()
+        login(market.buyer)
+        response = client.post('/checkout', data={'shipping_address': '1 Batch Street'})
+        market.orders.append(int(response.headers['Location'].rsplit('/', 1)[1]))
+    with app.app_context():
+        run_jobs()
+    return market
+
+
+def statuses(app, order_ids):
+    with app.app_context():
+        return [db.session.get(Order, order_id).status for order_id in order_ids]
+
+
+def send(client, order_ids, status):
+    return client.post('/api/orders/status', json={'order_ids': order_ids, 'status': status})
+
+
+def test_seller_ships_own_orders_in_one_update(app, client, login, count_queries, market):
+    login(market.seller_a)
+    a1, a2, a3, b1 = market.orders
+    with count_queries() as queries:
+        result = send(client, [a1, a2, b1, 999999999], 'Shipped').get_json()
+    assert result['updated'] == 2 and result['success'] is False
+    assert [(r['order_id'], r['success']) for r in result['results']] == [
+        (a1, True), (a2, True), (b1, False), (999999999, False)]
+    assert result['results'][2]['message'] == 'no such order'
+    assert statuses(app, market.orders) == ['Shipped', 'Shipped', 'Pending', 'Pending']
+    assert sum(statement.startswith('UPDATE "order"') for statement in queries.statements) == 1
+    with app.app_context():
+        order = db.session.get(Order, a1)
+        assert order.updated_at > order.created_at
+
+
+def test_transitions_are_checked(app, client, login, market):
+    login(market.admin)
+    a1, a2, a3, b1 = market.orders
+    send(client, [a1], 'Cancelled')
+    send(client, [a2], 'Shipped')
+    result = send(client, [a1, a2, a3], 'Shipped').get_json()
+    assert [(r['success'], r['message']) for r in result['results']] == [
+        (False, 'cannot go from Cancelled to Shipped'), (True, 'already Shipped'), (True, 'Pending -> Shipped')]
+    assert result['updated'] == 1
+    assert statuses(app, [a1, a2, a3]) == ['Cancelled', 'Shipped', 'Shipped']
+    assert send(client, [a2], 'Pending').get_json()['results'][0]['message'] == 'cannot go from Shipped to Pending'
+
+
+def test_admin_manages_every_order(app, client, login, market):
+    login(market.admin)
+    result = send(client, market.orders, 'Processing').get_json()
+    assert result['success'] is True and result['updated'] == 4
+
+
+def test_bulk_cancel_takes_orders_out_of_sales(app, client, login, market):
+    login(market.seller_a)
+    a1, a2, a3, b1 = market.orders
+    with app.app_context():
+        day = db.session.get(Order, a1).created_at.date()
+        before = db.session.get(SellerSales, (market.seller_a.id, day))
+        before = (before.orders, before.units, before.revenue)
+    send(client, [a1, a2], 'Cancelled')
+    with app.app_context():
+        after = db.session.get(SellerSales, (market.seller_a.id, day))
+        assert (after.orders, after.units, after.revenue) == (before[0] - 2, before[1] - 4, before[2] - 20)
+
+
+@pytest.mark.parametrize('body', [
+    {'order_ids': [1], 'status': 'Lost'},
+    {'order_ids': [], 'status': 'Shipped'},
+    {'order_ids': ['1'], 'status': 'Shipped'},
+    {'order_ids': 1, 'status': 'Shipped'},
+    [1, 2],
+])
+def test_malformed_requests(client, login, market, body):
+    login(market.admin)
+    assert client.post('/api/orders/status', json=body).status_code == 400
+
+
+def test_buyers_cannot_change_status(app, client, login, market):
+    login(market.buyer)
+    assert send(client, market.orders, 'Shipped').status_code == 302
+    assert statuses(app, market.orders) == ['Pending'] * 4
+
+
+def test_batch_size_limit(app, client, login, market, monkeypatch):
+    monkeypatch.setitem(app.config, 'BULK_UPDATE_MAX_ITEMS', 2)
+    login(market.admin)
+    assert send(client, market.orders[:3], 'Shipped').status_code == 400
+    assert statuses(app, market.orders) == ['Pending'] * 4
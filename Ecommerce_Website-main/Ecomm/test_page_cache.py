@@ -0,0 +1,98 @@
+"""Whole-page cache for anonymous storefront visitors"""
+import time
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from models import db, Category, Product
+
+
+@pytest.fixture
+def shop(app, make_user):
+    """A fresh category with one product in it, and its seller"""
+    seller = make_user('seller')
+    with app.app_context():
+        name = uuid.uuid4().hex[:8]
+        category = Category(name=f'Paged {name}')
+        db.session.add(category)
+        db.session.flush()
+        product = Product(name=f'Paged {name}', description='page cache', price=5, stock=4,
+                          category_id=category.id, seller_id=seller.id)
+        db.session.add(product)
+        db.session.commit()
+        return SimpleNamespace(seller=seller, category_id=category.id, product_id=product.id, product_name=product.name)
+
+
+def test_hit_skips_database_and_templates(client, count_queries, renders, shop):
+    path = f'/product/{shop.product_id}'
+    first = client.get(path)
+    assert first.headers['X-Page-Cache'] == 'MISS'
+    renders.clear()
+    with count_queries() as queries:
+        second = client.get(path)
+    assert second.headers['X-Page-Cache'] == 'HIT'
+    assert second.data == first.data
+    assert queries.count == 0 and renders == []
+
+
+def test_query_args_are_normalized(client, shop):
+    client.get('/products', query_string=[('category', shop.category_id), ('sort', 'price_low')])
+    response = client.get('/products', query_string=[('utm_source', 'mail'), ('sort', 'price_low'),
+                                                     ('category', shop.category_id), ('search', '')])
+    assert response.headers['X-Page-Cache'] == 'HIT'
+
+
+def test_signed_in_visitors_are_not_cached(client, login, shop):
+    path = f'/product/{shop.product_id}'
+    client.get(path)
+    login(shop.seller)
+    response = client.get(path)
+    assert 'X-Page-Cache' not in response.headers
+    assert b'Logout' in response.data or shop.seller.username.encode() in response.data
+
+
+def test_write_routes_invalidate_tagged_pages(client, login, shop):
+    detail, listing = f'/product/{shop.product_id}', f'/products?category={shop.category_id}'
+    client.get(detail)
+    client.get(listing)
+    login(shop.seller)
+    client.post(f'/seller/edit_product/{shop.product_id}', data={
+        'name': shop.product_name + ' v2', 'description': 'page cache', 'price': '5', 'stock': '4',
+        'category_id': shop.category_id})
+    client.get('/logout')
+    with client.session_transaction() as sess:
+        sess.clear()
+    for path in (detail, listing):
+        response = client.get(path)
+        assert response.headers['X-Page-Cache'] == 'MISS'
+        assert (shop.product_name + ' v2').encode() in response.data
+
+
+def test_stale_page_is_served_while_it_refreshes(app, client, shop, monkeypatch):
+    cache = app.extensions['page_cache']
+    path = f'/product/{shop.product_id}'
+    monkeypatch.setattr(cache, 'ttl', 0)
+    client.get(path)
+    # Changed behind the cache's back, e.g. by another worker
+    with app.app_context():
+        db.session.execute(db.update(Product).where(Product.id == shop.product_id).values(name='Refreshed Name'))
+        db.session.commit()
+    stale = client.get(path)
+    assert stale.headers['X-Page-Cache'] == 'STALE'
+    assert shop.product_name.encode() in stale.data
+    deadline = time.monotonic() + 10
+    while cache.refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+    monkeypatch.setattr(cache, 'ttl', 60)
+    assert b'Refreshed Name' in cache.get(path).body
+
+
+def test_pending_flash_messages_bypass_cache(client, shop):
+    path = f'/product/{shop.product_id}'
+    client.get(path)
+    with client.session_transaction() as sess:
+        sess['_flashes'] = [('info', 'Only for you')]
+    response = client.get(path)
+    assert 'X-Page-Cache' not in response.headers
+    assert b'Only for you' in response.data
@@ -0,0 +1,175 @@
+"""Keyset pagination of product listings"""
+import base64
+import json
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from models import db, User, Product, Review
+from helpers import paginate_products, paginate_keyset, encode_cursor, IN_STOCK, PRODUCTS_PAGE_SIZE
+
+PAGE_SIZE = 3
+
+SORTS = {
+    # Expected full order for each mode, as a key on (price, created_at, id)
+    'newest': lambda p: (-p[1].timestamp(), -p[2]),
+    'price_low': lambda p: (p[0], p[2]),
+    'price_high': lambda p: (-p[0], -p[2]),
+}
+
+
+@pytest.fixture
+def seller_id(app):
+    """A seller with 8 products; several share a price, several share a created_at"""
+    with app.app_context():
+        name = uuid.uuid4().hex[:8]
+        seller = User(username=f'seller-{name}', email=f'seller-{name}@example.com', password_hash='x', role='seller')
+        db.session.add(seller)
+        db.session.flush()
+        moment = datetime(2024, 5, 1, 12, 0)
+        rows = [(5, 0), (5, 0), (5, 1), (2, 1), (9, 2), (5, 2), (2, 2), (9, 3)]
+        db.session.add_all([
+            Product(name=f'Page {n}', price=price, stock=1, seller_id=seller.id,
+                    created_at=moment + timedelta(minutes=minutes))
+            for n, (price, minutes) in enumerate(rows)
+        ])
+        db.session.commit()
+        return seller.id
+
+
+def page(seller_id, sort_by, cursor=None):
+    return paginate_products(Product.query.filter(Product.seller_id == seller_id), sort_by, cursor, PAGE_SIZE)
+
+
+def expected_order(seller_id, sort_by):
+    products = Product.query.filter(Product.seller_id == seller_id).all()
+    return [p.id for p in sorted(products, key=lambda p: SORTS[sort_by]((p.price, p.created_at, p.id)))]
+
+
+@pytest.mark.parametrize('sort_by', sorted(SORTS))
+def test_next_pages_cover_every_row_once_in_order(app, seller_id, sort_by):
+    with app.app_context():
+        pages, cursor = [], None
+        while True:
+            products, cursor, _ = page(seller_id, sort_by, cursor)
+            pages.append([p.id for p in products])
+            if cursor is None:
+                break
+        assert [len(ids) for ids in pages] == [3, 3, 2]
+        assert sum(pages, []) == expected_order(seller_id, sort_by)
+
+
+@pytest.mark.parametrize('sort_by', sorted(SORTS))
+def test_prev_cursor_returns_the_page_before(app, seller_id, sort_by):
+    with app.app_context():
+        first, next_cursor, prev_cursor = page(seller_id, sort_by)
+        assert prev_cursor is None
+        second, next_cursor, prev_cursor = page(seller_id, sort_by, next_cursor)
+        third, end, third_prev = page(seller_id, sort_by, next_cursor)
+        assert end is None
+
+        back, back_next, back_prev = page(seller_id, sort_by, third_prev)
+        assert [p.id for p in back] == [p.id for p in second]
+        assert back_next == next_cursor
+        back, back_next, back_prev = page(seller_id, sort_by, back_prev)
+        assert [p.id for p in back] == [p.id for p in first]
+        assert back_prev is None
+        # And forward again from there
+        assert [p.id for p in page(seller_id, sort_by, back_next)[0]] == [p.id for p in second]
+
+
+def b64(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip('=')
+
+
+@pytest.mark.parametrize('cursor', [
+    'not a cursor!',
+    '%%%',
+    b64(['price_low', 'next', 5, 1]),              # made for another sort mode
+    b64(['newest', 'sideways', '2024-05-01T12:00:00', 1]),
+    b64(['newest', 'next', '2024-05-01T12:00:00', '1']),
+    b64(['newest', 'next', 'yesterday', 1]),
+    b64(['newest', 'next']),
+    b64({'sort': 'newest'}),
+])
+def test_malformed_cursor_starts_from_the_first_page(app, seller_id, cursor):
+    with app.app_context():
+        products, _, prev_cursor = page(seller_id, 'newest', cursor)
+        assert [p.id for p in products] == expected_order(seller_id, 'newest')[:PAGE_SIZE]
+        assert prev_cursor is None
+
+
+def test_tampered_sort_key_type_is_ignored(app, seller_id):
+    with app.app_context():
+        for key in ('cheap', True, None, [1]):
+            products, _, _ = page(seller_id, 'price_high', b64(['price_high', 'next', key, 1]))
+            assert [p.id for p in products] == expected_order(seller_id, 'price_high')[:PAGE_SIZE]
+
+
+@pytest.mark.parametrize('sort_by', sorted(SORTS))
+def test_a_page_loads_at_most_page_size_plus_one_products(app, client, login, seller_id, sort_by):
+    loaded = []
+    listener = lambda target, context: loaded.append(target.id)
+    event.listen(Product, 'load', listener)
+    try:
+        with app.app_context():
+            _, cursor, _ = page(seller_id, sort_by)
+            for cursor in (None, cursor):
+                loaded.clear()
+                db.session.expunge_all()
+                page(seller_id, sort_by, cursor)
+                assert len(loaded) <= PAGE_SIZE + 1
+            seller = db.session.get(User, seller_id)
+            login(seller)
+        # The whole listing route too (signed in, so the page cache stays out of it)
+        loaded.clear()
+        client.get('/products', query_string={'sort': sort_by})
+        assert 0 < len(loaded) <= PRODUCTS_PAGE_SIZE + 1
+    finally:
+        event.remove(Product, 'load', listener)
+
+
+def test_forward_keyset_pagination_with_tied_keys(app):
+    with app.app_context():
+        product_id = Product.query.first().id
+        name = uuid.uuid4().hex[:8]
+        user = User(username=f'reviewer-{name}', email=f'reviewer-{name}@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        moment = datetime(2024, 5, 2)
+        reviews = [Review(user_id=user.id, product_id=product_id, rating=3, created_at=moment) for _ in range(5)]
+        db.session.add_all(reviews)
+        db.session.commit()
+        query = Review.query.filter(Review.user_id == user.id)
+
+        ids, cursor = [], None
+        while True:
+            rows, cursor = paginate_keyset(query, 'newest', Review.created_at, Review.id, False, cursor, 2)
+            ids.extend(row[0].id for row in rows)
+            if cursor is None:
+                break
+        assert ids == sorted((review.id for review in reviews), reverse=True)
+
+        bad = encode_cursor('oldest', 'next', moment, ids[1])
+        rows, _ = paginate_keyset(query, 'newest', Review.created_at, Review.id, False, bad, 2)
+        assert [row[0].id for row in rows] == ids[:2]
+
+
+@pytest.mark.parametrize('sort_by', sorted(SORTS))
+@pytest.mark.parametrize('in_category', [False, True])
+def test_listing_pages_walk_an_index_in_sort_order(app, count_queries, seller_id, sort_by, in_category):
+    with app.app_context():
+        listing = Product.query.filter(IN_STOCK)
+        if in_category:
+            listing = listing.filter(Product.category_id == 1)
+        _, cursor, _ = page(seller_id, sort_by)
+        for cursor in (None, cursor):
+            with count_queries() as queries:
+                paginate_products(listing, sort_by, cursor, PAGE_SIZE)
+            for statement, parameters in zip(queries.statements, queries.parameters):
+                plan = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+                details = [row[-1] for row in plan]
+                assert not any('TEMP B-TREE' in detail for detail in details), details
+                assert any('ix_product_listed_' in detail for detail in details), details
@@ -0,0 +1,115 @@
+"""Query-count budgets for the cart, checkout, orders, wishlist and seller dashboard views.
+
+Each route must fetch what it renders in a fixed number of statements,
+no matter how many rows the cart, wishlist or order history holds.
+"""
+import re
+from types import SimpleNamespace
+
+import pytest
+
+from models import db, Product, CartItem, WishlistItem, Order, OrderItem
+from helpers import rebuild_seller_orders
+
+LINE_ITEMS = 40
+
+
+@pytest.fixture
+def shop(app, make_user):
+    """A buyer with a full cart, a full wishlist and a history of orders"""
+    seller, buyer = make_user('seller'), make_user('buyer')
+    with app.app_context():
+        products = [
+            Product(name=f'Item {i}', description='test item', price=10 + i, stock=100, seller_id=seller.id)
+            for i in range(LINE_ITEMS)
+        ]
+        db.session.add_all(products)
+        db.session.flush()
+        for product in products:
+            db.session.add(CartItem(user_id=buyer.id, product_id=product.id, quantity=1))
+            db.session.add(WishlistItem(user_id=buyer.id, product_id=product.id))
+        orders = []
+        for n in range(10):
+            order = Order(buyer_id=buyer.id, total_amount=0, status='Pending')
+            order.items = [OrderItem(product_id=p.id, quantity=1, price=p.price) for p in products[n::10]]
+            orders.append(order)
+        db.session.add_all(orders)
+        db.session.commit()
+        with db.engine.begin() as conn:
+            rebuild_seller_orders(conn)
+        return SimpleNamespace(buyer=buyer, seller=seller, order_id=orders[0].id)
+
+
+@pytest.mark.parametrize('path, budget', [
+    ('/cart', 3),
+    ('/checkout', 3),
+    ('/wishlist', 3),
+    ('/orders', 4),
+])
+def test_buyer_views_have_fixed_query_count(client, login, count_queries, shop, path, budget):
+    login(shop.buyer)
+    with count_queries() as queries:
+        response = client.get(path)
+    assert response.status_code == 200
+    assert queries.count <= budget, queries.statements
+
+
+def test_order_detail_query_count(client, login, count_queries, shop):
+    login(shop.buyer)
+    with count_queries() as queries:
+        response = client.get(f'/order/{shop.order_id}')
+    assert response.status_code == 200
+    assert queries.count <= 4, queries.statements
+
+
+def test_seller_orders_query_count(client, login, count_queries, shop):
+    login(shop.seller)
+    with count_queries() as queries:
+        response = client.get('/orders')
+    assert response.status_code == 200
+    assert queries.count <= 4, queries.statements
+
+
+def test_checkout_post_query_count(app, client, login, count_queries, shop):
+    login(shop.buyer)
+    with count_queries() as queries:
+        response = client.post('/checkout', data={'shipping_address': '1 Test Street'})
+    assert response.status_code == 302
+    assert '/order/' in response.headers['Location']
+    assert queries.count <= 8, queries.statements
+    with app.app_context():
+        assert CartItem.query.filter_by(user_id=shop.buyer.id).count() == 0
+        assert {p.stock for p in Product.query.filter_by(seller_id=shop.seller.id)} == {99}
+
+
+def test_cart_count_is_cached_in_session(app, client, login, count_queries, shop):
+    login(shop.buyer)
+    client.get('/')
+    with client.session_transaction() as sess:
+        assert sess['cart_count'] == LINE_ITEMS
+    with count_queries() as queries:
+        client.get('/')
+    assert not any('count(' in statement.lower() and 'cart_item' in statement for statement in queries.statements)
+
+    with app.app_context():
+        product_id = Product.query.filter_by(seller_id=shop.seller.id).first().id
+        cart_item_id = CartItem.query.filter_by(user_id=shop.buyer.id, product_id=product_id).one().id
+    client.post(f'/remove_from_cart/{cart_item_id}')
+    with client.session_transaction() as sess:
+        assert sess['cart_count'] == LINE_ITEMS - 1
+
+
+def test_seller_dashboard_pages_products_in_fixed_query_count(client, login, count_queries, shop):
+    login(shop.seller)
+    # The first visit also fills the session's cached user check and cart count
+    client.get('/seller/dashboard')
+    seen, url, budgets = [], '/seller/dashboard', []
+    while url:
+        with count_queries() as queries:
+            page = client.get(url).get_data(as_text=True)
+        budgets.append(queries.count)
+        seen += re.findall(r'id="product-row-(\d+)"', page)
+        older = re.search(r'href="([^"#]+)">Older', page)
+        url = older and older.group(1).replace('&amp;', '&')
+    assert len(seen) == len(set(seen)) == LINE_ITEMS
+    assert len(budgets) == 2 and max(budgets) <= 4, budgets
@@ -0,0 +1,130 @@
+"""EXPLAIN QUERY PLAN for every query the hot routes send.
+
+Fails if any of them reads a whole table instead of searching an index, or
+if a paginated listing sorts its rows instead of reading them in index order.
+"""
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from models import db, Category, Product, CartItem, WishlistItem, Review, Order, OrderItem, SellerOrder
+
+# Tables every page lists in full on purpose
+LISTED_IN_FULL = {'category'}
+
+
+def full_scans(app, statement, parameters):
+    """Plan lines of one statement that scan a table without an index"""
+    with app.app_context():
+        plan = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    scans = []
+    for row in plan:
+        detail = row[-1]
+        if not detail.startswith('SCAN ') or detail == 'SCAN CONSTANT ROW':
+            continue
+        if 'INDEX' in detail or 'VIRTUAL TABLE' in detail:
+            continue
+        if detail.split()[1] in LISTED_IN_FULL:
+            continue
+        scans.append(detail)
+    return scans
+
+
+def sorts(app, statement, parameters):
+    """Plan lines of one statement that sort rows instead of reading an index in order"""
+    with app.app_context():
+        plan = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    return [row[-1] for row in plan if row[-1].startswith('USE TEMP B-TREE FOR ORDER BY')]
+
+
+@pytest.fixture(scope='module')
+def shop(app, make_user):
+    """Enough catalogue, carts, orders and reviews for every hot route to have rows"""
+    seller, buyer, admin = make_user('seller'), make_user('buyer'), make_user('admin')
+    with app.app_context():
+        category = Category(name=f'Plans {uuid.uuid4().hex[:8]}')
+        db.session.add(category)
+        db.session.flush()
+        products = [
+            Product(name=f'Plan Widget {i}', description='indexed widget', price=5 + i, stock=1 + i % 7,
+                    category_id=category.id, seller_id=seller.id)
+            for i in range(30)
+        ]
+        db.session.add_all(products)
+        db.session.flush()
+        for product in products[:5]:
+            db.session.add(CartItem(user_id=buyer.id, product_id=product.id, quantity=1))
+            db.session.add(WishlistItem(user_id=buyer.id, product_id=product.id))
+            db.session.add(Review(user_id=buyer.id, product_id=product.id, rating=4, comment='fine'))
+        order = Order(buyer_id=buyer.id, total_amount=10, status='Pending')
+        order.items = [OrderItem(product_id=products[0].id, quantity=1, price=5)]
+        db.session.add(order)
+        db.session.flush()
+        db.session.add(SellerOrder(seller_id=seller.id, order_id=order.id, created_at=order.created_at,
+                                   subtotal=5, item_count=1))
+        db.session.commit()
+        return SimpleNamespace(
+            seller=seller, buyer=buyer, admin=admin, category_id=category.id, product_id=products[0].id, order_id=order.id
+        )
+
+
+HOT_ROUTES = [
+    ('buyer', '/'),
+    ('buyer', '/?search=widget'),
+    ('buyer', '/products'),
+    ('buyer', '/products?category={category_id}'),
+    ('buyer', '/products?category={category_id}&sort=price_low'),
+    ('buyer', '/products?sort=price_high'),
+    ('buyer', '/products?search=widget&sort=relevance'),
+    ('buyer', '/product/{product_id}'),
+    ('buyer', '/cart'),
+    ('buyer', '/wishlist'),
+    ('buyer', '/checkout'),
+    ('buyer', '/orders'),
+    ('buyer', '/order/{order_id}'),
+    ('seller', '/orders'),
+    ('seller', '/seller/dashboard'),
+]
+
+# Paginated listings: each page must come off an index in sort order, or
+# every page (the first included) costs a sort of all matching rows
+ORDERED_ROUTES = [
+    ('buyer', '/'),
+    ('buyer', '/?category={category_id}'),
+    ('buyer', '/products'),
+    ('buyer', '/products?category={category_id}'),
+    ('buyer', '/products?sort=price_low'),
+    ('buyer', '/products?sort=price_high'),
+    ('buyer', '/products?category={category_id}&sort=price_low'),
+    ('buyer', '/products?category={category_id}&sort=price_high'),
+    ('buyer', '/orders'),
+    ('seller', '/orders'),
+    ('seller', '/seller/dashboard'),
+    *(('admin', f'/admin/api/users?sort={sort}&dir={direction}')
+      for sort in ('id', 'username', 'email', 'role', 'created_at') for direction in ('asc', 'desc')),
+    *(('admin', f'/admin/api/products?sort={sort}&dir={direction}')
+      for sort in ('id', 'name', 'price', 'stock', 'created_at') for direction in ('asc', 'desc')),
+]
+
+
+@pytest.mark.parametrize('role, path', HOT_ROUTES)
+def test_hot_route_queries_use_indexes(app, client, login, count_queries, shop, role, path):
+    login(getattr(shop, role))
+    with count_queries() as queries:
+        response = client.get(path.format(**vars(shop)))
+    assert response.status_code == 200
+    for statement, parameters in zip(queries.statements, queries.parameters):
+        if statement.lstrip().upper().startswith('SELECT'):
+            assert not full_scans(app, statement, parameters), statement
+
+
+@pytest.mark.parametrize('role, path', ORDERED_ROUTES)
+def test_listing_pages_read_an_index_in_order(app, client, login, count_queries, shop, role, path):
+    login(getattr(shop, role))
+    with count_queries() as queries:
+        response = client.get(path.format(**vars(shop)))
+    assert response.status_code == 200
+    for statement, parameters in zip(queries.statements, queries.parameters):
+        if statement.lstrip().upper().startswith('SELECT'):
+            assert not sorts(app, statement, parameters), statement
@@ -0,0 +1,70 @@
+"""Rating aggregates maintained alongside reviews"""
+import re
+
+import pytest
+
+from models import db, Product, ProductRating, Review, backfill_ratings
+
+
+@pytest.fixture
+def product_id(app, make_user):
+    seller = make_user('seller')
+    with app.app_context():
+        product = Product(name='Rated', price=10, stock=5, seller_id=seller.id)
+        db.session.add(product)
+        db.session.commit()
+        return product.id
+
+
+def totals(app, product_id):
+    with app.app_context():
+        rating = db.session.get(ProductRating, product_id)
+        return rating.review_count, rating.rating_sum, [count for _, count in reversed(rating.histogram)]
+
+
+def test_reviews_keep_totals_current(app, client, login, make_user, product_id):
+    buyers = [make_user() for _ in range(3)]
+    for buyer, stars in zip(buyers, [5, 4, 4]):
+        login(buyer)
+        client.post(f'/product/{product_id}/review', data={'rating': stars, 'comment': 'ok'})
+    assert totals(app, product_id) == (3, 13, [0, 0, 0, 2, 1])
+
+    # Reviewing again replaces the earlier rating
+    client.post(f'/product/{product_id}/review', data={'rating': 1})
+    assert totals(app, product_id) == (3, 10, [1, 0, 0, 1, 1])
+
+    with app.app_context():
+        review_id = Review.query.filter_by(user_id=buyers[0].id, product_id=product_id).one().id
+    login(buyers[0])
+    client.post(f'/review/{review_id}/delete')
+    assert totals(app, product_id) == (2, 5, [1, 0, 0, 1, 0])
+
+    page = client.get(f'/product/{product_id}').text
+    assert '(2 reviews)' in page
+
+
+def test_backfill_matches_triggers(app, make_user, product_id):
+    with app.app_context():
+        for stars in [1, 2, 2, 5]:
+            db.session.add(Review(user_id=make_user().id, product_id=product_id, rating=stars))
+        db.session.commit()
+    before = totals(app, product_id)
+    with app.app_context():
+        with db.engine.begin() as conn:
+            backfill_ratings(conn)
+    assert totals(app, product_id) == before == (4, 10, [1, 2, 0, 0, 1])
+
+
+def test_review_list_is_paginated(app, client, make_user, product_id):
+    with app.app_context():
+        for n in range(25):
+            db.session.add(Review(user_id=make_user().id, product_id=product_id, rating=3, comment=f'review-{n}'))
+        db.session.commit()
+    seen = []
+    url = f'/product/{product_id}'
+    while url:
+        page = client.get(url).text
+        seen += re.findall(r'review-\d+', page)
+        older = re.search(r'href="([^"]+)"[^>]*>Older reviews', page)
+        url = older.group(1).replace('&amp;', '&') if older else None
+    assert len(seen) == 25 and len(set(seen)) == 25
@@ -0,0 +1,139 @@
+"""Stock reservations held by carts"""
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from models import db, User, Product, CartItem, StockReservation
+from helpers import expire_reservations, reserve_stock
+
+
+def make_buyer():
+    name = f'buyer-{uuid.uuid4().hex[:8]}'
+    buyer = User(username=name, email=f'{name}@example.com', password_hash='x', role='buyer')
+    db.session.add(buyer)
+    db.session.flush()
+    return SimpleNamespace(id=buyer.id, username=buyer.username, role=buyer.role)
+
+
+@pytest.fixture
+def product_id(app):
+    """A product with 5 units in stock"""
+    with app.app_context():
+        name = uuid.uuid4().hex[:8]
+        seller = User(username=f'seller-{name}', email=f'seller-{name}@example.com', password_hash='x', role='seller')
+        db.session.add(seller)
+        db.session.flush()
+        product = Product(name='Limited', price=10, stock=5, seller_id=seller.id)
+        db.session.add(product)
+        db.session.commit()
+        return product.id
+
+
+def stock_and_reserved(app, product_id):
+    with app.app_context():
+        product = db.session.get(Product, product_id)
+        return product.stock, product.reserved
+
+
+def test_cart_holds_stock_from_other_buyers(app, client, login, product_id):
+    with app.app_context():
+        first, second = make_buyer(), make_buyer()
+        db.session.commit()
+
+    login(first)
+    client.post(f'/add_to_cart/{product_id}', data={'quantity': 4})
+    assert stock_and_reserved(app, product_id) == (5, 4)
+
+    login(second)
+    client.post(f'/add_to_cart/{product_id}', data={'quantity': 2})
+    with app.app_context():
+        assert CartItem.query.filter_by(user_id=second.id).count() == 0
+    client.post(f'/add_to_cart/{product_id}', data={'quantity': 1})
+    assert stock_and_reserved(app, product_id) == (5, 5)
+
+
+def test_update_and_remove_release_holds(app, client, login, product_id):
+    with app.app_context():
+        buyer = make_buyer()
+        db.session.commit()
+    login(buyer)
+    client.post(f'/add_to_cart/{product_id}', data={'quantity': 3})
+    with app.app_context():
+        cart_item_id = CartItem.query.filter_by(user_id=buyer.id).one().id
+
+    client.post(f'/update_cart/{cart_item_id}', data={'quantity': 1})
+    assert stock_and_reserved(app, product_id) == (5, 1)
+    client.post(f'/update_cart/{cart_item_id}', data={'quantity': 5})
+    assert stock_and_reserved(app, product_id) == (5, 5)
+    client.post(f'/remove_from_cart/{cart_item_id}')
+    assert stock_and_reserved(app, product_id) == (5, 0)
+
+
+def test_checkout_converts_hold_into_sale(app, client, login, product_id):
+    with app.app_context():
+        buyer = make_buyer()
+        db.session.commit()
+    login(buyer)
+    client.post(f'/add_to_cart/{product_id}', data={'quantity': 2})
+    response = client.post('/checkout', data={'shipping_address': '1 Test Street'})
+    assert '/order/' in response.headers['Location']
+    assert stock_and_reserved(app, product_id) == (3, 0)
+    with app.app_context():
+        assert StockReservation.query.filter_by(user_id=buyer.id).count() == 0
+
+
+def test_expired_holds_are_swept(app, client, login, product_id):
+    with app.app_context():
+        buyer = make_buyer()
+        db.session.commit()
+    login(buyer)
+    client.post(f'/add_to_cart/{product_id}', data={'quantity': 5})
+    with app.app_context():
+        assert expire_reservations(now=datetime.utcnow()) == 0
+        assert expire_reservations(now=datetime.utcnow() + timedelta(days=1)) >= 1
+    assert stock_and_reserved(app, product_id) == (5, 0)
+
+    # The cart line survives and can still be bought while stock lasts
+    response = client.post('/checkout', data={'shipping_address': '1 Test Street'})
+    assert '/order/' in response.headers['Location']
+    assert stock_and_reserved(app, product_id) == (0, 0)
+
+
+@pytest.mark.parametrize('quantity', [-5, 0, 'two', None])
+def test_bad_quantities_hold_nothing(app, client, login, product_id, quantity):
+    with app.app_context():
+        buyer, other = make_buyer(), make_buyer()
+        db.session.commit()
+    login(buyer)
+    data = {} if quantity is None else {'quantity': quantity}
+    response = client.post(f'/add_to_cart/{product_id}', data=data)
+    assert response.status_code == 302
+    assert stock_and_reserved(app, product_id) == (5, 0)
+    with app.app_context():
+        assert CartItem.query.filter_by(user_id=buyer.id).count() == 0
+        assert StockReservation.query.filter_by(user_id=buyer.id).count() == 0
+
+    # The units are all still there for everyone else, and no more than that
+    login(other)
+    client.post(f'/add_to_cart/{product_id}', data={'quantity': 6})
+    client.post(f'/add_to_cart/{product_id}', data={'quantity': 5})
+    assert stock_and_reserved(app, product_id) == (5, 5)
+
+    with app.app_context():
+        cart_item_id = CartItem.query.filter_by(user_id=other.id).one().id
+    client.post(f'/update_cart/{cart_item_id}', data=data)
+    assert stock_and_reserved(app, product_id) == (5, 5)
+    with app.app_context():
+        assert db.session.get(CartItem, cart_item_id).quantity == 5
+
+
+def test_reserve_stock_refuses_non_positive_quantities(app, product_id):
+    with app.app_context():
+        buyer = make_buyer()
+        for quantity in (0, -5):
+            with pytest.raises(ValueError):
+                reserve_stock(buyer.id, product_id, quantity)
+        db.session.rollback()
+    assert stock_and_reserved(app, product_id) == (5, 0)
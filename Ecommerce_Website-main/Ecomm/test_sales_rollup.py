@@ -0,0 +1,111 @@
+"""Seller sales rollup kept by the post-checkout job and order status changes"""
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from models import db, User, Product, CartItem, Order, SellerSales
+from helpers import rebuild_sales_rollup
+from jobs import run_jobs
+
+
+def rollup(app, seller_id):
+    """{day: (orders, units, revenue)} for one seller"""
+    with app.app_context():
+        return {
+            row.day: (row.orders, row.units, round(row.revenue, 2))
+            for row in SellerSales.query.filter_by(seller_id=seller_id)
+        }
+
+
+@pytest.fixture
+def market(app):
+    """Two sellers, an admin and a buyer whose cart holds products from both"""
+    with app.app_context():
+        name = uuid.uuid4().hex[:8]
+        users = [
+            User(username=f'{role}-{name}', email=f'{role}-{name}@example.com', password_hash='x', role=role.split('-')[0])
+            for role in ('seller-a', 'seller-b', 'buyer', 'admin')
+        ]
+        db.session.add_all(users)
+        db.session.flush()
+        seller_a, seller_b, buyer, admin = users
+        mug = Product(name='Mug', price=4.5, stock=50, seller_id=seller_a.id)
+        pen = Product(name='Pen', price=1.25, stock=50, seller_id=seller_a.id)
+        lamp = Product(name='Lamp', price=30, stock=50, seller_id=seller_b.id)
+        db.session.add_all([mug, pen, lamp])
+        db.session.flush()
+        db.session.add_all([
+            CartItem(user_id=buyer.id, product_id=mug.id, quantity=2),
+            CartItem(user_id=buyer.id, product_id=pen.id, quantity=4),
+            CartItem(user_id=buyer.id, product_id=lamp.id, quantity=1),
+        ])
+        db.session.commit()
+        as_session = lambda user: SimpleNamespace(id=user.id, username=user.username, role=user.role)
+        return SimpleNamespace(seller_a=as_session(seller_a), seller_b=as_session(seller_b), buyer=as_session(buyer),
+                               admin=as_session(admin))
+
+
+def place_order(app, client, login, market):
+    login(market.buyer)
+    response = client.post('/checkout', data={'shipping_address': '1 Rollup Road'})
+    order_id = int(response.headers['Location'].rsplit('/', 1)[1])
+    with app.app_context():
+        run_jobs()
+        return order_id, db.session.get(Order, order_id).created_at.date()
+
+
+def test_checkout_adds_to_each_sellers_day(app, client, login, market):
+    order_id, day = place_order(app, client, login, market)
+    assert rollup(app, market.seller_a.id) == {day: (1, 6, 14.0)}
+    assert rollup(app, market.seller_b.id) == {day: (1, 1, 30.0)}
+
+
+def test_cancelling_takes_order_out_and_back(app, client, login, market):
+    order_id, day = place_order(app, client, login, market)
+    login(market.admin)
+    client.post(f'/update_order_status/{order_id}', data={'status': 'Cancelled'})
+    assert rollup(app, market.seller_a.id) == {day: (0, 0, 0.0)}
+    # Moving between two non-cancelled states leaves the rollup alone
+    client.post(f'/update_order_status/{order_id}', data={'status': 'Pending'})
+    client.post(f'/update_order_status/{order_id}', data={'status': 'Shipped'})
+    assert rollup(app, market.seller_a.id) == {day: (1, 6, 14.0)}
+    assert rollup(app, market.seller_b.id) == {day: (1, 1, 30.0)}
+
+
+def test_single_status_update_checks_seller_and_transition(app, client, login, market):
+    order_id, _ = place_order(app, client, login, market)
+    with app.app_context():
+        name = uuid.uuid4().hex[:8]
+        other = User(username=f'seller-c-{name}', email=f'seller-c-{name}@example.com', password_hash='x', role='seller')
+        db.session.add(other)
+        db.session.commit()
+        login(other)
+    response = client.post(f'/update_order_status/{order_id}', data={'status': 'Shipped'}, follow_redirects=True)
+    assert b'Unauthorized access.' in response.data
+    login(market.seller_b)
+    client.post(f'/update_order_status/{order_id}', data={'status': 'Shipped'})
+    response = client.post(f'/update_order_status/{order_id}', data={'status': 'Processing'}, follow_redirects=True)
+    assert b'cannot go from Shipped to Processing' in response.data
+    with app.app_context():
+        assert db.session.get(Order, order_id).status == 'Shipped'
+
+
+def test_rebuild_matches_incremental_rollup(app, client, login, market):
+    place_order(app, client, login, market)
+    before = rollup(app, market.seller_a.id), rollup(app, market.seller_b.id)
+    with app.app_context():
+        with db.engine.begin() as conn:
+            rebuild_sales_rollup(conn)
+    assert (rollup(app, market.seller_a.id), rollup(app, market.seller_b.id)) == before
+
+
+def test_dashboard_reads_rollup(app, client, login, count_queries, market):
+    place_order(app, client, login, market)
+    login(market.seller_a)
+    client.get('/seller/dashboard')
+    with count_queries() as queries:
+        response = client.get('/seller/dashboard')
+    assert response.status_code == 200
+    assert b'$14.00' in response.data
+    assert not any('order_item' in statement for statement in queries.statements), queries.statements
@@ -0,0 +1,102 @@
+"""Product search through the FTS5 index"""
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from models import db, Product, SEARCH_RANK, apply_search, build_search_match
+
+
+@pytest.fixture
+def shop(make_user):
+    """A seller, an admin, and a word no other product uses"""
+    return SimpleNamespace(seller=make_user('seller'), admin=make_user('admin'), word=f'zq{uuid.uuid4().hex[:8]}')
+
+
+def add(app, seller_id, name, description=''):
+    with app.app_context():
+        product = Product(name=name, description=description, price=5, stock=3, seller_id=seller_id)
+        db.session.add(product)
+        db.session.commit()
+        return product.id
+
+
+def search(app, text):
+    """Matching product ids, best match first"""
+    with app.app_context():
+        query = apply_search(Product.query.with_entities(Product.id), build_search_match(text))
+        return [product_id for (product_id,) in query.order_by(SEARCH_RANK, Product.id)]
+
+
+def test_routes_keep_the_index_in_sync(app, client, login, shop):
+    login(shop.seller)
+    client.post('/seller/add_product', data={'name': f'Lamp {shop.word}', 'price': '5', 'stock': '2'})
+    with app.app_context():
+        product_id = Product.query.filter_by(seller_id=shop.seller.id).one().id
+    assert search(app, shop.word) == [product_id]
+
+    client.post(f'/seller/edit_product/{product_id}', data={'name': 'Plain lamp', 'description': f'{shop.word}red',
+                                                            'price': '5', 'stock': '2'})
+    assert search(app, shop.word) == [product_id]
+    assert product_id in search(app, 'plain')
+
+    login(shop.admin)
+    client.post(f'/admin/edit_product/{product_id}', data={'name': 'Renamed', 'price': '5', 'stock': '2'})
+    assert search(app, shop.word) == []
+    assert product_id in search(app, 'renamed')
+
+    login(shop.seller)
+    client.post(f'/seller/edit_product/{product_id}', data={'name': f'Lamp {shop.word}', 'price': '5', 'stock': '2'})
+    assert client.post(f'/seller/delete_product/{product_id}').get_json()['success'] is True
+    assert search(app, shop.word) == []
+
+
+def test_prefix_matching(app, client, login, shop):
+    product_id = add(app, shop.seller.id, f'{shop.word}phone charger')
+    assert search(app, shop.word[:6]) == search(app, shop.word) == [product_id]
+    # Every word has to match, each as a prefix
+    assert search(app, f'{shop.word} char') == [product_id]
+    assert search(app, f'{shop.word} cable') == []
+
+    login(shop.seller)
+    page = client.get('/products', query_string={'search': f'{shop.word} charg'}).get_data(as_text=True)
+    assert f'/product/{product_id}"' in page
+
+
+def test_bm25_puts_name_matches_first(app, shop):
+    in_description = add(app, shop.seller.id, 'Garden hose', f'Works with every {shop.word} fitting')
+    in_name = add(app, shop.seller.id, f'{shop.word} fitting', 'Brass')
+    assert search(app, shop.word) == [in_name, in_description]
+    assert search(app, f'{shop.word} fitting') == [in_name, in_description]
+
+
+@pytest.mark.parametrize('text, match', [
+    ('red lamp', '"red"* "lamp"*'),
+    ('  "red" lamp!! ', '"red"* "lamp"*'),
+    ('o\'neil "quoted', '"o"* "neil"* "quoted"*'),
+    ('AND OR NOT', '"AND"* "OR"* "NOT"*'),
+    ('naïve café', '"naïve"* "café"*'),
+    ('"" * () - :', None),
+    ('', None),
+])
+def test_build_search_match(text, match):
+    assert build_search_match(text) == match
+
+
+def test_punctuation_in_searches_is_harmless(app, client, login, shop):
+    product_id = add(app, shop.seller.id, f'{shop.word} mug')
+    assert search(app, f'"{shop.word}" (mug)!') == [product_id]
+    login(shop.seller)
+    assert client.get('/products', query_string={'search': '"*:^()'}).status_code == 200
+
+
+def test_rebuild_search_index_command(app, shop):
+    product_id = add(app, shop.seller.id, f'{shop.word} kettle')
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO product_fts(product_fts) VALUES ('delete-all')")
+    assert search(app, shop.word) == []
+
+    result = app.test_cli_runner().invoke(args=['rebuild-search-index'])
+    assert result.exit_code == 0 and 'rebuilt' in result.output
+    assert search(app, shop.word) == [product_id]
@@ -0,0 +1,73 @@
+"""The seller's order list, read from the seller_order index"""
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from models import db, User, Product, CartItem, Order, SellerOrder
+from helpers import ORDERS_PAGE_SIZE
+
+
+@pytest.fixture
+def seller_with_orders(app):
+    """A seller with more orders than fit on one page, and one order placed through checkout"""
+    with app.app_context():
+        name = uuid.uuid4().hex[:8]
+        seller = User(username=f'seller-{name}', email=f'seller-{name}@example.com', password_hash='x', role='seller')
+        other = User(username=f'other-{name}', email=f'other-{name}@example.com', password_hash='x', role='seller')
+        buyer = User(username=f'buyer-{name}', email=f'buyer-{name}@example.com', password_hash='x', role='buyer')
+        db.session.add_all([seller, other, buyer])
+        db.session.flush()
+        started = datetime(2024, 1, 1)
+        for n in range(ORDERS_PAGE_SIZE + 5):
+            order = Order(buyer_id=buyer.id, total_amount=n, status='Pending', created_at=started + timedelta(hours=n))
+            db.session.add(order)
+            db.session.flush()
+            db.session.add(SellerOrder(seller_id=seller.id, order_id=order.id, created_at=order.created_at,
+                                       subtotal=n, item_count=1))
+        mine = Product(name='Mine', price=3, stock=10, seller_id=seller.id)
+        theirs = Product(name='Theirs', price=100, stock=10, seller_id=other.id)
+        db.session.add_all([mine, theirs])
+        db.session.flush()
+        db.session.add_all([
+            CartItem(user_id=buyer.id, product_id=mine.id, quantity=2),
+            CartItem(user_id=buyer.id, product_id=theirs.id, quantity=1),
+        ])
+        db.session.commit()
+        return SimpleNamespace(
+            seller=SimpleNamespace(id=seller.id, username=seller.username, role=seller.role),
+            buyer=SimpleNamespace(id=buyer.id, username=buyer.username, role=buyer.role)
+        )
+
+
+def test_checkout_records_each_sellers_share(app, client, login, seller_with_orders):
+    login(seller_with_orders.buyer)
+    response = client.post('/checkout', data={'shipping_address': '1 Index Lane'})
+    order_id = int(response.headers['Location'].rsplit('/', 1)[1])
+    with app.app_context():
+        shares = {row.seller_id: (row.subtotal, row.item_count) for row in SellerOrder.query.filter_by(order_id=order_id)}
+        assert shares[seller_with_orders.seller.id] == (6, 1)
+        assert sorted(subtotal for subtotal, _ in shares.values()) == [6, 100]
+
+
+def test_seller_orders_are_paginated_newest_first(client, login, seller_with_orders):
+    login(seller_with_orders.seller)
+    first = client.get('/orders').get_data(as_text=True)
+    assert first.count('View Details') == ORDERS_PAGE_SIZE
+    assert '2024-01-02 00:00' in first
+    older = first.split('cursor=')[1].split('"')[0]
+    second = client.get(f'/orders?cursor={older}').get_data(as_text=True)
+    assert second.count('View Details') == 5
+    assert '2024-01-01 00:00' in second
+
+
+def test_seller_order_list_uses_covering_index(app, seller_with_orders):
+    with app.app_context():
+        query = SellerOrder.query.filter(SellerOrder.seller_id == seller_with_orders.seller.id).order_by(
+            SellerOrder.created_at.desc(), SellerOrder.order_id.desc()
+        ).with_entities(SellerOrder.order_id, SellerOrder.subtotal).limit(ORDERS_PAGE_SIZE)
+        sql = str(query.statement.compile(compile_kwargs={'literal_binds': True}))
+        plan = ' '.join(row[-1] for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}')))
+    assert 'COVERING INDEX ix_seller_order_listing' in plan
+    assert 'TEMP B-TREE' not in plan
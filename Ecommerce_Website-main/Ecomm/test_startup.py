@@ -0,0 +1,127 @@
+"""App factory startup and the schema commands that replaced migrate-on-start"""
+import os
+
+import bench_startup
+from app import create_app
+from migrations import MIGRATIONS, schema_version
+from models import db
+
+
+def fresh_app(tmp_path):
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'fresh.db'),
+        'SECRET_KEY': 'startup-secret',
+    })
+
+
+def test_create_app_does_not_touch_database(tmp_path):
+    app = fresh_app(tmp_path)
+    # SQLite creates the file on first connect, so no file means no connection was opened
+    assert not os.path.exists(tmp_path / 'fresh.db')
+    assert {'storefront', 'cart', 'seller', 'admin', 'diagnostics'} <= set(app.blueprints)
+
+
+def test_first_response_is_within_startup_budget(capsys):
+    assert bench_startup.main(['--runs', '3']) == 0, capsys.readouterr().out
+
+
+def test_check_schema_until_init_database(tmp_path):
+    app = fresh_app(tmp_path)
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['check-schema'])
+    assert result.exit_code == 1
+    assert 'version 0' in result.output
+
+    result = runner.invoke(args=['init-database'])
+    assert result.exit_code == 0, result.output
+
+    result = runner.invoke(args=['check-schema'])
+    assert result.exit_code == 0
+    assert f'version {MIGRATIONS[-1][0]}' in result.output
+
+
+def test_failed_migration_fails_init_database(tmp_path, monkeypatch):
+    app = fresh_app(tmp_path)
+    runner = app.test_cli_runner()
+    assert runner.invoke(args=['init-database']).exit_code == 0
+    latest = MIGRATIONS[-1][0]
+
+    def broken(conn):
+        conn.exec_driver_sql('CREATE TABLE half_done (id INTEGER)')
+        conn.exec_driver_sql('ALTER TABLE no_such_table ADD COLUMN oops INTEGER')
+
+    monkeypatch.setattr('migrations.MIGRATIONS', [*MIGRATIONS, (latest + 1, 'broken', broken)])
+    result = runner.invoke(args=['init-database'])
+    assert result.exit_code == 1
+    assert 'Error initializing database' in result.output
+    with app.app_context():
+        assert schema_version() == latest
+        # The failed step was rolled back as a whole
+        with db.engine.connect() as conn:
+            assert conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'half_done'").first() is None
+
+
+TRIGGERS = "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+
+
+def table_shapes(connection):
+    """{table: {column: (type, not null, default, primary key)}} and {index: (table, columns)}"""
+    tables, indexes = {}, {}
+    for (table_name,) in connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'product_fts%'"):
+        tables[table_name] = {
+            row[1]: (row[2], bool(row[3]), row[4] and row[4].strip("'"), row[5])
+            for row in connection.exec_driver_sql(f'PRAGMA table_info("{table_name}")')
+        }
+        for index in connection.exec_driver_sql(f'PRAGMA index_list("{table_name}")').all():
+            if index[3] == 'c':  # created by CREATE INDEX, not a key constraint
+                columns = [row[2] for row in connection.exec_driver_sql(f'PRAGMA index_info("{index[1]}")')]
+                indexes[index[1]] = (table_name, columns)
+    return tables, indexes
+
+
+def test_migrated_schema_matches_models(tmp_path):
+    app = fresh_app(tmp_path)
+    assert app.test_cli_runner().invoke(args=['init-database']).exit_code == 0
+    models_app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'models.db')})
+    with models_app.app_context():
+        db.create_all()
+        with db.engine.connect() as conn:
+            model_tables, model_indexes = table_shapes(conn)
+            model_triggers = {row[0] for row in conn.exec_driver_sql(TRIGGERS)}
+    with app.app_context(), db.engine.connect() as conn:
+        tables, indexes = table_shapes(conn)
+        triggers = {row[0] for row in conn.exec_driver_sql(TRIGGERS)}
+
+    assert tables == model_tables
+    # Migrations add listing indexes the models do not declare
+    assert model_indexes.items() <= indexes.items()
+    assert triggers == model_triggers
+
+
+def test_database_from_before_migrations_upgrades(tmp_path):
+    app = fresh_app(tmp_path)
+    with app.app_context(), db.engine.begin() as conn:
+        # The shop's tables as the first release created them
+        conn.exec_driver_sql('CREATE TABLE user (id INTEGER NOT NULL, username VARCHAR(50) NOT NULL, '
+                             'email VARCHAR(100) NOT NULL, password_hash VARCHAR(255) NOT NULL, '
+                             'role VARCHAR(10) NOT NULL, created_at DATETIME, PRIMARY KEY (id))')
+        conn.exec_driver_sql('CREATE TABLE category (id INTEGER NOT NULL, name VARCHAR(50) NOT NULL, PRIMARY KEY (id))')
+        conn.exec_driver_sql('CREATE TABLE product (id INTEGER NOT NULL, name VARCHAR(100) NOT NULL, description TEXT, '
+                             'price FLOAT NOT NULL, image_url VARCHAR(500), additional_images TEXT, '
+                             'video_url VARCHAR(500), stock INTEGER NOT NULL, category_id INTEGER, '
+                             'seller_id INTEGER NOT NULL, created_at DATETIME, PRIMARY KEY (id))')
+        conn.exec_driver_sql('CREATE TABLE review (id INTEGER NOT NULL, user_id INTEGER NOT NULL, '
+                             'product_id INTEGER NOT NULL, rating INTEGER NOT NULL, comment TEXT, '
+                             'created_at DATETIME, PRIMARY KEY (id))')
+        conn.exec_driver_sql("INSERT INTO user VALUES (1, 'old-seller', 'old@example.com', 'x', 'seller', NULL)")
+        conn.exec_driver_sql("INSERT INTO product VALUES (1, 'Vintage Lamp', '', 9.5, NULL, NULL, NULL, 3, NULL, 1, "
+                             "'2020-01-01 00:00:00')")
+        conn.exec_driver_sql("INSERT INTO review VALUES (1, 1, 1, 4, 'bright', NULL)")
+
+    assert app.test_cli_runner().invoke(args=['init-database']).exit_code == 0
+    with app.app_context(), db.engine.connect() as conn:
+        assert conn.exec_driver_sql('SELECT version, reserved, updated_at FROM product').one() == \
+            (1, 0, '2020-01-01 00:00:00')
+        assert conn.exec_driver_sql("SELECT rowid FROM product_fts WHERE product_fts MATCH 'lamp'").all() == [(1,)]
+        assert conn.exec_driver_sql('SELECT review_count, rating_sum FROM product_rating').one() == (1, 4)
@@ -0,0 +1,20 @@
+"""Production WSGI entry point.
+
+    flask --app app init-database      (gunicorn.conf.py runs this on start)
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Every worker process imports this module on its own (no preloading), so
+each opens its own SQLite connections. Sessions stay valid across workers
+because they all sign with the same key (SECRET_KEY, or the shared key file).
+"""
+from app import create_app
+from helpers import start_reservation_sweeper
+from jobs import start_job_workers
+
+app = create_app()
+
+# Releasing an expired hold is a single DELETE ... RETURNING, so one sweeper per worker is safe
+start_reservation_sweeper(app)
+
+# Claiming a job is a single UPDATE ... RETURNING, so workers in every process share one queue
+start_job_workers(app)